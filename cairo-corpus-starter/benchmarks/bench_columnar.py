@@ -0,0 +1,81 @@
+"""Filter query over the corpus: JSONL scan vs Arrow (mmap) vs Parquet.
+
+python -m benchmarks.bench_columnar --n 200000 --workdir /tmp/columnar-bench
+
+Query: count ERC20, Cairo 2 records with quality score > 0.5.
+"""
+
+import argparse
+import pathlib
+import random
+import time
+
+import orjson
+import pyarrow.compute as pc
+from benchmarks.bench_minhash import _contract
+from src.columnar import export, load
+
+COLUMNS = ["type", "cairo_version", "quality_score"]
+
+
+def write_jsonl(path: pathlib.Path, n: int, seed: int = 0):
+    rng = random.Random(seed)
+    codes = [_contract(rng) for _ in range(200)]
+    with open(path, "wb") as f:
+        for i in range(n):
+            rec = {
+                "contract_name": f"Contract{i}",
+                "source": rng.choice(["github", "docs", "blog"]),
+                "type": rng.choice(["ERC20", "ERC721", "DeFi", "Utility", "Other"]),
+                "cairo_version": rng.choice(["1", "2"]),
+                "last_updated": "2025-01-01",
+                "quality": {"category": "unknown", "score": rng.random()},
+                "repo": {"url": f"https://github.com/o/r{i}", "stars": i, "forks": 1},
+                "code": codes[i % len(codes)],
+            }
+            f.write(orjson.dumps(rec) + b"\n")
+
+
+def query_jsonl(path) -> int:
+    n = 0
+    with open(path, "rb") as f:
+        for ln in f:
+            r = orjson.loads(ln)
+            if (
+                r["type"] == "ERC20"
+                and r["cairo_version"] == "2"
+                and r["quality"].get("score", 0) > 0.5
+            ):
+                n += 1
+    return n
+
+
+def query_columnar(path) -> int:
+    t = load(path, COLUMNS)
+    mask = pc.and_(
+        pc.and_(pc.equal(t["type"], "ERC20"), pc.equal(t["cairo_version"], "2")),
+        pc.greater(t["quality_score"], 0.5),
+    )
+    return pc.sum(mask).as_py() or 0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--workdir", default="/tmp/columnar-bench")
+    args = ap.parse_args()
+
+    work = pathlib.Path(args.workdir)
+    work.mkdir(parents=True, exist_ok=True)
+    src = work / "dataset.jsonl"
+    write_jsonl(src, args.n)
+    paths = export(str(src), str(work))
+    for name, path in [("jsonl", src), ("parquet", paths["parquet"])] + [
+        ("arrow", paths["arrow"])
+    ]:
+        fn = query_jsonl if name == "jsonl" else query_columnar
+        t0 = time.perf_counter()
+        hits = fn(str(path))
+        dt = time.perf_counter() - t0
+        size = pathlib.Path(path).stat().st_size / 2**20
+        print(f"{name:>8}: {dt * 1e3:9.1f} ms  {hits} hits  ({size:.0f} MiB on disk)")
@@ -0,0 +1,109 @@
+"""Code-block extraction per page: BeautifulSoup/html.parser vs utils.html_code.
+
+python -m benchmarks.bench_html_code --n 3000
+python -m benchmarks.bench_html_code --pages path/to/saved/html
+
+Without --pages, mdBook-like pages (sidebar, prose, highlighted
+<pre><code> blocks) are generated.
+"""
+
+import argparse
+import pathlib
+import random
+import time
+
+from bs4 import BeautifulSoup
+from src.utils.html_code import extract_code_blocks
+
+KEYWORDS = ["mod", "fn", "let", "use", "struct", "impl", "pub", "self", "return"]
+
+
+def old_extract(html: str):
+    # what scrape_docs/scrape_blogs did before
+    soup = BeautifulSoup(html, "html.parser")
+    out = []
+    for pre in soup.find_all(["pre", "code"]):
+        txt = pre.get_text("\n")
+        if (
+            "use::core" in txt
+            or "starknet::" in txt
+            or "pub" in txt
+            or "mod" in txt
+            or "fn " in txt
+        ):
+            out.append(txt)
+    return out
+
+
+def synth_page(rng: random.Random) -> str:
+    sidebar = "".join(
+        f'<li class="chapter-item expanded"><a href="ch{i:02d}-00.html">{i}.</a></li>'
+        for i in range(120)
+    )
+    body = []
+    for _ in range(rng.randint(5, 25)):
+        body.append(
+            "<p>"
+            + " ".join(
+                rng.choice(["Cairo", "storage", "the", "contract", "a"])
+                for _ in range(60)
+            )
+            + " <code>felt252</code></p>"
+        )
+        if rng.random() < 0.6:
+            lines = []
+            for _ in range(rng.randint(4, 30)):
+                toks = [
+                    (
+                        f'<span class="hljs-keyword">{rng.choice(KEYWORDS)}</span>'
+                        if rng.random() < 0.3
+                        else f"x{rng.randint(0, 99)}"
+                    )
+                    for _ in range(rng.randint(2, 8))
+                ]
+                lines.append("    " + " ".join(toks))
+            body.append(
+                '<pre><code class="language-cairo">'
+                + "\n".join(lines)
+                + "\n</code></pre>"
+            )
+    return (
+        "<!DOCTYPE html><html><head><title>Cairo</title></head><body>"
+        f'<nav><ol class="chapter">{sidebar}</ol></nav><main>{"".join(body)}</main>'
+        "</body></html>"
+    )
+
+
+def timed(fn, pages):
+    t0 = time.perf_counter()
+    blocks = sum(len(fn(p)) for p in pages)
+    return time.perf_counter() - t0, blocks
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=3000)
+    ap.add_argument("--pages", default=None, help="directory of saved .html pages")
+    args = ap.parse_args()
+    if args.pages:
+        pages = [
+            p.read_text(errors="replace")
+            for p in sorted(pathlib.Path(args.pages).rglob("*.html"))
+        ]
+    else:
+        rng = random.Random(0)
+        pages = [synth_page(rng) for _ in range(args.n)]
+    mb = sum(len(p) for p in pages) / 1e6
+    print(f"{len(pages)} pages, {mb:.1f} MB")
+
+    base = None
+    for name, fn in (
+        ("bs4 html.parser", old_extract),
+        ("html_code", extract_code_blocks),
+    ):
+        dt, blocks = timed(fn, pages)
+        base = base or dt
+        print(
+            f"{name:>16}: {dt / len(pages) * 1e3:7.3f} ms/page  {blocks:7d} blocks"
+            f"  x{base / dt:5.1f}"
+        )
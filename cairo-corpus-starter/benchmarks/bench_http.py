@@ -0,0 +1,110 @@
+"""Per-request latency against a local HTTPS server: requests.get vs pooled session.
+
+python -m benchmarks.bench_http --n 300 --kb 16
+
+Needs the `openssl` CLI to make a throwaway self-signed certificate.
+"""
+
+import argparse
+import os
+import pathlib
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from src.utils import http
+
+
+def make_cert(tmp: pathlib.Path):
+    cert, key = tmp / "cert.pem", tmp / "key.pem"
+    subprocess.run(
+        [
+            os.getenv("OPENSSL", "openssl"),
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=localhost",
+            "-addext",
+            "subjectAltName=DNS:localhost,IP:127.0.0.1",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+def serve(cert, key, body: bytes):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # headers and body go out as two writes
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def latencies(get, url: str, n: int):
+    out = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        get(url).raise_for_status()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=300)
+    ap.add_argument("--kb", type=int, default=16)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_cert(pathlib.Path(tmp))
+        server = serve(cert, key, b"x" * (args.kb << 10))
+        url = f"https://127.0.0.1:{server.server_port}/page"
+        pooled = http.make_session()
+
+        runs = {
+            "requests.get": lambda u: requests.get(u, verify=str(cert), timeout=30),
+            "http.session": lambda u: pooled.get(u, verify=str(cert)),
+        }
+        base = None
+        for name, get in runs.items():
+            get(url)  # warm up
+            lat = latencies(get, url, args.n)
+            med = statistics.median(lat)
+            base = base or med
+            p95 = statistics.quantiles(lat, n=20)[-1]
+            print(
+                f"{name:>13}: median {med * 1e3:7.3f} ms  p95 {p95 * 1e3:7.3f} ms"
+                f"  x{base / med:5.1f}"
+            )
+        server.shutdown()
@@ -0,0 +1,154 @@
+"""Dedup scaling: NearDupIndex vs the old all-pairs `seen` scan.
+
+python -m benchmarks.bench_minhash --sizes 1000 10000 100000 1000000
+
+Kept snippets are held zlib-compressed and handed to the index as callables,
+the way clean_standardize hands it blob paths, so "rss MiB" is mostly the
+index itself. One run on a single shared core (32 bands x 4 rows):
+
+        n   index s  us/snip      kept  recall    scan s   rss MiB
+     1000      1.53   1525.3       949   1.000     89.68        47
+    10000     10.26   1026.1      9491   1.000         -        90
+   100000    155.60   1556.0     94996   1.000         -       378
+  1000000   4539.62   4539.6    949934   1.000         -      2596
+
+The cost per snippet grows with n because contracts built from the same
+templates share bands; those candidates are dropped on their signatures
+(`min_jaccard`) without being loaded.
+"""
+
+import argparse
+import functools
+import random
+import resource
+import string
+import time
+import zlib
+
+from src.utils.minhash import NearDupIndex
+from src.utils.text import is_duplicate
+
+HEADER = """#[starknet::contract]
+mod {name} {{
+    use starknet::ContractAddress;
+
+    #[storage]
+    struct Storage {{
+        {field}: LegacyMap<ContractAddress, u256>,
+    }}
+"""
+
+FN = """
+    #[external(v0)]
+    fn {fn}(ref self: ContractState, {arg}: ContractAddress, {amt}: u256) {{
+{body}    }}
+"""
+
+STMTS = [
+    "let {a} = self.{field}.read({arg});",
+    "assert({a} >= {lit}, '{msg}');",
+    "self.{field}.write({arg}, {a} + {amt} * {lit});",
+    "let {a}: u256 = {amt} / {lit};",
+    "if {a} == {lit} {{ return; }}",
+    "self.emit({name}Event {{ {a}: {amt} }});",
+    "let mut {a} = ArrayTrait::<felt252>::new();",
+    "{a}.append({lit});",
+]
+
+
+def _ident(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(6, 14)))
+
+
+def _contract(rng: random.Random) -> str:
+    name, field = _ident(rng).capitalize(), _ident(rng)
+    code = HEADER.format(name=name, field=field)
+    for _ in range(rng.randint(2, 6)):
+        arg, amt = _ident(rng), _ident(rng)
+        body = ""
+        for _ in range(rng.randint(2, 6)):
+            stmt = rng.choice(STMTS).format(
+                a=_ident(rng),
+                arg=arg,
+                amt=amt,
+                field=field,
+                name=name,
+                lit=rng.randint(0, 10**9),
+                msg=_ident(rng),
+            )
+            body += "        " + stmt + "\n"
+        code += FN.format(fn=_ident(rng), arg=arg, amt=amt, body=body)
+    return code + "}\n"
+
+
+def synth(n: int, dup_rate: float = 0.05, seed: int = 0):
+    """Yield (code, is_planted_duplicate) pairs."""
+    rng = random.Random(seed)
+    originals = []
+    for _ in range(n):
+        if originals and rng.random() < dup_rate:
+            # up to 1% of bytes rewritten at random spots, still >= 0.98 similar
+            code = list(rng.choice(originals))
+            for pos in rng.sample(range(len(code)), rng.randint(1, len(code) // 100)):
+                code[pos] = "x"
+            yield "".join(code), True
+            continue
+        code = _contract(rng)
+        originals.append(code)
+        if len(originals) > 1000:
+            originals.pop(0)
+        yield code, False
+
+
+def _inflate(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def bench_index(n: int):
+    idx = NearDupIndex()
+    planted = caught = cands = 0
+    dt = 0.0
+    for code, dup in synth(n):
+        # only the index is timed, not building the synthetic contracts
+        t0 = time.perf_counter()
+        sig = idx.hasher.signature(code)
+        kept = idx.find_duplicate(code, sig) is None
+        if kept:
+            blob = zlib.compress(code.encode("utf-8"))
+            idx.add(functools.partial(_inflate, blob), sig)
+        dt += time.perf_counter() - t0
+        cands += len(idx.candidates(code, sig)) - kept
+        planted += dup
+        caught += dup and not kept
+    return dt, len(idx), caught / max(planted, 1), cands / n
+
+
+def bench_scan(n: int):
+    seen = []
+    t0 = time.perf_counter()
+    for code, _ in synth(n):
+        if any(is_duplicate(code, s) for s in seen):
+            continue
+        seen.append(code)
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--scan_max", type=int, default=5000)
+    args = ap.parse_args()
+
+    print(
+        f"{'n':>9} {'index s':>9} {'us/snip':>8} {'cands':>6} {'kept':>9}"
+        f" {'recall':>7} {'scan s':>9} {'rss MiB':>9}"
+    )
+    for n in args.sizes:
+        dt, kept, recall, cands = bench_index(n)
+        scan = f"{bench_scan(n):9.2f}" if n <= args.scan_max else f"{'-':>9}"
+        # peak for the whole process so far, i.e. the largest size run yet
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(
+            f"{n:>9} {dt:9.2f} {dt / n * 1e6:8.1f} {cands:6.2f} {kept:>9}"
+            f" {recall:7.3f} {scan} {rss:9.0f}"
+        )
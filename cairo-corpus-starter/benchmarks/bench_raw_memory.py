@@ -0,0 +1,104 @@
+"""Peak memory of cleaning one huge raw GitHub payload.
+
+python -m benchmarks.bench_raw_memory --gb 2 --workdir /tmp/raw-bench
+
+- json.loads: parsing the whole payload, as _iter_raw used to
+- stream: the streaming parser alone
+- iter_raw: _iter_raw against an empty fingerprint store, i.e. hashing the file
+- clean: clean_standardize.main() end to end, with `--workers` processes
+
+Each mode runs in a fresh subprocess and reports its peak RSS.
+"""
+
+import argparse
+import json
+import pathlib
+import random
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_minhash import _contract
+
+# sys.argv: payload path, workers
+MODES = {
+    "json.loads": "import json, pathlib, sys\n"
+    "data = json.loads(pathlib.Path(sys.argv[1]).read_text())\n"
+    "n = sum(1 for _ in data['files'])\n",
+    "stream": "import pathlib, sys\n"
+    "from src.clean_standardize import _stream_raw\n"
+    "n = sum(1 for k, _ in _stream_raw(pathlib.Path(sys.argv[1])) if k == 'files')\n",
+    "iter_raw": "import pathlib, sys, tempfile\n"
+    "from src import clean_standardize as cs\n"
+    "from src.utils.fingerprints import FingerprintStore\n"
+    "cs.RAW = pathlib.Path(sys.argv[1]).parent\n"
+    "store = FingerprintStore(pathlib.Path(tempfile.mkdtemp()) / 'fp.sqlite', '')\n"
+    "n = sum(1 for _ in cs._iter_raw(store))\n",
+    "clean": "import pathlib, shutil, sys\n"
+    "from src import clean_standardize as cs\n"
+    "cs.RAW = pathlib.Path(sys.argv[1]).parent\n"
+    "out = cs.RAW.parent / 'processed'\n"
+    "shutil.rmtree(out, ignore_errors=True)\n"
+    "cs.V1, cs.V2 = out / 'cairo_v1', out / 'cairo_v2'\n"
+    "cs.INDEX, cs.FINGERPRINTS = out / 'index.json', out / 'fp.sqlite'\n"
+    "out.mkdir()\n"
+    "cs.main(workers=int(sys.argv[2]))\n",
+}
+
+
+def write_payload(path: pathlib.Path, gb: float, seed: int = 0):
+    rng = random.Random(seed)
+    target = int(gb * 2**30)
+    meta = {"source": "github", "repo": {"full_name": "bench/huge", "url": ""}}
+    with open(path, "w") as f:
+        f.write('{"meta": ' + json.dumps(meta) + ', "files": [')
+        written, i = 0, 0
+        while written < target:
+            rec = {"path": f"src/c{i}.cairo", "code": _contract(rng) * 20}
+            chunk = ("," if i else "") + json.dumps(rec, indent=2)
+            f.write(chunk)
+            written += len(chunk)
+            i += 1
+        f.write("]}")
+    return i
+
+
+def run(mode: str, path: pathlib.Path, workers: int = 1):
+    t0 = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", MODES[mode], str(path), str(workers)], check=True
+    )
+    dt = time.perf_counter() - t0
+    # ru_maxrss is KiB on Linux; children's max is monotonic, so run each mode once
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 2**10
+    return dt, rss
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--gb", type=float, default=2.0)
+    ap.add_argument("--workdir", default="/tmp/raw-bench")
+    ap.add_argument("--mode", choices=list(MODES))
+    ap.add_argument("--workers", type=int, default=1, help="for the clean mode")
+    args = ap.parse_args()
+
+    # alone in raw/, which the iter_raw and clean modes point RAW at
+    path = pathlib.Path(args.workdir) / "raw" / "huge.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists() or path.stat().st_size < args.gb * 2**30:
+        n = write_payload(path, args.gb)
+        print(f"wrote {path} ({path.stat().st_size / 2**20:.0f} MiB, {n} files)")
+
+    if args.mode:
+        dt, rss = run(args.mode, path, args.workers)
+        print(f"{args.mode:>10}: {dt:7.1f}s  peak RSS {rss:8.1f} MiB")
+    else:
+        # separate interpreters so the first mode's peak doesn't mask the second
+        for mode in MODES:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_raw_memory"]
+                + ["--gb", str(args.gb), "--workdir", args.workdir, "--mode", mode]
+                + ["--workers", str(args.workers)],
+                check=True,
+            )
@@ -0,0 +1,53 @@
+"""Schema validation cost per record: jsonschema.validate vs RecordValidator.
+
+python -m benchmarks.bench_validation --n 20000 --workers 4
+"""
+
+import argparse
+import time
+
+from jsonschema import validate
+from src.schema import schema
+from src.validation import get_validator, validate_records
+
+
+def synth(n: int):
+    return [
+        {
+            "contract_name": f"Contract{i}",
+            "source": ("github", "docs", "blog")[i % 3],
+            "type": "Other",
+            "cairo_version": "2",
+            "last_updated": "2025-01-01",
+            "quality": {"category": "unknown", "score": (i % 100) / 100},
+            "repo": {"url": f"https://github.com/o/r{i}", "stars": i, "forks": 1},
+            "code": "mod c {}\n" * 50,
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--workers", type=int, default=1)
+    args = ap.parse_args()
+    recs = synth(args.n)
+    v = get_validator()
+
+    runs = {
+        "jsonschema.validate": lambda: [validate(r, schema) for r in recs],
+        "RecordValidator": lambda: [v.errors(r) for r in recs],
+        "validate_records": lambda: validate_records(recs, workers=args.workers),
+    }
+    base = None
+    for name, fn in runs.items():
+        dt = timed(fn)
+        base = base or dt
+        print(f"{name:>20}: {dt / args.n * 1e6:8.2f} us/record  x{base / dt:6.1f}")
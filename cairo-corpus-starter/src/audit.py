@@ -0,0 +1,171 @@
+import collections
+import functools
+import itertools
+import multiprocessing
+import os
+import pathlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+
+from .dataset import Dataset
+from .utils.minhash import MinHasher, NearDupIndex
+from .utils.pool import imap_window
+from .validation import RecordValidator
+
+# same bar as the old all-pairs test: >= 0.995 similar but not identical
+NEAR_DUP_THRESHOLD = 0.995
+MIN_RECORDS = 20
+MAX_LISTED = 100
+
+_validator: Optional[RecordValidator] = None
+_hasher: Optional[MinHasher] = None
+
+
+def _init_worker(params: str):
+    global _validator, _hasher
+    num_perm, width, seed = map(int, params.split(":"))
+    _validator = RecordValidator()
+    _hasher = MinHasher(num_perm=num_perm, width=width, seed=seed)
+
+
+def _check_batch(batch: Tuple[int, List[bytes]]) -> List[Dict[str, Any]]:
+    """Parse, validate and fingerprint one batch of raw lines."""
+    start, lines = batch
+    out = []
+    for i, line in enumerate(lines, start):
+        try:
+            rec = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            out.append({"i": i, "errors": [f"<json>: {e}"], "code": None})
+            continue
+        code = rec.get("code") if isinstance(rec, dict) else None
+        out.append(
+            {
+                "i": i,
+                "errors": _validator.errors(rec),
+                "code": code if isinstance(code, str) and code else None,
+                "sig": _hasher.signature(code) if isinstance(code, str) else None,
+                "labels": (
+                    [(k, rec.get(k)) for k in ("source", "type", "cairo_version")]
+                    if isinstance(rec, dict)
+                    else []
+                ),
+            }
+        )
+    return out
+
+
+def _batches(path: pathlib.Path, size: int) -> Iterator[Tuple[int, List[bytes]]]:
+    with open(path, "rb") as f:
+        lines = (ln for ln in f if ln.strip())
+        start = 0
+        while True:
+            batch = list(itertools.islice(lines, size))
+            if not batch:
+                return
+            yield start, batch
+            start += len(batch)
+
+
+def _code_at(ds: Dataset, i: int) -> str:
+    return ds[i]["code"]
+
+
+def audit(
+    path: str = "data/processed/dataset.jsonl",
+    workers: Optional[int] = None,
+    batch_size: int = 500,
+) -> Dict[str, Any]:
+    """Audit a JSONL dataset in one streaming pass.
+
+    Workers parse, schema-check and MinHash each batch; the parent feeds the
+    signatures through an LSH index to find near-duplicate pairs, reading the
+    code of earlier records back through `Dataset` only when they are
+    candidates.
+    """
+    p = pathlib.Path(path)
+    workers = workers or os.cpu_count() or 1
+    index = NearDupIndex(threshold=NEAR_DUP_THRESHOLD)
+    params = index.hasher.params
+    ds = Dataset(p)
+    ids: List[int] = []
+    report: Dict[str, Any] = {
+        "dataset": str(p),
+        "records": 0,
+        "invalid": 0,
+        "exact_duplicates": 0,
+        "near_duplicates": 0,
+        "invalid_records": [],
+        "near_duplicate_pairs": [],
+        "counts": collections.defaultdict(collections.Counter),
+    }
+
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, _init_worker, (params,))
+        # batches are read only as fast as the parent indexes their results
+        results = imap_window(pool, _check_batch, _batches(p, batch_size), 2 * workers)
+    else:
+        pool = None
+        _init_worker(params)
+        results = map(_check_batch, _batches(p, batch_size))
+    try:
+        for res in itertools.chain.from_iterable(results):
+            i = res["i"]
+            report["records"] += 1
+            for k, v in res.get("labels", []):
+                report["counts"][k][str(v)] += 1
+            if res["errors"]:
+                report["invalid"] += 1
+                if len(report["invalid_records"]) < MAX_LISTED:
+                    report["invalid_records"].append(
+                        {"record": i, "errors": res["errors"]}
+                    )
+            code = res["code"]
+            if code is None:
+                continue
+            exact = False
+            for j, sim in index.matches(code, res["sig"]):
+                if sim == 1.0:
+                    exact = True
+                    continue
+                report["near_duplicates"] += 1
+                if len(report["near_duplicate_pairs"]) < MAX_LISTED:
+                    report["near_duplicate_pairs"].append(
+                        {"a": ids[j], "b": i, "similarity": round(sim, 4)}
+                    )
+            if exact:
+                report["exact_duplicates"] += 1
+                continue
+            index.add(functools.partial(_code_at, ds, i), res["sig"])
+            ids.append(i)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        ds.close()
+
+    n = report["records"]
+    report["counts"] = {k: dict(c) for k, c in report["counts"].items()}
+    report["checks"] = {
+        "schema": report["invalid"] == 0,
+        "near_duplicates": report["near_duplicates"] == 0,
+        "min_count": n >= MIN_RECORDS or n == 0,
+    }
+    report["ok"] = all(report["checks"].values())
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--data", default="data/processed/dataset.jsonl")
+    ap.add_argument("--report", default="data/processed/audit.json")
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+    rep = audit(args.data, args.workers)
+    pathlib.Path(args.report).write_bytes(orjson.dumps(rep, option=orjson.OPT_INDENT_2))
+    print("Wrote", args.report, "-", "ok" if rep["ok"] else f"failed {rep['checks']}")
+    sys.exit(0 if rep["ok"] else 1)
@@ -1,35 +1,204 @@
+import hashlib
 import json
+import os
 import pathlib
+from typing import Any, Dict, Optional
 
 import orjson
-from jsonschema import validate
 
+from .columnar import export as export_columnar
+from .dataset import write_index
 from .schema import schema
+from .shards import write_shards
+from .utils import metrics
+from .validation import ValidationReport, get_validator
 
 PROC = pathlib.Path("data/processed")
+# bump when record hydration changes, so old manifests are not trusted
+MANIFEST_VERSION = 1
 
 
-def main(out_path: str = "data/processed/dataset.jsonl"):
-    idx = json.loads((PROC / "index.json").read_text())
-    with open(out_path, "wb") as f:
-        for rec in idx:
-            # hydrate code
-            code = pathlib.Path(rec["code_path"]).read_text()
-            # assign type via naive filename heuristics
-            name = rec["contract_name"].lower()
-            if "erc20" in name:
-                rec["type"] = "ERC20"
-            elif "erc721" in name:
-                rec["type"] = "ERC721"
-            elif "amm" in name or "dex" in name or "pool" in name:
-                rec["type"] = "DeFi"
-            elif "util" in name:
-                rec["type"] = "Utility"
-            rec["code"] = code
-            # minimal validation
-            validate(instance=rec, schema=schema)
-            f.write(orjson.dumps(rec) + b"\n")
-    print("Wrote", out_path)
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+SCHEMA_SHA = _sha(orjson.dumps(schema, option=orjson.OPT_SORT_KEYS))
+
+
+def manifest_path(out_path: str) -> pathlib.Path:
+    return pathlib.Path(out_path + ".manifest.json")
+
+
+def _load_manifest(out_path: str) -> Dict[str, Dict[str, Any]]:
+    """Previous build's entries keyed by code_path, or {} if unusable."""
+    path = manifest_path(out_path)
+    if not path.exists() or not pathlib.Path(out_path).exists():
+        return {}
+    manifest = orjson.loads(path.read_bytes())
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    if manifest.get("schema") != SCHEMA_SHA:
+        return {}
+    if manifest.get("size") != pathlib.Path(out_path).stat().st_size:
+        return {}
+    return {e["key"]: e for e in manifest["records"]}
+
+
+def hydrate(rec: Dict[str, Any], code: str) -> Dict[str, Any]:
+    """Turn index entry `rec` into a dataset record carrying `code`."""
+    # assign type via naive filename heuristics
+    name = rec["contract_name"].lower()
+    if "erc20" in name:
+        rec["type"] = "ERC20"
+    elif "erc721" in name:
+        rec["type"] = "ERC721"
+    elif "amm" in name or "dex" in name or "pool" in name:
+        rec["type"] = "DeFi"
+    elif "util" in name:
+        rec["type"] = "Utility"
+    rec["code"] = code
+    return rec
+
+
+class _Splicer:
+    """Copies byte ranges of the previous dataset, merging adjacent ranges."""
+
+    def __init__(self, src, dst):
+        self.src, self.dst = src, dst
+        self.start = self.end = 0
+
+    def add(self, offset: int, length: int):
+        if offset != self.end:
+            self.flush()
+            self.start = self.end = offset
+        self.end += length
+
+    def flush(self):
+        self.src.seek(self.start)
+        left = self.end - self.start
+        while left:
+            chunk = self.src.read(min(left, 1 << 20))
+            self.dst.write(chunk)
+            metrics.add("bytes_read", len(chunk))
+            metrics.add("bytes_written", len(chunk))
+            left -= len(chunk)
+        self.start = self.end
+
+
+def main(
+    out_path: str = "data/processed/dataset.jsonl",
+    incremental: bool = False,
+    shard_dir: Optional[str] = None,
+    shard_mb: int = 256,
+    columnar_dir: Optional[str] = None,
+):
+    """Write `out_path` from `index.json`, plus a manifest of what went where
+    and the `<out>.idx` offset sidecar used by `src.dataset.Dataset`.
+
+    With `incremental`, records whose metadata and code file match the
+    previous manifest are byte-copied from the previous output instead of
+    being re-read, re-classified and re-validated.
+
+    Records failing the schema are left out and reported together in
+    `<out>.validation.json`. With `shard_dir`, the finished dataset is also
+    split into zstd-compressed shards of about `shard_mb` MiB plus a manifest
+    (see `src/shards.py`), and with `columnar_dir` exported to Parquet and
+    Arrow (see `src/columnar.py`).
+    """
+    idx = json.loads(metrics.read_text(PROC / "index.json"))
+    old = _load_manifest(out_path) if incremental else {}
+    validator = get_validator()
+    report = ValidationReport()
+    entries = []
+    reused = 0
+    tmp_path = out_path + ".tmp"
+    prev: Optional[Any] = open(out_path, "rb") if old else None
+    try:
+        with open(tmp_path, "wb") as f:
+            splicer = _Splicer(prev, f) if prev else None
+            offset = 0
+            for i, rec in enumerate(idx):
+                key = rec["code_path"]
+                meta = _sha(orjson.dumps(rec, option=orjson.OPT_SORT_KEYS))
+                st = os.stat(key)
+                entry = {
+                    "key": key,
+                    "meta": meta,
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                }
+                before = old.get(key)
+                if before and before["meta"] == meta:
+                    # a content-addressed blob can't change under the same name
+                    unchanged = "code_sha" in rec or (
+                        before["size"] == st.st_size
+                        and before["mtime_ns"] == st.st_mtime_ns
+                    )
+                    if not unchanged:
+                        data = pathlib.Path(key).read_bytes()
+                        metrics.add("bytes_read", len(data))
+                        code_sha = _sha(data)
+                        unchanged = code_sha == before["code"]
+                    if unchanged:
+                        splicer.add(before["offset"], before["length"])
+                        entry.update(
+                            code=before["code"], offset=offset, length=before["length"]
+                        )
+                        entries.append(entry)
+                        offset += before["length"]
+                        reused += 1
+                        metrics.add("records")
+                        continue
+                if splicer:
+                    splicer.flush()
+                # hydrate code
+                code = metrics.read_text(key)
+                rec = hydrate(rec, code)
+                report.checked += 1
+                errors = validator.errors(rec)
+                if errors:
+                    report.add(i, errors, key)
+                    continue
+                line = orjson.dumps(rec) + b"\n"
+                f.write(line)
+                metrics.add("bytes_written", len(line))
+                metrics.add("records")
+                entry.update(
+                    code=_sha(code.encode("utf-8")), offset=offset, length=len(line)
+                )
+                entries.append(entry)
+                offset += len(line)
+            if splicer:
+                splicer.flush()
+    finally:
+        if prev:
+            prev.close()
+    os.replace(tmp_path, out_path)
+    write_index(out_path, [e["offset"] for e in entries], offset)
+    manifest_path(out_path).write_bytes(
+        orjson.dumps(
+            {
+                "version": MANIFEST_VERSION,
+                "schema": SCHEMA_SHA,
+                "size": offset,
+                "records": entries,
+            }
+        )
+    )
+    print("Wrote", out_path, f"({reused}/{len(entries)} records reused)")
+    report_path = pathlib.Path(out_path + ".validation.json")
+    if report.ok:
+        report_path.unlink(missing_ok=True)
+    else:
+        report_path.write_bytes(
+            orjson.dumps(report.to_dict(), option=orjson.OPT_INDENT_2)
+        )
+        print(f"{len(report.failures)} invalid records left out, see {report_path}")
+    if shard_dir:
+        m = write_shards(out_path, shard_dir, shard_mb << 20)
+        print("Wrote", len(m["shards"]), "shards to", shard_dir)
+    if columnar_dir:
+        print("Wrote", *export_columnar(out_path, columnar_dir).values())
 
 
 if __name__ == "__main__":
@@ -37,5 +206,13 @@ if __name__ == "__main__":
 
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="data/processed/dataset.jsonl")
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="reuse unchanged records from the previous build's manifest",
+    )
+    ap.add_argument("--shards", help="also write zstd JSONL shards to this dir")
+    ap.add_argument("--shard_mb", type=int, default=256)
+    ap.add_argument("--columnar", help="also export Parquet + Arrow to this dir")
     args = ap.parse_args()
-    main(args.out)
+    main(args.out, args.incremental, args.shards, args.shard_mb, args.columnar)
@@ -1,99 +1,317 @@
 import datetime
 import json
+import multiprocessing
 import pathlib
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import ijson
 from src.utils.github_api import *
+from tqdm import tqdm
 
 from .detect_cairo_version import detect_cairo_version
-from .utils.text import is_duplicate, normalize_indentation, strip_trailing_ws
+from .utils import metrics
+from .utils.blobs import BlobStore
+from .utils.fingerprints import FingerprintStore, content_hash
+from .utils.minhash import MinHasher, NearDupIndex
+from .utils.pool import imap_window
+from .utils.text import normalize_indentation, strip_trailing_ws
 
 RAW = pathlib.Path("data/raw")
 PROC = pathlib.Path("data/processed")
 V1 = PROC / "cairo_v1"
 V2 = PROC / "cairo_v2"
+INDEX = PROC / "index.json"
+FINGERPRINTS = PROC / "fingerprints.sqlite"
+# levels of two-hex-digit subdirectories under cairo_v1/ and cairo_v2/
+FANOUT = 1
+# raw files larger than this are streamed by the parent under --workers
+POOL_MAX_BYTES = 64 * 2**20
 for p in [PROC, V1, V2]:
     p.mkdir(parents=True, exist_ok=True)
 
 
-def _iter_raw():
+def _iter_raw(store: Optional[FingerprintStore] = None):
+    """(path, digest) of raw files that still need cleaning."""
     for path in RAW.rglob("*.json"):
-        print(path)
-        data = json.loads(path.read_text())
-        yield path, data
+        digest = None
+        if store is not None:
+            digest = store.raw_digest(path)
+            if digest is None:
+                continue
+        yield path, digest
 
 
-def _write_split(code: str, meta: Dict[str, Any], name_hint: str):
+def _write_split(blobs: Dict[str, BlobStore], code: str, v: str, sha: str) -> str:
+    """Store `code` under its content hash `sha`; rewrites nothing that exists."""
+    return blobs["2" if v == "2" else "1"].put(code, sha).as_posix()
+
+
+STREAMED = ("files", "blocks")
+
+
+def _value(first: Tuple[str, str, Any], events: Iterator) -> Any:
+    """Assemble one JSON value from the parse event `first` and those after it."""
+    builder = ijson.ObjectBuilder()
+    depth = 0
+    event = first
+    while True:
+        _, ev, val = event
+        builder.event(ev, val)
+        if ev in ("start_map", "start_array"):
+            depth += 1
+        elif ev in ("end_map", "end_array"):
+            depth -= 1
+        if depth == 0:
+            return builder.value
+        event = next(events)
+
+
+def _stream_raw(path: pathlib.Path) -> Iterator[Tuple[str, Any]]:
+    """Top-level (key, value) pairs of a raw payload, parsed incrementally.
+
+    Elements of the `files`/`blocks` arrays are yielded one by one as
+    (key, element), so only a single snippet is ever held in memory.
+    """
+    with open(path, "rb") as f:
+        events = ijson.parse(f, use_float=True)
+        for prefix, ev, key in events:
+            if prefix != "" or ev != "map_key":
+                continue
+            first = next(events)
+            if key in STREAMED and first[1] == "start_array":
+                for event in events:
+                    if event[0] == key and event[1] == "end_array":
+                        break
+                    yield key, _value(event, events)
+            else:
+                yield key, _value(first, events)
+
+
+_hasher: Optional[MinHasher] = None
+
+
+def init_hasher(params: str):
+    """Set up the MinHasher (`MinHasher.params`) that clean_file and
+    clean_payload fingerprint snippets with, in this process."""
+    global _hasher
+    num_perm, width, seed = map(int, params.split(":"))
+    _hasher = MinHasher(num_perm=num_perm, width=width, seed=seed)
+
+
+def _snippet(code: str, name_hint: str, entry: Dict[str, Any]) -> Dict[str, Any]:
     v = detect_cairo_version(code)
-    sub = V2 if v == "2" else V1
-    fname = (name_hint.replace("/", "__").replace(" ", "_"))[:100] + ".cairo"
-    (sub / fname).write_text(code)
-    return v, str((sub / fname).as_posix())
+    sha = content_hash(code)
+    entry["cairo_version"] = v
+    entry["code_sha"] = sha
+    return {
+        "code": code,
+        "sha": sha,
+        "sig": _hasher.signature(code),
+        "name_hint": name_hint,
+        "entry": entry,
+    }
+
+
+def _payload_items(payload: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """`_stream_raw` for a payload already in memory."""
+    for key, value in payload.items():
+        if key in STREAMED and isinstance(value, list):
+            for element in value:
+                yield key, element
+        else:
+            yield key, value
+
+
+def clean_file(path: pathlib.Path) -> Iterator[Dict[str, Any]]:
+    """Normalize, filter, classify and fingerprint every snippet of one raw file.
+
+    Pure per-file work, safe to run in a worker process; the dedup decision is
+    left to the caller.
+    """
+    return _clean_items(_stream_raw(path))
 
 
-def main():
-    seen: List[str] = []
-    index: List[Dict[str, Any]] = []
+def clean_payload(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """`clean_file` for a scraper payload that never went to disk."""
+    return _clean_items(_payload_items(payload))
 
-    for path, data in _iter_raw():
 
-        src = data.get("source") or data.get("meta", {}).get("source")
-        # github shape
-        if "files" in data and "meta" in data:
-            meta = data["meta"]
-            for rec in data["files"]:
+def _clean_items(items: Iterator[Tuple[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # Our scrapers write `meta`/`source` before the `files`/`blocks` arrays;
+    # entries that arrive before their header are held back until it shows up.
+    header: Dict[str, Any] = {}
+    pending: List[Tuple[str, Any]] = []
+    n_blocks = 0
+    for key, value in items:
+        if key not in STREAMED:
+            header[key] = value
+            if pending and ("meta" in header or "source" in header):
+                entries, pending = pending, []
+            else:
+                continue
+        elif "meta" not in header and "source" not in header:
+            pending.append((key, value))
+            continue
+        else:
+            entries = [(key, value)]
+
+        for key, value in entries:
+            # github shape
+            if key == "files" and "meta" in header:
+                meta, rec = header["meta"], value
                 code = normalize_indentation(strip_trailing_ws(rec["code"]))
                 # drops likely Cario 0.x: rough heuristic
                 if "from starkware" in code or "felt" in code and "fn " not in code:
                     continue
-                # dedup
-                if any(is_duplicate(code, s) for s in seen):
-                    continue
-                seen.append(code)
-                v, saved = _write_split(
-                    code, meta, meta["repo"]["full_name"] + "__" + rec["path"]
-                )
-                index.append(
-                    {
-                        "contract_name": rec["path"]
-                        .split("/")[-1]
-                        .replace(".cairo", ""),
-                        "source": "github",
-                        "type": "Other",
-                        "cairo_version": v,
-                        "last_updated": meta["repo"].get("last_commit", ""),
-                        "quality": {"category": "unknown"},
-                        "repo": meta["repo"],
-                        "code_path": saved,
-                    }
-                )
-
-        # docs/blog shape
-        elif "blocks" in data and "source" in data:
-            for i, code in enumerate(data["blocks"]):
-                code = normalize_indentation(strip_trailing_ws(code))
+                entry = {
+                    "contract_name": rec["path"].split("/")[-1].replace(".cairo", ""),
+                    "source": "github",
+                    "type": "Other",
+                    "cairo_version": "",
+                    "last_updated": meta["repo"].get("last_commit", ""),
+                    "quality": {"category": "unknown"},
+                    "repo": meta["repo"],
+                }
+                name_hint = meta["repo"]["full_name"] + "__" + rec["path"]
+                yield _snippet(code, name_hint, entry)
+
+            # docs/blog shape
+            elif key == "blocks" and "source" in header:
+                i, src = n_blocks, header["source"]
+                n_blocks += 1
+                code = normalize_indentation(strip_trailing_ws(value))
                 if len(code) < 40:
                     continue
-                if any(is_duplicate(code, s) for s in seen):
+                entry = {
+                    "contract_name": f"{src}_{i}",
+                    "source": src,
+                    "type": "Other",
+                    "cairo_version": "",
+                    "last_updated": "",
+                    "quality": {"category": "tutorial"},
+                    "repo": {},
+                }
+                yield _snippet(code, f"{src}_{i}", entry)
+
+
+def _clean_file_list(path: pathlib.Path) -> Optional[List[Dict[str, Any]]]:
+    """All of `path`'s snippets at once, for a pool worker to send back.
+
+    None for a file above POOL_MAX_BYTES: its list could be as large as the
+    file, so the caller streams it with clean_file instead.
+    """
+    if path.stat().st_size > POOL_MAX_BYTES:
+        return None
+    return list(clean_file(path))
+
+
+def main(full: bool = False, workers: int = 1):
+    """Clean and dedup new raw files into `index.json`.
+
+    Runs incrementally against the fingerprint store: raw files and snippets
+    processed by an earlier run are skipped, and their index entries kept.
+    A raw file that changed or disappeared first loses the entries it
+    produced, so the index holds what a full run would, possibly in another
+    order. One exception: a snippet dropped as a duplicate of one that has
+    since gone stays dropped until the next full run.
+    `full` drops the store and rebuilds from every raw file, then deletes
+    the files under cairo_v1/ and cairo_v2/ that no index entry points to.
+
+    Accepted snippets are stored content-addressed under cairo_v1/ and
+    cairo_v2/ (src/utils/blobs.py); index entries carry the snippet's
+    `code_sha` and the `code_path` of its blob.
+
+    With `workers > 1` the per-file cleaning runs in a process pool; results
+    are merged in raw-file order, so the output matches a serial run. A
+    worker returns a file's snippets as one list and at most 2 x workers
+    files are in flight, so results waiting to be merged hold roughly that
+    many raw files of up to POOL_MAX_BYTES; larger raw files are cleaned in
+    this process instead, streamed.
+    """
+    if full or not INDEX.exists():
+        FINGERPRINTS.unlink(missing_ok=True)
+    seen = NearDupIndex(threshold=0.98)
+    store = FingerprintStore(FINGERPRINTS, seen.hasher.params)
+    index: List[Dict[str, Any]] = (
+        json.loads(metrics.read_text(INDEX)) if len(store) else []
+    )
+    todo = list(_iter_raw(store))
+    paths = [path for path, _ in todo]
+    gone = [p for p in store.raw_paths() if not pathlib.Path(p).exists()]
+    stale = set()
+    for path in paths + gone:
+        stale.update(store.forget_raw(path))
+    if stale:
+        index = [e for e in index if e.get("code_sha") not in stale]
+    for sig, code_path in store.accepted():
+        seen.add(pathlib.Path(code_path), sig)
+
+    # one store per version for the whole run, so its stats add up
+    blobs = {v: BlobStore(d, ".cairo", FANOUT) for v, d in (("1", V1), ("2", V2))}
+    init_hasher(seen.hasher.params)
+    if workers > 1:
+        pool = multiprocessing.Pool(
+            workers, initializer=init_hasher, initargs=(seen.hasher.params,)
+        )
+        # worker results cross the process boundary one file at a time, and
+        # only 2 x workers files are in flight ahead of the merge
+        pooled = imap_window(pool, _clean_file_list, paths, 2 * workers)
+        results = (
+            clean_file(path) if snippets is None else snippets
+            for path, snippets in zip(paths, pooled)
+        )
+    else:
+        pool = None
+        results = map(clean_file, paths)
+
+    try:
+        done = zip(todo, results)
+        for (path, digest), snippets in tqdm(done, total=len(todo), desc="raw files"):
+            metrics.add("bytes_read", path.stat().st_size)
+            for s in snippets:
+                metrics.add("records")
+                # dedup
+                if store.has_snippet(s["sha"]):
+                    metrics.add("duplicates")
                     continue
-                seen.append(code)
-                v, saved = _write_split(code, data, f"{data.get('source')}_{i}")
-                index.append(
-                    {
-                        "contract_name": f"{data.get('source')}_{i}",
-                        "source": data["source"],
-                        "type": "Other",
-                        "cairo_version": v,
-                        "last_updated": "",
-                        "quality": {"category": "tutorial"},
-                        "repo": {},
-                        "code_path": saved,
-                    }
-                )
-    (PROC / "index.json").write_text(json.dumps(index, indent=2))
+                if seen.find_duplicate(s["code"], s["sig"]) is not None:
+                    store.add_snippet(s["sha"], raw_path=path)
+                    metrics.add("duplicates")
+                    continue
+                entry = s["entry"]
+                saved = _write_split(blobs, s["code"], entry["cairo_version"], s["sha"])
+                # by path: the code is only read back if it becomes a candidate
+                seen.add(pathlib.Path(saved), s["sig"])
+                store.add_snippet(s["sha"], s["sig"], saved, path)
+                entry["code_path"] = saved
+                index.append(entry)
+            store.mark_raw(path, digest)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    metrics.write_text(INDEX, json.dumps(index, indent=2))
+    store.close()
+    if full:
+        keep = {e["code_sha"] for e in index}
+        pruned = sum(b.prune(keep) for b in blobs.values())
+        if pruned:
+            print(f"pruned {pruned} unreferenced files from {V1} and {V2}")
+    for key in ("written", "existing", "pruned"):
+        metrics.add(f"blobs_{key}", sum(b.stats[key] for b in blobs.values()))
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--full", action="store_true", help="ignore the fingerprint store and rebuild"
+    )
+    ap.add_argument(
+        "--workers", type=int, default=1, help="processes for per-file cleaning"
+    )
+    args = ap.parse_args()
+    main(args.full, args.workers)
     # print(get_repo_tree("kkrt-labs", 'kakarot'))
     # print(len(search_repos("language: Cairo starknet", max_repos=2)))
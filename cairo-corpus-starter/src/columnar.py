@@ -0,0 +1,133 @@
+import itertools
+import pathlib
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from .schema import schema
+
+_props = schema["properties"]
+# enum fields are dictionary encoded against the schema's own value lists, so
+# every batch shares one dictionary and filters compare small ints
+LABELS = {
+    "source": _props["source"]["enum"],
+    "type": _props["type"]["enum"],
+    "cairo_version": _props["cairo_version"]["enum"],
+    "quality_category": _props["quality"]["properties"]["category"]["enum"],
+}
+_label = pa.dictionary(pa.int32(), pa.string())
+
+ARROW_SCHEMA = pa.schema(
+    [
+        ("contract_name", pa.string()),
+        ("source", _label),
+        ("type", _label),
+        ("cairo_version", _label),
+        ("last_updated", pa.string()),
+        ("quality_category", _label),
+        ("quality_score", pa.float64()),
+        ("repo_url", pa.string()),
+        ("repo_full_name", pa.string()),
+        ("repo_stars", pa.int64()),
+        ("repo_forks", pa.int64()),
+        ("repo_last_commit", pa.string()),
+        ("repo_archived", pa.bool_()),
+        ("code", pa.large_string()),
+    ]
+)
+
+
+def flatten(rec: Dict[str, Any]) -> Dict[str, Any]:
+    """One JSONL record as a row of ARROW_SCHEMA."""
+    quality = rec.get("quality") or {}
+    repo = rec.get("repo") or {}
+    return {
+        "contract_name": rec["contract_name"],
+        "source": rec["source"],
+        "type": rec["type"],
+        "cairo_version": rec["cairo_version"],
+        "last_updated": rec.get("last_updated", ""),
+        "quality_category": quality.get("category"),
+        "quality_score": quality.get("score"),
+        "repo_url": repo.get("url"),
+        "repo_full_name": repo.get("full_name"),
+        "repo_stars": repo.get("stars"),
+        "repo_forks": repo.get("forks"),
+        "repo_last_commit": repo.get("last_commit"),
+        "repo_archived": repo.get("archived"),
+        "code": rec["code"],
+    }
+
+
+_LOOKUP = {col: {v: i for i, v in enumerate(vals)} for col, vals in LABELS.items()}
+_DICTS = {col: pa.array(vals, pa.string()) for col, vals in LABELS.items()}
+
+
+def _batches(src: str, batch_size: int) -> Iterator[pa.RecordBatch]:
+    with open(src, "rb") as f:
+        while True:
+            rows = [flatten(orjson.loads(ln)) for ln in itertools.islice(f, batch_size)]
+            if not rows:
+                return
+            arrays = []
+            for field in ARROW_SCHEMA:
+                values = [r[field.name] for r in rows]
+                if field.name in LABELS:
+                    lookup = _LOOKUP[field.name]
+                    idx = pa.array([lookup.get(v) for v in values], pa.int32())
+                    arrays.append(
+                        pa.DictionaryArray.from_arrays(idx, _DICTS[field.name])
+                    )
+                else:
+                    arrays.append(pa.array(values, field.type))
+            yield pa.RecordBatch.from_arrays(arrays, schema=ARROW_SCHEMA)
+
+
+def export(
+    src: str = "data/processed/dataset.jsonl",
+    out_dir: str = "data/processed/columnar",
+    batch_size: int = 10_000,
+) -> Dict[str, str]:
+    """Write `dataset.parquet` and `dataset.arrow` from the JSONL `src`.
+
+    The Arrow IPC file is uncompressed so `load` can memory-map it; Parquet
+    is the compact copy for storage and other tools.
+    """
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    paths = {
+        "parquet": str(out / "dataset.parquet"),
+        "arrow": str(out / "dataset.arrow"),
+    }
+    with pq.ParquetWriter(
+        paths["parquet"], ARROW_SCHEMA, compression="zstd"
+    ) as pw, ipc.new_file(paths["arrow"], ARROW_SCHEMA) as aw:
+        for batch in _batches(src, batch_size):
+            pw.write_batch(batch)
+            aw.write_batch(batch)
+    return paths
+
+
+def load(path: str, columns: Optional[List[str]] = None) -> pa.Table:
+    """Open an export, reading only `columns`.
+
+    `.arrow` files are memory-mapped, so columns that are never touched are
+    never read from disk; `.parquet` files only decode the requested columns.
+    """
+    if path.endswith(".parquet"):
+        return pq.read_table(path, columns=columns)
+    table = ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.select(columns) if columns else table
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default="data/processed/dataset.jsonl")
+    ap.add_argument("--out", default="data/processed/columnar")
+    args = ap.parse_args()
+    print("Wrote", export(args.src, args.out))
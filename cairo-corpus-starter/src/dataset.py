@@ -0,0 +1,103 @@
+import mmap
+import pathlib
+import random
+from typing import Any, Dict, Iterator, List, Sequence, Union
+
+import numpy as np
+import orjson
+
+IDX_DTYPE = np.dtype("<u8")
+
+
+def index_path(path: Union[str, pathlib.Path]) -> pathlib.Path:
+    return pathlib.Path(str(path) + ".idx")
+
+
+def write_index(path: Union[str, pathlib.Path], offsets: Sequence[int], size: int):
+    """Persist record start offsets plus the end-of-file offset as the sidecar."""
+    np.asarray(list(offsets) + [size], dtype=IDX_DTYPE).tofile(index_path(path))
+
+
+def build_index(path: Union[str, pathlib.Path]) -> pathlib.Path:
+    """Scan `path` once for line starts and write the sidecar index."""
+    offsets, pos = [], 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                offsets.append(pos)
+            pos += len(line)
+    write_index(path, offsets, pos)
+    return index_path(path)
+
+
+class Dataset:
+    """Random access to the records of a JSONL dataset.
+
+    The dataset is memory-mapped and record `i` is located through the
+    `<path>.idx` sidecar (uint64 offsets written by build_jsonl), so reading
+    one record touches only that record's bytes. A missing or stale sidecar
+    is rebuilt with one sequential scan.
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path] = "data/processed/dataset.jsonl"):
+        self.path = pathlib.Path(path)
+        self._f = open(self.path, "rb")
+        size = self.path.stat().st_size
+        self._mm = (
+            mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+        idx = index_path(self.path)
+        if not idx.exists() or not self._index_ok(idx, size):
+            build_index(self.path)
+        self._offsets = np.memmap(idx, dtype=IDX_DTYPE, mode="r")
+
+    @staticmethod
+    def _index_ok(idx: pathlib.Path, size: int) -> bool:
+        n = idx.stat().st_size // IDX_DTYPE.itemsize
+        if n == 0:
+            return False
+        end = np.memmap(
+            idx,
+            dtype=IDX_DTYPE,
+            mode="r",
+            offset=(n - 1) * IDX_DTYPE.itemsize,
+            shape=(1,),
+        )
+        return int(end[0]) == size
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def raw(self, i: int) -> bytes:
+        """Bytes of record `i`, including its trailing newline."""
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        return self._mm[int(self._offsets[i]) : int(self._offsets[i + 1])]
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return orjson.loads(self.raw(i))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def sample(self, k: int, seed: int = 0) -> List[Dict[str, Any]]:
+        """`k` distinct records picked uniformly, reproducible for a given seed."""
+        return [self[i] for i in random.Random(seed).sample(range(len(self)), k)]
+
+    def close(self):
+        del self._offsets
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from .utils import metrics
+
+STATE_PATH = pathlib.Path("data/cache/stages.json")
+
+
+def fingerprint(paths: Iterable[str]) -> str:
+    """Hash of the (path, size, mtime) of every file under `paths`.
+
+    Directories are walked recursively; missing paths hash as missing, so
+    deleting an output makes its stage stale.
+    """
+    h = hashlib.sha256()
+    for p in sorted(str(p) for p in paths):
+        root = pathlib.Path(p)
+        if not root.exists():
+            h.update(f"{p}\0missing\n".encode())
+            continue
+        files = sorted(root.rglob("*")) if root.is_dir() else [root]
+        for f in files:
+            if f.is_file():
+                st = f.stat()
+                h.update(f"{f.as_posix()}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+class Stage:
+    """One step of the pipeline.
+
+    `inputs`/`outputs` are the local files or directories the stage reads and
+    writes; `params` are the arguments that change its result. A stage whose
+    inputs, outputs and params match its last successful run is up to date.
+    Stages that read from the network can't see remote changes, so they also
+    go stale `max_age` seconds after their last run.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[], Any],
+        deps: Sequence[str] = (),
+        inputs: Sequence[str] = (),
+        outputs: Sequence[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        max_age: Optional[float] = None,
+    ):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.params = params or {}
+        self.max_age = max_age
+
+    def params_key(self) -> str:
+        return hashlib.sha256(
+            json.dumps(self.params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+
+class Pipeline:
+    """Runs stages in dependency order, independent ones in parallel.
+
+    Each stage is checked right before it would run (after its dependencies
+    finished), so a dependency that ran but left its outputs unchanged does
+    not wake up the stages after it. Fingerprints of successful runs are kept
+    in `state_path`, and `metrics` holds what each stage of the last run did
+    (see src/utils/metrics.py).
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        state_path: pathlib.Path = STATE_PATH,
+        workers: int = 3,
+    ):
+        self.stages = {s.name: s for s in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("duplicate stage names")
+        for s in stages:
+            missing = [d for d in s.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"stage {s.name!r} depends on unknown {missing}")
+        self.order = self._toposort()
+        self.state_path = pathlib.Path(state_path)
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def _toposort(self) -> List[str]:
+        order, state = [], {}
+
+        def visit(name, trail=()):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"dependency cycle: {' -> '.join(trail + (name,))}")
+            state[name] = "visiting"
+            for d in self.stages[name].deps:
+                visit(d, trail + (name,))
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def downstream(self, name: str) -> List[str]:
+        """`name` and every stage that depends on it, in run order."""
+        if name not in self.stages:
+            raise KeyError(f"unknown stage {name!r}; stages: {', '.join(self.order)}")
+        out = {name}
+        for n in self.order:
+            if any(d in out for d in self.stages[n].deps):
+                out.add(n)
+        return [n for n in self.order if n in out]
+
+    def _load_state(self) -> Dict[str, Dict[str, Any]]:
+        if self.state_path.exists():
+            return json.loads(self.state_path.read_text())
+        return {}
+
+    def _save_state(self, state: Dict[str, Dict[str, Any]]):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state, indent=2, sort_keys=True))
+        os.replace(tmp, self.state_path)
+
+    def stale_reason(self, stage: Stage, record: Optional[Dict[str, Any]]):
+        """Why `stage` has to run, or None when it is up to date."""
+        if record is None:
+            return "never run"
+        if record["params"] != stage.params_key():
+            return "parameters changed"
+        if record["inputs"] != fingerprint(stage.inputs):
+            return "inputs changed"
+        if record["outputs"] != fingerprint(stage.outputs):
+            return "outputs changed"
+        if stage.max_age is not None and time.time() - record["at"] > stage.max_age:
+            return "older than max_age"
+        return None
+
+    def run(
+        self,
+        start: Optional[str] = None,
+        force: bool = False,
+        profile: Sequence[str] = (),
+        profiler: str = "cprofile",
+        profile_dir: pathlib.Path = metrics.PROFILE_DIR,
+    ) -> Dict[str, str]:
+        """Bring the pipeline up to date; returns each stage's status.
+
+        `start` re-runs that stage and everything downstream of it regardless
+        of fingerprints; `force` re-runs everything. Statuses: "ran",
+        "up to date", "failed" or "blocked" (a dependency failed). Stages
+        named in `profile` run under `profiler` ("cprofile" or "sample"),
+        writing to `profile_dir`.
+        """
+        forced = set(self.order if force else self.downstream(start) if start else ())
+        unknown = [n for n in profile if n not in self.stages]
+        if unknown:
+            raise KeyError(f"unknown stage {unknown}; stages: {', '.join(self.order)}")
+        if profiler not in metrics.PROFILERS:
+            raise ValueError(f"unknown profiler {profiler!r}")
+        state = self._load_state()
+        status: Dict[str, str] = {}
+        running = {}
+        self.metrics = {}
+
+        def execute(stage: Stage, reason: str):
+            print(f"[{stage.name}] running ({reason})")
+            mode = profiler if stage.name in profile else None
+            try:
+                with metrics.stage(stage.name, mode, profile_dir) as m:
+                    stage.run()
+            finally:
+                self.metrics[stage.name] = m.to_dict()
+            rec = {
+                "params": stage.params_key(),
+                "inputs": fingerprint(stage.inputs),
+                "outputs": fingerprint(stage.outputs),
+                "at": time.time(),
+            }
+            with self.lock:
+                state[stage.name] = rec
+                self._save_state(state)
+            done = self.metrics[stage.name]
+            print(
+                f"[{stage.name}] done in {done['wall_s']:.1f}s "
+                f"({done.get('records', 0)} records, "
+                f"{done.get('http_requests', 0)} HTTP requests)"
+            )
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while len(status) < len(self.order):
+                for name in self.order:
+                    if name in status or name in running:
+                        continue
+                    stage = self.stages[name]
+                    deps = [status.get(d) for d in stage.deps]
+                    if any(d in ("failed", "blocked") for d in deps):
+                        status[name] = "blocked"
+                        continue
+                    if any(d is None for d in deps):
+                        continue
+                    reason = (
+                        "forced"
+                        if name in forced
+                        else self.stale_reason(stage, state.get(name))
+                    )
+                    if reason is None:
+                        print(f"[{name}] up to date")
+                        status[name] = "up to date"
+                        continue
+                    running[name] = pool.submit(execute, stage, reason)
+                if not running:
+                    continue
+                done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+                for name, fut in list(running.items()):
+                    if fut in done:
+                        del running[name]
+                        if fut.exception() is not None:
+                            exc = fut.exception()
+                            traceback.print_exception(type(exc), exc, exc.__traceback__)
+                            status[name] = "failed"
+                        else:
+                            status[name] = "ran"
+        return {n: status[n] for n in self.order}
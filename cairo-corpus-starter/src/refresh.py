@@ -1,18 +1,164 @@
+import datetime
+import json
+import pathlib
+import time
+from typing import Dict, Optional, Sequence
+
 from .build_jsonl import main as build_jsonl
+from .clean_standardize import FINGERPRINTS, INDEX, RAW
 from .clean_standardize import main as clean_std
+from .pipeline import Pipeline, Stage
+from .scrape_blogs import RAW_DIR as BLOGS_DIR
 from .scrape_blogs import main as scrape_blogs
+from .scrape_docs import RAW_DIR as DOCS_DIR
+from .scrape_docs import generate_doc_urls
 from .scrape_docs import main as scrape_docs
+from .scrape_github import RAW_DIR as GITHUB_DIR
 from .scrape_github import main as scrape_github
+from .utils.metrics import PROFILE_DIR
+
+DATASET = "data/processed/dataset.jsonl"
+DAY = 24 * 3600
+# per-stage metrics of the last refresh
+REPORT_PATH = pathlib.Path("data/cache/refresh_report.json")
+
+
+def _docs(max_items: int):
+    generate_doc_urls()
+    scrape_docs(max_items=max_items)
+
 
+def stages(
+    query: str = "language:Cairo starknet",
+    max_repos: int = 30,
+    max_items: int = 30,
+    feeds: str = "feeds.txt",
+    max_age: float = DAY,
+):
+    """The refresh graph: three independent scrapes, then clean, then build."""
+    return [
+        Stage(
+            "github",
+            lambda: scrape_github(query=query, max_repos=max_repos),
+            outputs=[str(GITHUB_DIR)],
+            params={"query": query, "max_repos": max_repos},
+            max_age=max_age,
+        ),
+        Stage(
+            "docs",
+            lambda: _docs(max_items),
+            outputs=[str(DOCS_DIR)],
+            params={"max_items": max_items},
+            max_age=max_age,
+        ),
+        Stage(
+            "blogs",
+            lambda: scrape_blogs(feeds_file=feeds, max_items=max_items),
+            inputs=[feeds],
+            outputs=[str(BLOGS_DIR)],
+            params={"max_items": max_items},
+            max_age=max_age,
+        ),
+        Stage(
+            "clean",
+            clean_std,
+            deps=["github", "docs", "blogs"],
+            inputs=[str(RAW)],
+            # not cairo_v1/ and cairo_v2/: stat-ing every blob would make the
+            # up-to-date check grow with the corpus, and blobs are named by
+            # the code_sha the index records anyway
+            outputs=[str(INDEX), str(FINGERPRINTS)],
+        ),
+        Stage(
+            "build",
+            lambda: build_jsonl(out_path=DATASET, incremental=True),
+            deps=["clean"],
+            inputs=[str(INDEX)],
+            outputs=[DATASET],
+        ),
+    ]
 
-def refresh():
-    # Example orchestrator
-    scrape_github(query="language:Cairo starknet", max_repos=30)
-    scrape_docs(max_items=30)
-    scrape_blogs(max_items=30)
-    clean_std()
-    build_jsonl(out_path="data/processed/dataset.jsonl")
+
+def refresh(
+    start: Optional[str] = None,
+    force: bool = False,
+    max_age: float = DAY,
+    profile: Sequence[str] = (),
+    profiler: str = "cprofile",
+    report_path: pathlib.Path = REPORT_PATH,
+    profile_dir: pathlib.Path = PROFILE_DIR,
+) -> Dict[str, str]:
+    """Bring the dataset up to date, skipping stages whose inputs didn't change.
+
+    The scrapes run in parallel; they are re-run when their parameters or
+    local inputs (feeds.txt) change, or once `max_age` seconds old. `start`
+    re-runs that stage and everything after it.
+
+    Each stage's status, wall time, records/s, bytes read/written, HTTP
+    requests, cache hits and rate-limit sleep are written to `report_path`
+    as JSON. Stages named in `profile` run under `profiler` (see
+    src/utils/metrics.py) with output in `profile_dir`; the report points at
+    their profiles.
+    """
+    pipeline = Pipeline(stages(max_age=max_age))
+    started = datetime.datetime.now(datetime.timezone.utc)
+    t0 = time.perf_counter()
+    status = pipeline.run(
+        start=start,
+        force=force,
+        profile=profile,
+        profiler=profiler,
+        profile_dir=profile_dir,
+    )
+    report = {
+        "started_at": started.isoformat(timespec="seconds"),
+        "wall_s": round(time.perf_counter() - t0, 3),
+        "stages": {
+            name: {"status": s, **pipeline.metrics.get(name, {})}
+            for name, s in status.items()
+        },
+    }
+    report_path = pathlib.Path(report_path)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2))
+    print("Run report:", report_path)
+    return status
 
 
 if __name__ == "__main__":
-    refresh()
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument(
+        "--from",
+        dest="start",
+        default=None,
+        help="re-run this stage and everything after it (github, docs, blogs, clean, build)",
+    )
+    ap.add_argument("--force", action="store_true", help="re-run every stage")
+    ap.add_argument(
+        "--max_age_h", type=float, default=24, help="re-scrape sources older than this"
+    )
+    ap.add_argument(
+        "--profile",
+        default="",
+        help="comma-separated stages to profile into data/cache/profiles",
+    )
+    ap.add_argument(
+        "--profiler",
+        choices=["cprofile", "sample"],
+        default="cprofile",
+        help="cProfile of the stage thread, or stack samples of all its threads",
+    )
+    ap.add_argument("--report", default=str(REPORT_PATH), help="JSON run report")
+    args = ap.parse_args()
+    print(
+        refresh(
+            args.start,
+            args.force,
+            args.max_age_h * 3600,
+            [s for s in args.profile.split(",") if s],
+            args.profiler,
+            pathlib.Path(args.report),
+        )
+    )
@@ -1,91 +1,211 @@
+import datetime
 import json
 import os
 import pathlib
 import re
-import time
-from datetime import datetime
+import sqlite3
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
 
-import requests
-from bs4 import BeautifulSoup
+from tqdm import tqdm
 
-import tests.test_schema
+from .utils import http, metrics
+from .utils.html_code import extract_code_blocks
+from .utils.ratelimit import RateLimiter
 
 RAW_DIR = pathlib.Path("data/raw/blogs")
 RAW_DIR.mkdir(parents=True, exist_ok=True)
+# GUIDs of feed entries already ingested, so re-runs only fetch new posts
+SEEN_DB = pathlib.Path(os.getenv("BLOGS_SEEN", "data/cache/blogs.sqlite"))
+
+ATOM = "{http://www.w3.org/2005/Atom}"
 
 
 def fetch(url: str) -> str:
-    r = requests.get(url, timeout=30)
+    r = http.session().get(url)
     r.raise_for_status()
     return r.text
 
 
-def extract_code(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-    out = []
-    for pre in soup.find_all(["pre", "code"]):
-        txt = pre.get_text("\n")
-        if (
-            "use::core" in txt
-            or "starknet::" in txt
-            or "pub" in txt
-            or "mod" in txt
-            or "fn " in txt
-        ):
-            out.append(txt)
+def _text(el: Optional[ET.Element]) -> str:
+    return (el.text or "").strip() if el is not None else ""
+
+
+def parse_feed(xml: str) -> List[Dict[str, str]]:
+    """Entries of an RSS 2.0 or Atom feed as {guid, link, title, published}.
+
+    Raises ValueError when `xml` is not a feed.
+    """
+    try:
+        root = ET.fromstring(xml.lstrip())
+    except ET.ParseError as e:
+        raise ValueError(f"not a feed: {e}") from None
+    entries = []
+    if root.tag == "rss" or root.find("channel") is not None:
+        for item in root.iter("item"):
+            link = _text(item.find("link"))
+            entries.append(
+                {
+                    "guid": _text(item.find("guid")) or link,
+                    "link": link,
+                    "title": _text(item.find("title")),
+                    "published": _text(item.find("pubDate")),
+                }
+            )
+    elif root.tag == f"{ATOM}feed":
+        for entry in root.iter(f"{ATOM}entry"):
+            link = ""
+            for el in entry.findall(f"{ATOM}link"):
+                if el.get("rel", "alternate") == "alternate":
+                    link = el.get("href", "")
+                    break
+            entries.append(
+                {
+                    "guid": _text(entry.find(f"{ATOM}id")) or link,
+                    "link": link,
+                    "title": _text(entry.find(f"{ATOM}title")),
+                    "published": _text(entry.find(f"{ATOM}published"))
+                    or _text(entry.find(f"{ATOM}updated")),
+                }
+            )
+    else:
+        raise ValueError(f"not a feed: <{root.tag}>")
+    return [e for e in entries if e["link"].startswith("http")]
+
+
+def _seen_db() -> sqlite3.Connection:
+    SEEN_DB.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(SEEN_DB)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS seen "
+        "(guid TEXT PRIMARY KEY, url TEXT, fetched_at TEXT)"
+    )
+    return db
+
 
-    return out
+def _feed_entries(feed: str) -> List[Dict[str, str]]:
+    """Entries of `feed`; a URL that isn't a feed is taken as a single post."""
+    try:
+        return parse_feed(fetch(feed))
+    except ValueError:
+        return [{"guid": feed, "link": feed, "title": "", "published": ""}]
 
 
-def main(feeds_file: str = "feeds.txt", max_items: int = 50):
-    feeds = [
+def _out_path(link: str) -> pathlib.Path:
+    return RAW_DIR / (
+        "blog_" + re.sub(r"[^a-z0-9]+", "_", link.lower())[:150] + ".json"
+    )
+
+
+def _read_feeds(feeds_file: str) -> List[str]:
+    return [
         ln.strip()
         for ln in pathlib.Path(feeds_file).read_text().splitlines()
         if ln.strip() and not ln.startswith("#")
     ]
-    print(feeds)
-    n = 0
+
+
+def _new_entries(feeds: List[str], seen: Set[str]) -> List[Dict[str, str]]:
+    """Entries of every feed whose GUID is not in `seen`, first occurrence kept."""
+    entries, queued = [], set()
     for feed in feeds:
         try:
-            xml = fetch(feed)
-            code = extract_code(xml)
+            found = _feed_entries(feed)
+        except Exception as e:
+            print("skip feed", feed, e)
+            continue
+        for entry in found:
+            if entry["guid"] not in seen and entry["guid"] not in queued:
+                queued.add(entry["guid"])
+                entries.append(entry)
+    return entries
 
-            file_name = os.path.join(
-                RAW_DIR,
-                f'cairo_blog_{datetime.now().strftime("%d-%m-%Y %H-%M-%S")}.txt',
-            )
-            print(file_name)
 
-            with open(file_name, "a") as file:
-                for c in code:
-                    try:
-                        file.write(c + "\n")
-                    except Exception as e:
-                        print(e)
+def _posts(
+    entries: List[Dict[str, str]], concurrency: int, rate: float
+) -> Iterator[Tuple[Dict[str, str], Optional[List[str]]]]:
+    """(entry, code blocks) in order; blocks are None when the post failed to load."""
+    limiter = RateLimiter({"core": rate}, burst=concurrency)
 
+    def post(entry):
+        link = entry["link"]
+        try:
+            r = limiter.request(urlsplit(link).netloc, lambda: http.session().get(link))
+            r.raise_for_status()
         except Exception as e:
-            print("skip feed", feed, e)
-            continue
+            print("skip post", link, e)
+            return entry, None
+        return entry, extract_code_blocks(r.text)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        yield from pool.map(metrics.bind(post), entries)
+
+
+def _payload(entry: Dict[str, str], codes: List[str]) -> Dict[str, Any]:
+    return {
+        "source": "blog",
+        "url": entry["link"],
+        "title": entry["title"],
+        "published": entry["published"],
+        "blocks": codes,
+    }
+
+
+def main(
+    feeds_file: str = "feeds.txt",
+    max_items: int = 50,
+    concurrency: int = 4,
+    rate: float = 2.0,
+):
+    """Ingest new posts from the feeds listed in `feeds_file`.
+
+    Feed entries whose GUID was ingested by an earlier run are skipped; the
+    remaining posts are fetched `concurrency` at a time (at most `rate`
+    requests/s per host) and their code blocks written as blog JSON for
+    clean_standardize.
+    """
+    db = _seen_db()
+    seen = {row[0] for row in db.execute("SELECT guid FROM seen")}
+    entries = _new_entries(_read_feeds(feeds_file), seen)[:max_items]
 
-        # For Naive XML based RSS Parsing...
-        # # naive RSS parse to avoid extra deps
-        # links = re.findall(r"<link>(.*?)</link>", xml)
-        # # filter obvious platform links
-        # links = [l for l in links if l.startswith("http")]
-        # for link in links[:max_items]:
-        #     try:
-        #         html = fetch(link)
-        #         codes = extract_code(html)
-        #         print(codes)
-        #         if codes:
-        #             out = RAW_DIR / ("blog_" + re.sub(r"[^a-z0-9]+","_", link.lower())[:150] + ".json")
-        #             out.write_text(json.dumps({"source":"blog","url":link,"blocks":codes}, indent=2))
-        #             n += 1
-
-        #     except Exception as e:
-        #         print("skip post", link, e)
-        # if n >= max_items:
-        #     break
+    n = 0
+    for entry, codes in tqdm(
+        _posts(entries, concurrency, rate), total=len(entries), desc="posts"
+    ):
+        if codes is None:
+            continue
+        if codes:
+            metrics.write_text(
+                _out_path(entry["link"]), json.dumps(_payload(entry, codes), indent=2)
+            )
+            metrics.add("records", len(codes))
+            n += 1
+        db.execute(
+            "INSERT OR REPLACE INTO seen VALUES (?, ?, ?)",
+            (entry["guid"], entry["link"], datetime.datetime.now().isoformat()),
+        )
+        db.commit()
+    db.close()
+    print(f"{n} posts with code out of {len(entries)} new entries")
+
+
+def iter_posts(
+    feeds_file: str = "feeds.txt",
+    max_items: int = 50,
+    concurrency: int = 4,
+    rate: float = 2.0,
+) -> Iterator[Dict[str, Any]]:
+    """The payloads `main` would write, yielded instead.
+
+    Every entry of the feeds is fetched: the GUIDs in SEEN_DB are neither
+    consulted nor updated.
+    """
+    entries = _new_entries(_read_feeds(feeds_file), set())[:max_items]
+    for entry, codes in _posts(entries, concurrency, rate):
+        if codes:
+            yield _payload(entry, codes)
 
 
 if __name__ == "__main__":
@@ -94,5 +214,7 @@ if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--feeds", default="feeds.txt")
     ap.add_argument("--max_items", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=4, help="posts in flight")
+    ap.add_argument("--rate", type=float, default=2.0, help="requests/s per host")
     args = ap.parse_args()
-    main(args.feeds, args.max_items)
+    main(args.feeds, args.max_items, args.concurrency, args.rate)
@@ -1,74 +1,190 @@
+import itertools
 import json
+import os
 import pathlib
+import posixpath
 import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
 
-import requests
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 
+from .utils import http, metrics
+from .utils.html_code import extract_code_blocks
+from .utils.http_cache import ResponseCache
+from .utils.ratelimit import RateLimiter
+
 RAW_DIR = pathlib.Path("data/raw/docs")
 RAW_DIR.mkdir(parents=True, exist_ok=True)
+# page bodies + ETag/Last-Modified, so refreshes revalidate instead of re-fetching;
+# set DOCS_CACHE= (empty) to disable
+PAGE_CACHE = os.getenv("DOCS_CACHE", "data/cache/docs.sqlite")
+
+BOOK_URL = "https://www.starknet.io/cairo-book/"
+INDEX_PAGE = "ch07-05-separating-modules-into-different-files.html"
 
 DOC_URLS = []
 
 
-def generate_doc_urls():
+def canonical_url(url: str, base: str = BOOK_URL) -> str:
+    """Absolute form of `url` with the fragment, default port and dot segments removed."""
+    parts = urlsplit(urljoin(base, url.strip()))
+    scheme, host = parts.scheme.lower(), (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = posixpath.normpath(parts.path) if parts.path else "/"
+    if parts.path.endswith("/") and not path.endswith("/"):
+        path += "/"
+    return urlunsplit((scheme, host, path, parts.query, ""))
+
+
+def dedupe_urls(urls: Iterable[str], base: str = BOOK_URL) -> List[str]:
+    """Canonicalize `urls`, keeping the first occurrence of each page."""
+    seen, out = set(), []
+    for u in urls:
+        c = canonical_url(u, base)
+        if c not in seen:
+            seen.add(c)
+            out.append(c)
+    return out
+
+
+def generate_doc_urls(index_url: str = BOOK_URL + INDEX_PAGE) -> List[str]:
 
     global DOC_URLS
 
     # Fetch the whole docs.
-    response = requests.get(
-        "https://www.starknet.io/cairo-book/ch07-05-separating-modules-into-different-files.html"
-    )
+    response = http.session().get(index_url)
     soup = BeautifulSoup(response.text, "html.parser")
 
     # Find all <li> elements with class "chapter-item expanded"
     chapter_items = soup.find_all("li", class_="chapter-item expanded")
 
-    # Extract <a> tags inside those <li> elements
-    for item in chapter_items:
-        a_tags = item.find_all("a", href=True)
-        for a in a_tags:
-            DOC_URLS.append(f"https://www.starknet.io/cairo-book/{a["href"]}")
-
-
-def extract_code_blocks(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-    blocks = []
-    for code in soup.find_all("code"):
-        txt = code.get_text("\n")
-        if (
-            "use::core" in txt
-            or "starknet::" in txt
-            or "pub" in txt
-            or "mod" in txt
-            or "fn " in txt
-        ):
-            blocks.append(txt)
-    return blocks
-
-
-def main(max_items: int = 50):
-    count = 0
-    for url in tqdm(DOC_URLS, desc="docs"):
+    # Extract <a> tags inside those <li> elements; the sidebar repeats pages
+    # and links to sections by anchor, so keep one canonical URL per page
+    hrefs = [a["href"] for item in chapter_items for a in item.find_all("a", href=True)]
+    DOC_URLS = dedupe_urls(hrefs, base=index_url)
+    return DOC_URLS
+
+
+def _out_path(url: str) -> pathlib.Path:
+    return RAW_DIR / ("docs_" + re.sub(r"[^a-z0-9]+", "_", url.lower()) + ".json")
+
+
+def fetch_page(
+    url: str, cache: Optional[ResponseCache], limiter: RateLimiter
+) -> Tuple[str, bool]:
+    """Body of `url` and whether it changed since it was cached.
+
+    Known pages are revalidated with If-None-Match/If-Modified-Since; a 304
+    is served from the cache.
+    """
+    h = cache.conditional_headers(url) if cache is not None else {}
+    r = limiter.request(
+        urlsplit(url).netloc, lambda: http.session().get(url, headers=h)
+    )
+    if cache is not None and r.status_code == 304:
+        return cache.replay(url, r).text, False
+    r.raise_for_status()
+    if cache is not None:
+        cache.store(url, r)
+    return r.text, True
+
+
+def _ordered(pool: ThreadPoolExecutor, fn, items: List, window: int) -> Iterator:
+    """pool.map that keeps at most `window` calls queued, so stopping early is cheap."""
+    it = iter(items)
+    pending = [pool.submit(fn, x) for x in itertools.islice(it, window)]
+    while pending:
+        fut = pending.pop(0)
+        for x in itertools.islice(it, 1):
+            pending.append(pool.submit(fn, x))
+        yield fut
+
+
+def _pages(
+    urls: List[str],
+    cache: Optional[ResponseCache],
+    limiter: RateLimiter,
+    concurrency: int,
+) -> Iterator[Tuple[str, Optional[List[str]]]]:
+    """(url, code blocks) for `urls` in order, `concurrency` pages at a time.
+
+    Blocks are None for a page that revalidated as unchanged and already has
+    its output; a page that failed to load has none.
+    """
+
+    def crawl(url):
         try:
-            r = requests.get(url, timeout=30)
-            r.raise_for_status()
-            blocks = extract_code_blocks(r.text)
+            html, changed = fetch_page(url, cache, limiter)
         except Exception as e:
             print("skip", url, e)
-            continue
-        if not blocks:
-            continue
-        out = RAW_DIR / ("docs_" + re.sub(r"[^a-z0-9]+", "_", url.lower()) + ".json")
-        out.write_text(
-            json.dumps(
-                {"source": "docs", "url": url, "blocks": blocks[:max_items]}, indent=2
+            return url, []
+        if not changed and _out_path(url).exists():
+            return url, None
+        return url, extract_code_blocks(html)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            for fut in _ordered(pool, metrics.bind(crawl), urls, 2 * concurrency):
+                yield fut.result()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+
+def main(max_items: int = 50, concurrency: int = 4, rate: float = 4.0):
+    """Crawl DOC_URLS, `concurrency` pages at a time and at most `rate`/s per host.
+
+    Pages that revalidate as unchanged and already have their output are not
+    parsed again.
+    """
+    cache = ResponseCache(pathlib.Path(PAGE_CACHE)) if PAGE_CACHE else None
+    limiter = RateLimiter({"core": rate}, burst=concurrency)
+    urls = dedupe_urls(DOC_URLS)
+
+    count = unchanged = 0
+    pages = _pages(urls, cache, limiter, concurrency)
+    for url, blocks in tqdm(pages, total=len(urls), desc="docs"):
+        if blocks is None:
+            unchanged += 1
+            count += 1
+        elif blocks:
+            metrics.write_text(
+                _out_path(url),
+                json.dumps(
+                    {"source": "docs", "url": url, "blocks": blocks[:max_items]},
+                    indent=2,
+                ),
             )
-        )
-        count += 1
+            metrics.add("records", len(blocks[:max_items]))
+            count += 1
         if count >= max_items:
             break
+    pages.close()
+    if cache is not None:
+        cache.close()
+    print(f"{count} pages written ({unchanged} unchanged)")
+
+
+def iter_pages(
+    max_items: int = 50, concurrency: int = 4, rate: float = 4.0
+) -> Iterator[Dict[str, Any]]:
+    """The payloads `main` would write, yielded instead; no page cache is used."""
+    limiter = RateLimiter({"core": rate}, burst=concurrency)
+    pages = _pages(dedupe_urls(DOC_URLS), None, limiter, concurrency)
+    count = 0
+    try:
+        for url, blocks in pages:
+            if not blocks:
+                continue
+            yield {"source": "docs", "url": url, "blocks": blocks[:max_items]}
+            count += 1
+            if count >= max_items:
+                break
+    finally:
+        pages.close()
 
 
 if __name__ == "__main__":
@@ -76,8 +192,10 @@ if __name__ == "__main__":
 
     ap = argparse.ArgumentParser()
     ap.add_argument("--max_items", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=4, help="pages in flight")
+    ap.add_argument("--rate", type=float, default=4.0, help="requests/s per host")
     args = ap.parse_args()
 
     # Generate all possible URL's that can contain .cairo files from the docs.
     generate_doc_urls()
-    main(args.max_items)
+    main(args.max_items, args.concurrency, args.rate)
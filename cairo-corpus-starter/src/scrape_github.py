@@ -1,16 +1,34 @@
+import asyncio
 import datetime
 import json
 import os
 import pathlib
 import re
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
 
 from tqdm import tqdm
 
-from .utils.github_api import get_file, get_repo_tree, search_repos
+from .utils import metrics
+from .utils.checkpoint import ScrapeJournal
+from .utils.github_api import (
+    BLOB_BATCH,
+    get_default_branch,
+    get_file,
+    get_files_batch,
+    get_repo_archive,
+    get_repos_batch,
+    get_tree,
+    search_repos,
+)
+from .utils.repo_state import RepoStateStore
 
 RAW_DIR = pathlib.Path("data/raw/github")
 RAW_DIR.mkdir(parents=True, exist_ok=True)
+# what each repo looked like at its last scrape, to skip unchanged ones
+STATE_PATH = pathlib.Path("data/cache/repo_state.sqlite")
+# progress of the current run, for --resume
+CHECKPOINT_PATH = pathlib.Path("data/cache/scrape_checkpoint.sqlite")
 
 
 def _meta_from_repo(repo_item) -> Dict[str, Any]:
@@ -44,61 +62,432 @@ def _has_tests_or_ci(tree_paths: List[str]) -> Dict[str, bool]:
     }
 
 
-def collect_from_repo(full_name: str) -> List[Dict[str, Any]]:
-    owner, repo = full_name.split("/")
-    tree = get_repo_tree(owner, repo)
-    tree_paths = [t["path"] for t in tree if t.get("type") == "blob"]
-    # print(tree_paths)
-    flags = _has_tests_or_ci(tree_paths)
+def _cairo_paths(tree_paths: List[str], files_required: Optional[int] = 5) -> List[str]:
+    # Get only 5 .cairo files from a repo (all of them with files_required=None)
+    return [p for p in tree_paths if p.endswith(".cairo")][:files_required]
 
+
+def _save_file(full_name: str, path: str, code: str):
     # Create a folder as UserName/RepoName, after that we insert the .cairo files inside them.
-    dir_name = f"data/raw/github/{full_name}"
+    dir_name = RAW_DIR / full_name
     os.makedirs(dir_name, exist_ok=True)
+    cairo_file_name = path.split("/")[-1]
 
-    print(flags)
-    outputs = []
-    i = 0
-    files_required = 5
-    for path in tree_paths:
-        if not path.endswith(".cairo"):
-            continue
+    # Write the file into desired dir.
+    metrics.write_text(dir_name / cairo_file_name, code)
 
-        # Get only 5 .cairo files from a repo
-        if i > files_required - 1:
-            break
 
-        i += 1
-        code = get_file(owner, repo, path)
+def _repo_out(full_name: str) -> pathlib.Path:
+    return RAW_DIR / (full_name.replace("/", "__") + ".json")
+
 
-        cairo_file_name = path.split("/")[-1]
+def _fresh(item: Dict[str, Any], prev: Optional[Dict[str, Any]]) -> bool:
+    """True when the repo wasn't pushed to since its last scrape."""
+    return bool(
+        prev
+        and item.get("pushed_at")
+        and prev["pushed_at"] == item["pushed_at"]
+        and _repo_out(item["full_name"]).exists()
+    )
 
-        # Write the file into desired dir.
-        with open(f"{os.path.join(dir_name, cairo_file_name)}", "w") as file:
-            file.write(code)
 
-        rec = {"path": path, "code": code}
+def _plan(full_name: str, body: Dict[str, Any], prev: Optional[Dict[str, Any]]):
+    """Pick the files to collect from a git tree.
+
+    Returns (paths, flags, codes, shas): `codes` already holds the previous
+    code of every path whose blob SHA is unchanged since the last scrape.
+    """
+    tree = body.get("tree", [])
+    tree_paths = [t["path"] for t in tree if t.get("type") == "blob"]
+    paths = _cairo_paths(tree_paths)
+    sha = {t["path"]: t.get("sha") for t in tree}
+    shas = {p: sha[p] for p in paths}
+    codes = {}
+    out = _repo_out(full_name)
+    if prev and prev["files"] and out.exists():
+        for f in json.loads(metrics.read_text(out))["files"]:
+            if f["path"] in shas and prev["files"].get(f["path"]) == shas[f["path"]]:
+                codes[f["path"]] = f["code"]
+    return paths, _has_tests_or_ci(tree_paths), codes, shas
+
+
+def _records(full_name, paths, codes, flags, save=True) -> List[Dict[str, Any]]:
+    outputs = []
+    for path in paths:
+        if save:
+            _save_file(full_name, path, codes[path])
+        rec = {"path": path, "code": codes[path]}
         rec.update(flags)
         outputs.append(rec)
-
     return outputs
 
 
-def main(query: str, max_repos: int = 50):
-    repos = search_repos(query=query, per_page=1, max_repos=max_repos)
-    for item in tqdm(repos, desc="repos"):
+def collect_from_repo_archive(full_name: str, save=True) -> List[Dict[str, Any]]:
+    """collect_from_repo from a single streamed tarball, keeping every .cairo file."""
+    owner, repo = full_name.split("/")
+    tree_paths, codes = get_repo_archive(owner, repo)
+    flags = _has_tests_or_ci(tree_paths)
+    return _records(full_name, _cairo_paths(tree_paths, None), codes, flags, save)
+
+
+def _from_journal(journal: Optional[ScrapeJournal], full_name, paths, codes):
+    """Fill `codes` with files an interrupted run already fetched."""
+    if journal is None:
+        return
+    for path in paths:
+        if path not in codes:
+            code = journal.file(full_name, path)
+            if code is not None:
+                codes[path] = code
+
+
+def _collect_rest(
+    full_name: str, prev=None, default_branch=None, save=True, journal=None
+):
+    """collect_from_repo plus the state to remember, fetching only changed blobs.
+
+    Fetched files are recorded in `journal` as they arrive, and files it
+    already holds are not fetched again.
+    """
+    owner, repo = full_name.split("/")
+    branch = (
+        default_branch
+        or (prev or {}).get("default_branch")
+        or get_default_branch(owner, repo)
+    )
+    body = get_tree(owner, repo, branch)
+    paths, flags, codes, shas = _plan(full_name, body, prev)
+
+    print(flags)
+    _from_journal(journal, full_name, paths, codes)
+    for path in paths:
+        if path not in codes:
+            codes[path] = get_file(owner, repo, path)
+            if journal is not None:
+                journal.put_file(full_name, path, codes[path])
+    state = {"default_branch": branch, "tree_sha": body.get("sha"), "files": shas}
+    return _records(full_name, paths, codes, flags, save), state
+
+
+def collect_from_repo(full_name: str, archive: bool = False) -> List[Dict[str, Any]]:
+    if archive:
+        return collect_from_repo_archive(full_name)
+    return _collect_rest(full_name)[0]
+
+
+def _payload(item: Dict[str, Any], files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"meta": _meta_from_repo(item), "files": files}
+
+
+def _save_repo(item: Dict[str, Any], files: List[Dict[str, Any]]):
+    # Save the whole meta-data for 3rd (Data Cleaning & Standardization) step.
+    metrics.write_text(
+        _repo_out(item["full_name"]), json.dumps(_payload(item, files), indent=2)
+    )
+    metrics.add("records", len(files))
+
+
+def _remember(state: RepoStateStore, item: Dict[str, Any], collected: Dict[str, Any]):
+    state.put(
+        item["full_name"],
+        item.get("pushed_at"),
+        collected.get("default_branch") or item.get("default_branch"),
+        collected.get("tree_sha"),
+        collected.get("files"),
+    )
+
+
+def _repos(
+    query: str,
+    max_repos: int,
+    journal: Optional[ScrapeJournal],
+    resume: bool = False,
+) -> List[Dict[str, Any]]:
+    """The search results still to scrape.
 
-        meta = _meta_from_repo(item)
+    A new run searches and journals the result set; with `resume` the
+    unfinished repos of the journaled run are returned instead, without
+    searching again.
+    """
+    params = {"query": query, "max_repos": max_repos}
+    if journal is not None and resume:
+        started = journal.params()
+        if started is not None:
+            if started != params:
+                print("resuming the run started with", started)
+            todo = journal.items(pending=True)
+            print(f"resuming: {len(todo)} of {len(journal.items())} repos left")
+            return todo
+        print("no run to resume, starting a new one")
+    repos = search_repos(query=query, per_page=min(100, max_repos), max_repos=max_repos)
+    if journal is not None:
+        journal.start(params, repos)
+    return repos
+
+
+def main(
+    query: str,
+    max_repos: int = 50,
+    concurrency: int = 1,
+    graphql=False,
+    archive=False,
+    force=False,
+    resume=False,
+):
+    """Scrape the repos matching `query` into RAW_DIR.
+
+    Repos not pushed to since the last run (per the state in STATE_PATH) are
+    skipped; `force` re-collects everything.
+
+    Progress is journaled in CHECKPOINT_PATH: the search results, the repos
+    finished and the files fetched for the repo(s) in progress. `resume`
+    continues the journaled run where it stopped, without searching again
+    or re-fetching any finished repo or journaled file.
+    """
+    state = RepoStateStore(STATE_PATH)
+    journal = ScrapeJournal(CHECKPOINT_PATH)
+    try:
+        if graphql:
+            return main_graphql(query, max_repos, state, force, journal, resume)
+        if concurrency > 1:
+            return asyncio.run(
+                main_async(
+                    query,
+                    max_repos,
+                    concurrency,
+                    archive,
+                    state,
+                    force,
+                    journal,
+                    resume,
+                )
+            )
+        repos = _repos(query, max_repos, journal, resume)
+        skipped = 0
+        for item in tqdm(repos, desc="repos"):
+
+            full = item["full_name"]
+            prev = None if force else state.get(full)
+            if _fresh(item, prev):
+                skipped += 1
+                journal.done(full)
+                continue
+            try:
+                if archive:
+                    files, collected = collect_from_repo_archive(full), {}
+                else:
+                    files, collected = _collect_rest(
+                        full, prev, item.get("default_branch"), journal=journal
+                    )
+            except Exception as e:
+                print("skip", full, e)
+                continue
+            _save_repo(item, files)
+            _remember(state, item, collected)
+            journal.done(full)
+        print(f"{skipped} unchanged repos skipped")
+    finally:
+        journal.close()
+        state.close()
+
+
+def iter_repos(
+    query: str, max_repos: int = 50, archive: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """Payloads of the repos matching `query`, one at a time, as `main` saves them.
+
+    Nothing is written and no repo state is read or kept: this is the source
+    for streaming builds (see src/stream.py).
+    """
+    for item in search_repos(
+        query=query, per_page=min(100, max_repos), max_repos=max_repos
+    ):
         full = item["full_name"]
         try:
-            files = collect_from_repo(full)
+            if archive:
+                files = collect_from_repo_archive(full, save=False)
+            else:
+                files, _ = _collect_rest(
+                    full, default_branch=item.get("default_branch"), save=False
+                )
         except Exception as e:
             print("skip", full, e)
             continue
+        yield _payload(item, files)
+
+
+async def _collect_rest_async(
+    full_name: str,
+    limit: asyncio.Semaphore,
+    prev=None,
+    default_branch=None,
+    journal: Optional[ScrapeJournal] = None,
+):
+    owner, repo = full_name.split("/")
+
+    async def call(fn, *args):
+        async with limit:
+            return await asyncio.to_thread(metrics.bind(fn), *args)
+
+    branch = (
+        default_branch
+        or (prev or {}).get("default_branch")
+        or await call(get_default_branch, owner, repo)
+    )
+    body = await call(get_tree, owner, repo, branch)
+    paths, flags, codes, shas = _plan(full_name, body, prev)
+
+    _from_journal(journal, full_name, paths, codes)
+
+    def fetch(path):
+        # journaled in the worker thread, so it's kept even if the run dies
+        code = get_file(owner, repo, path)
+        if journal is not None:
+            journal.put_file(full_name, path, code)
+        return code
+
+    todo = [p for p in paths if p not in codes]
+    fetched = await asyncio.gather(*(call(fetch, p) for p in todo))
+    codes.update(zip(todo, fetched))
+    state = {"default_branch": branch, "tree_sha": body.get("sha"), "files": shas}
+    return _records(full_name, paths, codes, flags), state
 
-        # Save the whole meta-data for 3rd (Data Cleaning & Standardization) step.
-        payload = {"meta": meta, "files": files}
-        out = RAW_DIR / (full.replace("/", "__") + ".json")
-        out.write_text(json.dumps(payload, indent=2))
+
+async def collect_from_repo_async(
+    full_name: str, limit: asyncio.Semaphore
+) -> List[Dict[str, Any]]:
+    """collect_from_repo, with the file fetches issued concurrently.
+
+    Every blocking API call runs in a worker thread while holding `limit`,
+    which is shared across repos, so the number of requests in flight is
+    bounded for the whole scrape.
+    """
+    return (await _collect_rest_async(full_name, limit))[0]
+
+
+async def main_async(
+    query: str,
+    max_repos: int = 50,
+    concurrency: int = 8,
+    archive: bool = False,
+    state: Optional[RepoStateStore] = None,
+    force: bool = False,
+    journal: Optional[ScrapeJournal] = None,
+    resume: bool = False,
+):
+    """Scrape like `main`, with up to `concurrency` GitHub requests in flight."""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    limit = asyncio.Semaphore(concurrency)
+    repos = await asyncio.to_thread(
+        metrics.bind(_repos), query, max_repos, journal, resume
+    )
+
+    async def one(item):
+        full = item["full_name"]
+        prev = None if force or state is None else state.get(full)
+        if _fresh(item, prev):
+            if journal is not None:
+                journal.done(full)
+            return
+        try:
+            if archive:
+                async with limit:
+                    files = await asyncio.to_thread(
+                        metrics.bind(collect_from_repo_archive), full
+                    )
+                collected = {}
+            else:
+                files, collected = await _collect_rest_async(
+                    full, limit, prev, item.get("default_branch"), journal
+                )
+        except Exception as e:
+            print("skip", full, e)
+            return
+        _save_repo(item, files)
+        if state is not None:
+            _remember(state, item, collected)
+        if journal is not None:
+            journal.done(full)
+
+    bar = tqdm(total=len(repos), desc="repos")
+    for done in asyncio.as_completed([one(item) for item in repos]):
+        await done
+        bar.update()
+    bar.close()
+
+
+def main_graphql(
+    query: str,
+    max_repos: int = 50,
+    state: Optional[RepoStateStore] = None,
+    force: bool = False,
+    journal: Optional[ScrapeJournal] = None,
+    resume: bool = False,
+):
+    """Scrape like `main` using batched GraphQL queries (needs GITHUB_TOKEN).
+
+    Metadata and file listings come from one query per REPO_BATCH repos, and
+    the selected files from one query per BLOB_BATCH blobs across all repos.
+    """
+    repos = _repos(query, max_repos, journal, resume)
+    if state is not None and not force:
+        fresh = {
+            it["full_name"] for it in repos if _fresh(it, state.get(it["full_name"]))
+        }
+        for full in fresh:
+            if journal is not None:
+                journal.done(full)
+        repos = [it for it in repos if it["full_name"] not in fresh]
+    metas = get_repos_batch([item["full_name"] for item in repos])
+    selected = {}
+    for item in repos:
+        full = item["full_name"]
+        if metas.get(full) is None:
+            print("skip", full, "not found")
+            continue
+        tree_paths = [t["path"] for t in metas[full]["tree"] if t["type"] == "blob"]
+        selected[full] = (_cairo_paths(tree_paths), _has_tests_or_ci(tree_paths))
+    codes = {}
+    wanted = [
+        (*full.split("/"), path)
+        for full, (paths, _) in selected.items()
+        for path in paths
+    ]
+    if journal is not None:
+        for owner, repo, path in wanted:
+            code = journal.file(f"{owner}/{repo}", path)
+            if code is not None:
+                codes[(owner, repo, path)] = code
+    todo = [key for key in wanted if key not in codes]
+    # one batch at a time, so a crash loses at most the batch in flight
+    for i in range(0, len(todo), BLOB_BATCH):
+        fetched = get_files_batch(todo[i : i + BLOB_BATCH])
+        if journal is not None:
+            for (owner, repo, path), code in fetched.items():
+                journal.put_file(f"{owner}/{repo}", path, code)
+        codes.update(fetched)
+    for item in tqdm(repos, desc="repos"):
+        full = item["full_name"]
+        if full not in selected:
+            continue
+        paths, flags = selected[full]
+        owner, repo = full.split("/")
+        files = []
+        for path in paths:
+            code = codes.get((owner, repo, path))
+            if code is None:
+                continue
+            _save_file(full, path, code)
+            rec = {"path": path, "code": code}
+            rec.update(flags)
+            files.append(rec)
+        _save_repo(item, files)
+        if state is not None:
+            default_branch = metas[full]["default_branch"]
+            _remember(state, item, {"default_branch": default_branch})
+        if journal is not None:
+            journal.done(full)
 
 
 if __name__ == "__main__":
@@ -107,8 +496,35 @@ if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--query", default="language:Cairo starknet")
     ap.add_argument("--max_repos", type=int, default=50)
+    ap.add_argument(
+        "--concurrency", type=int, default=1, help="GitHub requests in flight"
+    )
+    ap.add_argument(
+        "--graphql", action="store_true", help="batch metadata and files via GraphQL"
+    )
+    ap.add_argument(
+        "--archive",
+        action="store_true",
+        help="one tarball per repo, keeping every .cairo file",
+    )
+    ap.add_argument(
+        "--force", action="store_true", help="re-collect repos even if unchanged"
+    )
+    ap.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue the last run from its checkpoint instead of searching again",
+    )
     args = ap.parse_args()
-    main(args.query, args.max_repos)
+    main(
+        args.query,
+        args.max_repos,
+        args.concurrency,
+        args.graphql,
+        args.archive,
+        args.force,
+        args.resume,
+    )
     # h = search_repos(args.query, max_repos=args.max_repos)
     # print(_meta_from_repo(h[0])['repo']['full_name'])
     # print(collect_from_repo(_meta_from_repo(h[0])['repo']['full_name']))
@@ -0,0 +1,123 @@
+import hashlib
+import io
+import pathlib
+from typing import Any, Dict, Iterator, List
+
+import orjson
+import zstandard
+
+MANIFEST = "manifest.json"
+
+
+class _HashingFile(io.RawIOBase):
+    """Write-through file wrapper that counts and hashes the bytes written."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha = hashlib.sha256()
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.sha.update(b)
+        self.size += len(b)
+        return self.f.write(b)
+
+
+def write_shards(
+    src: str,
+    out_dir: str,
+    target_bytes: int = 256 << 20,
+    level: int = 3,
+    prefix: str = "dataset",
+) -> Dict[str, Any]:
+    """Split the JSONL file `src` into zstd shards of about `target_bytes` each.
+
+    Records are never split across shards, so each shard is a standalone
+    JSONL stream. Writes `manifest.json` next to the shards and returns it.
+    """
+    out = pathlib.Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    cctx = zstandard.ZstdCompressor(level=level)
+    shards: List[Dict[str, Any]] = []
+    raw = hashed = writer = None
+    records = raw_bytes = 0
+
+    def close():
+        writer.close()
+        raw.close()
+        shards[-1].update(
+            records=records,
+            bytes=hashed.size,
+            uncompressed_bytes=raw_bytes,
+            sha256=hashed.sha.hexdigest(),
+        )
+
+    with open(src, "rb") as f:
+        for line in f:
+            # compressed output lags the input by at most one zstd block
+            if writer is not None and hashed.size >= target_bytes:
+                close()
+                writer = None
+            if writer is None:
+                name = f"{prefix}-{len(shards):05d}.jsonl.zst"
+                shards.append({"file": name})
+                raw = open(out / name, "wb")
+                hashed = _HashingFile(raw)
+                writer = cctx.stream_writer(hashed, closefd=False)
+                records = raw_bytes = 0
+            writer.write(line)
+            records += 1
+            raw_bytes += len(line)
+    if writer is not None:
+        close()
+
+    names = {s["file"] for s in shards}
+    for stale in out.glob(f"{prefix}-*.jsonl.zst"):
+        if stale.name not in names:
+            stale.unlink()
+    manifest = {
+        "compression": "zstd",
+        "records": sum(s["records"] for s in shards),
+        "bytes": sum(s["bytes"] for s in shards),
+        "shards": shards,
+    }
+    (out / MANIFEST).write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+    return manifest
+
+
+def load_manifest(shard_dir: str) -> Dict[str, Any]:
+    return orjson.loads((pathlib.Path(shard_dir) / MANIFEST).read_bytes())
+
+
+def verify_shard(shard_dir: str, shard: Dict[str, Any]) -> bool:
+    """True if the shard file matches the size and checksum in the manifest."""
+    path = pathlib.Path(shard_dir) / shard["file"]
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return path.stat().st_size == shard["bytes"] and sha.hexdigest() == shard["sha256"]
+
+
+def iter_shard(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream the records of one shard without decompressing it to disk."""
+    dctx = zstandard.ZstdDecompressor()
+    with open(path, "rb") as f, dctx.stream_reader(f) as r:
+        for line in io.BufferedReader(r):
+            yield orjson.loads(line)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default="data/processed/dataset.jsonl")
+    ap.add_argument("--out", default="data/processed/shards")
+    ap.add_argument("--shard_mb", type=int, default=256)
+    ap.add_argument("--level", type=int, default=3)
+    args = ap.parse_args()
+    m = write_shards(args.src, args.out, args.shard_mb << 20, args.level)
+    print("Wrote", len(m["shards"]), "shards,", m["records"], "records to", args.out)
@@ -0,0 +1,253 @@
+import itertools
+import os
+import pathlib
+import queue
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, Sequence
+
+import orjson
+
+from . import clean_standardize, scrape_blogs, scrape_docs, scrape_github
+from .build_jsonl import hydrate, manifest_path
+from .dataset import write_index
+from .utils.minhash import NearDupIndex
+from .validation import ValidationReport, get_validator
+
+DATASET = "data/processed/dataset.jsonl"
+SOURCES = ("github", "docs", "blogs")
+# items a stage may run ahead of the one after it
+QUEUE_SIZE = 8
+
+_END = object()
+
+
+class Bounded:
+    """Iterates `items` in a background thread, at most `maxsize` items ahead.
+
+    A full queue blocks the producer until the consumer catches up, so a fast
+    stage can't run away from a slow one. An exception raised by `items` is
+    re-raised to the consumer; `close` stops the producer at its next item.
+    `stats` counts the items passed and the seconds the producer spent blocked
+    on a full queue and the consumer on an empty one.
+    """
+
+    def __init__(self, items: Iterable, maxsize: int = QUEUE_SIZE, name: str = ""):
+        self.q: queue.Queue = queue.Queue(maxsize)
+        self.stop = threading.Event()
+        self.stats: Counter = Counter()
+        self.done = False
+        self.thread = threading.Thread(
+            target=self._produce, args=(items,), name=name or None, daemon=True
+        )
+        self.thread.start()
+
+    def _put(self, item) -> bool:
+        try:
+            self.q.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        t0 = time.perf_counter()
+        try:
+            while not self.stop.is_set():
+                try:
+                    self.q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.stats["producer_wait_s"] += time.perf_counter() - t0
+
+    def _produce(self, items: Iterable):
+        try:
+            for x in items:
+                if not self._put((x, None)):
+                    return
+            self._put((_END, None))
+        except BaseException as e:
+            self._put((_END, e))
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.done:
+            raise StopIteration
+        try:
+            x, err = self.q.get_nowait()
+        except queue.Empty:
+            t0 = time.perf_counter()
+            x, err = self.q.get()
+            self.stats["consumer_wait_s"] += time.perf_counter() - t0
+        if x is _END:
+            self.close()
+            if err is not None:
+                raise err
+            raise StopIteration
+        self.stats["items"] += 1
+        return x
+
+    def close(self):
+        self.done = True
+        self.stop.set()
+        self.thread.join()
+        # wake a consumer still blocked on the queue in another thread
+        try:
+            self.q.put_nowait((_END, None))
+        except queue.Full:
+            pass
+
+
+def _docs(max_items: int) -> Iterator[Dict[str, Any]]:
+    scrape_docs.generate_doc_urls()
+    yield from scrape_docs.iter_pages(max_items)
+
+
+def _source(name: str, query: str, max_repos: int, max_items: int, feeds: str):
+    if name == "github":
+        return scrape_github.iter_repos(query, max_repos)
+    if name == "docs":
+        return _docs(max_items)
+    if name == "blogs":
+        return scrape_blogs.iter_posts(feeds, max_items)
+    raise ValueError(f"unknown source {name!r}; sources: {', '.join(SOURCES)}")
+
+
+def _clean(payloads: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for payload in payloads:
+        yield from clean_standardize.clean_payload(payload)
+
+
+def main(
+    out_path: str = DATASET,
+    query: str = "language:Cairo starknet",
+    max_repos: int = 30,
+    max_items: int = 30,
+    feeds: str = "feeds.txt",
+    sources: Sequence[str] = SOURCES,
+    queue_size: int = QUEUE_SIZE,
+) -> Dict[str, Any]:
+    """Scrape, clean, dedup and write `out_path` in one pass, without raw files.
+
+    Each source scrapes in its own thread and cleaning runs in another, every
+    stage at most `queue_size` items ahead of the next. Sources are consumed
+    in `sources` order, so dedup (and the output) doesn't depend on timing.
+
+    Only `out_path`, its `.idx` sidecar and, when records fail the schema,
+    `<out>.validation.json` are written: no raw JSON, per-snippet .cairo
+    files, index.json, fingerprint store or manifest, and a manifest a staged
+    build left at `out_path` is removed. Every run therefore starts from
+    scratch; use the staged build (src/refresh.py) for incremental updates. Returns record counts and per-stage queue stats.
+    """
+    for name in sources:
+        if name not in SOURCES:
+            raise ValueError(f"unknown source {name!r}; sources: {', '.join(SOURCES)}")
+    seen = NearDupIndex(threshold=0.98)
+    clean_standardize.init_hasher(seen.hasher.params)
+    validator = get_validator()
+    report = ValidationReport()
+    shas = set()
+    counts: Counter = Counter()
+    offsets = []
+    offset = 0
+
+    stages = {
+        name: Bounded(
+            _source(name, query, max_repos, max_items, feeds), queue_size, name
+        )
+        for name in sources
+    }
+    snippets = Bounded(_clean(itertools.chain(*stages.values())), queue_size, "clean")
+    stages["clean"] = snippets
+    tmp_path = out_path + ".tmp"
+    pathlib.Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(tmp_path, "wb") as f:
+            for s in snippets:
+                # dedup
+                if s["sha"] in shas:
+                    counts["duplicates"] += 1
+                    continue
+                shas.add(s["sha"])
+                if seen.find_duplicate(s["code"], s["sig"]) is not None:
+                    counts["duplicates"] += 1
+                    continue
+                seen.add(s["code"], s["sig"])
+                rec = hydrate(s["entry"], s["code"])
+                report.checked += 1
+                errors = validator.errors(rec)
+                if errors:
+                    report.add(
+                        counts["kept"] + counts["invalid"], errors, s["name_hint"]
+                    )
+                    counts["invalid"] += 1
+                    continue
+                line = orjson.dumps(rec) + b"\n"
+                f.write(line)
+                offsets.append(offset)
+                offset += len(line)
+                counts["kept"] += 1
+    finally:
+        for stage in stages.values():
+            stage.close()
+    # a staged build's manifest describes the file being replaced, and an
+    # --incremental build would splice records out of this one by its offsets
+    manifest_path(out_path).unlink(missing_ok=True)
+    os.replace(tmp_path, out_path)
+    write_index(out_path, offsets, offset)
+
+    print(
+        "Wrote",
+        out_path,
+        f"({counts['kept']} records, {counts['duplicates']} duplicates)",
+    )
+    report_path = pathlib.Path(out_path + ".validation.json")
+    if report.ok:
+        report_path.unlink(missing_ok=True)
+    else:
+        report_path.write_bytes(
+            orjson.dumps(report.to_dict(), option=orjson.OPT_INDENT_2)
+        )
+        print(f"{len(report.failures)} invalid records left out, see {report_path}")
+    return {
+        "kept": counts["kept"],
+        "duplicates": counts["duplicates"],
+        "invalid": counts["invalid"],
+        "stages": {name: dict(stage.stats) for name, stage in stages.items()},
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", default=DATASET)
+    ap.add_argument("--query", default="language:Cairo starknet")
+    ap.add_argument("--max_repos", type=int, default=30)
+    ap.add_argument("--max_items", type=int, default=30)
+    ap.add_argument("--feeds", default="feeds.txt")
+    ap.add_argument(
+        "--sources",
+        default=",".join(SOURCES),
+        help="comma-separated subset of " + ", ".join(SOURCES),
+    )
+    ap.add_argument(
+        "--queue_size", type=int, default=QUEUE_SIZE, help="items buffered per stage"
+    )
+    args = ap.parse_args()
+    main(
+        args.out,
+        args.query,
+        args.max_repos,
+        args.max_items,
+        args.feeds,
+        args.sources.split(","),
+        args.queue_size,
+    )
@@ -0,0 +1,81 @@
+import os
+import pathlib
+import tempfile
+from collections import Counter
+from typing import Iterable, Optional, Union
+
+from . import metrics
+from .fingerprints import content_hash
+
+
+class BlobStore:
+    """Content-addressed files under `root`, each named by its SHA-256.
+
+    `fanout` levels of two-hex-digit subdirectories keep directories small:
+    with the default single level, a million blobs come to ~4k per directory.
+    Writes are atomic and skipped when the blob already exists, so identical
+    content is stored once and never rewritten. `stats` counts blobs written,
+    found already present and pruned, and the bytes written.
+    """
+
+    def __init__(
+        self, root: Union[str, pathlib.Path], suffix: str = "", fanout: int = 1
+    ):
+        self.root = pathlib.Path(root)
+        self.suffix = suffix
+        self.fanout = fanout
+        self.stats: Counter = Counter()
+
+    def path(self, digest: str) -> pathlib.Path:
+        parts = [digest[2 * i : 2 * i + 2] for i in range(self.fanout)]
+        return self.root.joinpath(*parts, digest + self.suffix)
+
+    def __contains__(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def put(
+        self, data: Union[str, bytes], digest: Optional[str] = None
+    ) -> pathlib.Path:
+        """Store `data` unless already present; returns its path.
+
+        `digest` saves rehashing when the caller already has content_hash(data).
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        path = self.path(digest or content_hash(data))
+        if path.exists():
+            self.stats["existing"] += 1
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # a crash mid-write must not leave a truncated blob under the real name
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.stats["written"] += 1
+        self.stats["bytes_written"] += len(data)
+        metrics.add("bytes_written", len(data))
+        return path
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Delete every file under `root` but the blobs of the `keep` digests.
+
+        That includes files from other layouts and temp files of interrupted
+        writes. Directories left empty go too. Returns the files deleted.
+        """
+        keep_paths = {self.path(d) for d in keep}
+        n = 0
+        # deepest first, so directories are emptied before they are checked
+        for p in sorted(self.root.rglob("*"), reverse=True):
+            if p.is_dir():
+                if not any(p.iterdir()):
+                    p.rmdir()
+            elif p not in keep_paths:
+                p.unlink()
+                n += 1
+        self.stats["pruned"] += n
+        return n
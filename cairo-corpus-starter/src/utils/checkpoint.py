@@ -0,0 +1,87 @@
+import json
+import pathlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS run (params TEXT);
+CREATE TABLE IF NOT EXISTS repos (
+    pos INTEGER PRIMARY KEY, full_name TEXT UNIQUE, item TEXT, done INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    full_name TEXT, path TEXT, code TEXT, PRIMARY KEY (full_name, path)
+);
+"""
+
+
+class ScrapeJournal:
+    """Progress of the current scrape_github run, so a crashed run can resume.
+
+    - run: the parameters the run was started with
+    - repos: the search results in order, and which repos are finished
+    - files: code already fetched for repos that aren't finished yet
+    Every write is committed right away. Safe to share between threads.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def start(self, params: Dict[str, Any], items: List[Dict[str, Any]]):
+        """Forget the previous run and journal a new one over `items`."""
+        with self.lock:
+            self.db.execute("DELETE FROM run")
+            self.db.execute("DELETE FROM repos")
+            self.db.execute("DELETE FROM files")
+            self.db.execute(
+                "INSERT INTO run VALUES (?)", (json.dumps(params, sort_keys=True),)
+            )
+            self.db.executemany(
+                "INSERT INTO repos VALUES (?, ?, ?, 0)",
+                [(i, it["full_name"], json.dumps(it)) for i, it in enumerate(items)],
+            )
+            self.db.commit()
+
+    def params(self) -> Optional[Dict[str, Any]]:
+        """Parameters of the journaled run, or None when there is none."""
+        with self.lock:
+            row = self.db.execute("SELECT params FROM run").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def items(self, pending: bool = False) -> List[Dict[str, Any]]:
+        """Search results of the run in order; only unfinished ones with `pending`."""
+        sql = "SELECT item FROM repos" + (" WHERE done=0" if pending else "")
+        with self.lock:
+            rows = self.db.execute(sql + " ORDER BY pos").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def done(self, full_name: str):
+        """Mark a repo finished; its journaled files are no longer needed."""
+        with self.lock:
+            self.db.execute("UPDATE repos SET done=1 WHERE full_name=?", (full_name,))
+            self.db.execute("DELETE FROM files WHERE full_name=?", (full_name,))
+            self.db.commit()
+
+    def file(self, full_name: str, path: str) -> Optional[str]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT code FROM files WHERE full_name=? AND path=?",
+                (full_name, path),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_file(self, full_name: str, path: str, code: str):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                (full_name, path, code),
+            )
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,145 @@
+import hashlib
+import pathlib
+import sqlite3
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS raw_files (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT
+);
+CREATE TABLE IF NOT EXISTS snippets (
+    sha256 TEXT PRIMARY KEY, sig BLOB, code_path TEXT, raw_path TEXT
+);
+CREATE INDEX IF NOT EXISTS snippets_raw_path ON snippets (raw_path);
+"""
+
+
+def content_hash(data) -> str:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path: pathlib.Path, chunk: int = 1 << 20) -> str:
+    """content_hash of the file at `path`, read `chunk` bytes at a time."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class FingerprintStore:
+    """On-disk record of what clean_standardize has already processed.
+
+    - raw_files: every raw JSON consumed, keyed by path, with stat + content hash
+    - snippets: every normalized snippet seen, with the raw file it came from;
+      accepted ones carry their MinHash signature and the file they were
+      written to, duplicates have neither
+    """
+
+    def __init__(self, path: pathlib.Path, minhash_params: str):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        cols = [r[1] for r in self.db.execute("PRAGMA table_info(snippets)")]
+        if cols and "raw_path" not in cols:
+            # written before snippets recorded their raw file, start over
+            self.db.executescript("DROP TABLE snippets; DROP TABLE raw_files;")
+        self.db.executescript(SCHEMA)
+        row = self.db.execute("SELECT value FROM meta WHERE key='minhash'").fetchone()
+        if row and row[0] != minhash_params:
+            # signatures from another hasher config can't be compared, start over
+            self.db.executescript(
+                "DELETE FROM raw_files; DELETE FROM snippets; DELETE FROM meta;"
+            )
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('minhash', ?)", (minhash_params,)
+        )
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM snippets").fetchone()[0]
+
+    def raw_digest(self, path: pathlib.Path) -> Optional[str]:
+        """Content hash of `path`, or None when it matches what was already processed."""
+        st = path.stat()
+        row = self.db.execute(
+            "SELECT size, mtime_ns, sha256 FROM raw_files WHERE path=?", (str(path),)
+        ).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return None
+        digest = file_hash(path)
+        if row and row[2] == digest:
+            self.mark_raw(path, digest)
+            return None
+        return digest
+
+    def mark_raw(self, path: pathlib.Path, digest: str):
+        st = path.stat()
+        self.db.execute(
+            "INSERT OR REPLACE INTO raw_files VALUES (?, ?, ?, ?)",
+            (str(path), st.st_size, st.st_mtime_ns, digest),
+        )
+
+    def has_snippet(self, sha: str) -> bool:
+        return (
+            self.db.execute("SELECT 1 FROM snippets WHERE sha256=?", (sha,)).fetchone()
+            is not None
+        )
+
+    def add_snippet(
+        self,
+        sha: str,
+        sig: Optional[np.ndarray] = None,
+        code_path: Optional[str] = None,
+        raw_path: Optional[pathlib.Path] = None,
+    ):
+        self.db.execute(
+            "INSERT OR REPLACE INTO snippets VALUES (?, ?, ?, ?)",
+            (
+                sha,
+                None if sig is None else sig.tobytes(),
+                code_path,
+                None if raw_path is None else str(raw_path),
+            ),
+        )
+
+    def raw_paths(self) -> List[str]:
+        return [r[0] for r in self.db.execute("SELECT path FROM raw_files")]
+
+    def forget_raw(self, path: pathlib.Path) -> List[str]:
+        """Drop `path` and the snippets it produced, so it can be cleaned afresh.
+
+        Returns the hashes of its snippets that had been accepted.
+        """
+        key = str(path)
+        accepted = [
+            r[0]
+            for r in self.db.execute(
+                "SELECT sha256 FROM snippets "
+                "WHERE raw_path=? AND code_path IS NOT NULL",
+                (key,),
+            )
+        ]
+        self.db.execute("DELETE FROM snippets WHERE raw_path=?", (key,))
+        self.db.execute("DELETE FROM raw_files WHERE path=?", (key,))
+        return accepted
+
+    def accepted(self) -> Iterator[Tuple[np.ndarray, str]]:
+        """(signature, code_path) of every snippet that made it into the index."""
+        cur = self.db.execute(
+            "SELECT sig, code_path FROM snippets WHERE code_path IS NOT NULL "
+            "ORDER BY rowid"
+        )
+        for sig, code_path in cur:
+            yield np.frombuffer(sig, dtype=np.uint32), code_path
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -1,32 +1,110 @@
+import functools
 import json
 import os
+import pathlib
 import re
-import time
-from typing import Any, Dict, Iterable, List, Optional
+import tarfile
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import requests
 from dotenv import load_dotenv
 
+from . import http
+from .http_cache import ResponseCache, cache_key
+from .ratelimit import DEFAULT_RATES, UNAUTHENTICATED_RATES, RateLimiter
+
 load_dotenv()
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-USER_AGENT = os.getenv("USER_AGENT", "cairo-corpus-bot/0.1")
+# overridable so scrapers can be pointed at a local stand-in server
+API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+RAW_URL = os.getenv("GITHUB_RAW_URL", "https://raw.githubusercontent.com")
+# conditional-request cache; set GITHUB_CACHE= (empty) to disable
+CACHE_PATH = os.getenv("GITHUB_CACHE", "data/cache/github.sqlite")
+
+
+def github_session() -> requests.Session:
+    """Pooled session carrying the GitHub headers and token (if any).
+
+    Only connection failures are retried at this level; HTTP statuses are
+    left to the rate limiter, which knows about GitHub's limits.
+    """
+    return http.session(
+        "github",
+        headers={"Accept": "application/vnd.github+json"},
+        auth=http.BearerAuth(GITHUB_TOKEN),
+        retries=http.retry_policy(statuses=()),
+    )
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
 
+def response_cache() -> Optional[ResponseCache]:
+    global _cache
+    with _cache_lock:
+        if _cache is None and CACHE_PATH:
+            _cache = ResponseCache(pathlib.Path(CACHE_PATH))
+    return _cache
 
-def _headers():
-    h = {"Accept": "application/vnd.github+json", "User-Agent": USER_AGENT}
-    if GITHUB_TOKEN:
-        h["Authorization"] = f"Bearer {GITHUB_TOKEN}"
-    return h
 
+_limiter: Optional[RateLimiter] = None
 
-headers = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
+
+def rate_limiter() -> RateLimiter:
+    """Process-wide scheduler shared by every call in this module."""
+    global _limiter
+    with _cache_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                DEFAULT_RATES if GITHUB_TOKEN else UNAUTHENTICATED_RATES
+            )
+    return _limiter
+
+
+def _resource(url: str) -> str:
+    if url.startswith(RAW_URL):
+        return "raw"
+    if "/search/" in url:
+        return "search"
+    if url.endswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+def _get(
+    url: str, params: Optional[Dict[str, Any]] = None, headers=None
+) -> requests.Response:
+    """GET paced by the rate limiter that revalidates against the response cache.
+
+    Sends If-None-Match/If-Modified-Since for URLs seen before and serves the
+    cached body when GitHub answers 304, which doesn't count against the rate
+    limit.
+    """
+    cache = response_cache()
+    h = dict(headers or {})
+    key = cache_key(url, params)
+    if cache is not None:
+        h.update(cache.conditional_headers(key))
+    r = rate_limiter().request(
+        _resource(url),
+        lambda: github_session().get(url, headers=h, params=params),
+    )
+    if cache is None:
+        return r
+    if r.status_code == 304:
+        return cache.replay(key, r)
+    cache.stats["misses"] += 1
+    cache.store(key, r)
+    return r
 
 
 def search_repos(
     query: str, per_page: int = 30, max_repos: int = 60
 ) -> List[Dict[str, Any]]:
     """Search GitHub repos by query; returns basic metadata."""
-    url = "https://api.github.com/search/repositories"
+    url = f"{API_URL}/search/repositories"
     params = {
         "q": query,
         "sort": "stars",
@@ -36,7 +114,7 @@ def search_repos(
     }
     out = []
     while len(out) < max_repos:
-        r = requests.get(url, headers=headers, params=params, timeout=30)
+        r = _get(url, params=params)
         r.raise_for_status()
         items = r.json().get("items", [])
         if not items:
@@ -45,32 +123,215 @@ def search_repos(
         params["page"] += 1
         if len(items) < params["per_page"]:
             break
-        time.sleep(0.6)
 
     return out[:max_repos]
 
 
-def get_repo_tree(owner: str, repo: str, branch: str = "main") -> List[Dict[str, Any]]:
-    # get default branch first
-    r = requests.get(
-        f"https://api.github.com/repos/{owner}/{repo}", headers=_headers(), timeout=30
-    )
-    # r.raise_for_status()
-    branch = r.json().get("default_branch", branch)
-    r = requests.get(
-        f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1",
-        headers=_headers(),
-        timeout=30,
-    )
-    # r.raise_for_status()
-    return r.json().get("tree", [])
+def get_default_branch(owner: str, repo: str) -> str:
+    r = _get(f"{API_URL}/repos/{owner}/{repo}")
+    r.raise_for_status()
+    return r.json().get("default_branch", "main")
+
+
+def get_tree(owner: str, repo: str, ref: str) -> Dict[str, Any]:
+    """Recursive git tree at `ref`: {"sha": tree SHA, "tree": [entries]}."""
+    r = _get(f"{API_URL}/repos/{owner}/{repo}/git/trees/{ref}?recursive=1")
+    r.raise_for_status()
+    return r.json()
+
+
+def get_repo_tree(
+    owner: str, repo: str, branch: str = "main", default_branch: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    # look up the default branch unless the caller already knows it
+    branch = default_branch or get_default_branch(owner, repo)
+    return get_tree(owner, repo, branch).get("tree", [])
 
 
 def get_file(owner: str, repo: str, path: str) -> str:
-    r = requests.get(
-        f"https://raw.githubusercontent.com/{owner}/{repo}/HEAD/{path}",
-        headers=_headers(),
-        timeout=30,
-    )
+    r = _get(f"{RAW_URL}/{owner}/{repo}/HEAD/{path}")
     r.raise_for_status()
     return r.text
+
+
+def get_repo_archive(
+    owner: str, repo: str, keep: Callable[[str], bool] = lambda p: p.endswith(".cairo")
+) -> Tuple[List[str], Dict[str, str]]:
+    """Every file path in the repo at HEAD, and the text of those `keep` selects.
+
+    Streams the repo tarball (one request, not cached) through tarfile
+    without writing it to disk; only the kept files are held in memory.
+    """
+    url = f"{API_URL}/repos/{owner}/{repo}/tarball"
+    r = rate_limiter().request(
+        _resource(url), lambda: github_session().get(url, stream=True)
+    )
+    r.raise_for_status()
+    r.raw.decode_content = True
+    paths, texts = [], {}
+    with r, tarfile.open(fileobj=r.raw, mode="r|gz") as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            # members sit under a "<owner>-<repo>-<sha>/" top-level folder
+            path = member.name.split("/", 1)[-1]
+            paths.append(path)
+            if keep(path):
+                data = tar.extractfile(member).read()
+                texts[path] = data.decode("utf-8", errors="replace")
+    return paths, texts
+
+
+# --- GraphQL batch mode -----------------------------------------------------
+# One aliased query covers many repos (metadata + file listing) or many blobs,
+# instead of two REST calls per repo and one raw fetch per file.
+
+REPO_BATCH = 20
+BLOB_BATCH = 50
+# the GraphQL tree is walked to this depth; REST's ?recursive=1 has no limit,
+# so trees found at the bottom level are listed through it instead
+TREE_DEPTH = 5
+
+
+class GraphQLError(RuntimeError):
+    pass
+
+
+def graphql(query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run one GraphQL query and return its `data` (partial data is kept)."""
+    url = f"{API_URL}/graphql"
+    payload = {"query": query, "variables": variables or {}}
+    r = rate_limiter().request(
+        _resource(url), lambda: github_session().post(url, json=payload)
+    )
+    r.raise_for_status()
+    body = r.json()
+    if body.get("data") is None:
+        raise GraphQLError(body.get("errors"))
+    return body["data"]
+
+
+def _chunks(items: List[Any], n: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), n):
+        yield items[i : i + n]
+
+
+def _tree_selection(depth: int) -> str:
+    sel = "path type oid"
+    for _ in range(depth - 1):
+        sel = f"path type object {{ ... on Tree {{ entries {{ {sel} }} }} }}"
+    return f'object(expression: "HEAD:") {{ ... on Tree {{ entries {{ {sel} }} }} }}'
+
+
+def _flatten_tree(
+    entries: Optional[List[Dict[str, Any]]],
+    expand: Callable[[Dict[str, Any]], List[Dict[str, Any]]],
+    depth: int = TREE_DEPTH,
+) -> List[Dict[str, Any]]:
+    """The entries of a `_tree_selection(depth)` result, depth first.
+
+    Trees on the bottom level come without their entries; `expand` lists
+    those from the tree entry (path, type and oid).
+    """
+    out = []
+    for e in entries or []:
+        out.append({"path": e["path"], "type": e["type"]})
+        if depth > 1:
+            children = (e.get("object") or {}).get("entries")
+            out.extend(_flatten_tree(children, expand, depth - 1))
+        elif e["type"] == "tree":
+            out.extend(expand(e))
+    return out
+
+
+def _subtree(owner: str, repo: str, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Everything under the tree `entry`, through one recursive REST call."""
+    tree = get_tree(owner, repo, entry["oid"]).get("tree", [])
+    return [{"path": f"{entry['path']}/{t['path']}", "type": t["type"]} for t in tree]
+
+
+def get_repos_batch(full_names: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Metadata and file listing for many repos, REPO_BATCH per query.
+
+    Values look like the REST repo object (full_name, html_url,
+    stargazers_count, forks_count, pushed_at, archived, default_branch) plus
+    a "tree" in the shape get_repo_tree returns; None for missing repos.
+    """
+    out: Dict[str, Optional[Dict[str, Any]]] = {}
+    fields = (
+        "nameWithOwner url stargazerCount forkCount pushedAt isArchived "
+        "defaultBranchRef { name } " + _tree_selection(TREE_DEPTH)
+    )
+    for batch in _chunks(full_names, REPO_BATCH):
+        args, parts, variables = [], [], {}
+        for i, full in enumerate(batch):
+            owner, name = full.split("/")
+            args.append(f"$o{i}: String!, $n{i}: String!")
+            parts.append(f"r{i}: repository(owner: $o{i}, name: $n{i}) {{ {fields} }}")
+            variables.update({f"o{i}": owner, f"n{i}": name})
+        data = graphql(
+            f"query Repos({', '.join(args)}) {{ {' '.join(parts)} }}", variables
+        )
+        for i, full in enumerate(batch):
+            repo = data.get(f"r{i}")
+            if repo is None:
+                out[full] = None
+                continue
+            expand = functools.partial(_subtree, *full.split("/"))
+            out[full] = {
+                "full_name": repo["nameWithOwner"],
+                "html_url": repo["url"],
+                "stargazers_count": repo["stargazerCount"],
+                "forks_count": repo["forkCount"],
+                "pushed_at": repo["pushedAt"],
+                "archived": repo["isArchived"],
+                "default_branch": (repo.get("defaultBranchRef") or {}).get("name"),
+                "tree": _flatten_tree(
+                    (repo.get("object") or {}).get("entries"), expand
+                ),
+            }
+    return out
+
+
+def get_files_batch(
+    files: List[Tuple[str, str, str]],
+) -> Dict[Tuple[str, str, str], str]:
+    """Text of many (owner, repo, path) blobs at HEAD, BLOB_BATCH per query.
+
+    Blobs GraphQL can't return as text (binary or truncated) are fetched
+    through get_file; missing ones are left out.
+    """
+    out = {}
+    for batch in _chunks(files, BLOB_BATCH):
+        repos: Dict[Tuple[str, str], List[int]] = {}
+        for i, (owner, repo, _) in enumerate(batch):
+            repos.setdefault((owner, repo), []).append(i)
+        args, parts, variables = [], [], {}
+        for j, ((owner, repo), idx) in enumerate(repos.items()):
+            args.append(f"$o{j}: String!, $n{j}: String!")
+            variables.update({f"o{j}": owner, f"n{j}": repo})
+            blobs = []
+            for i in idx:
+                args.append(f"$e{i}: String!")
+                variables[f"e{i}"] = f"HEAD:{batch[i][2]}"
+                blobs.append(
+                    f"f{i}: object(expression: $e{i}) "
+                    "{ ... on Blob { text isBinary isTruncated } }"
+                )
+            parts.append(
+                f"r{j}: repository(owner: $o{j}, name: $n{j}) {{ {' '.join(blobs)} }}"
+            )
+        data = graphql(
+            f"query Blobs({', '.join(args)}) {{ {' '.join(parts)} }}", variables
+        )
+        for j, idx in enumerate(repos.values()):
+            repo = data.get(f"r{j}") or {}
+            for i in idx:
+                blob = repo.get(f"f{i}")
+                if blob is None:
+                    continue
+                if blob.get("text") is None or blob.get("isTruncated"):
+                    out[batch[i]] = get_file(*batch[i])
+                else:
+                    out[batch[i]] = blob["text"]
+    return out
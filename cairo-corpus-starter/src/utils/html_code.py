@@ -0,0 +1,34 @@
+import re
+from typing import List
+
+import lxml.etree
+import lxml.html
+
+# the scrapers' Cairo heuristics (substring tests), as one pattern
+CAIRO_HINT = re.compile(r"use::core|starknet::|pub|mod|fn ")
+CODE_TAGS = ("pre", "code")
+
+_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+
+def extract_code_blocks(html: str) -> List[str]:
+    """Text of the code blocks in `html` that look like Cairo, in page order.
+
+    Parses with libxml2 and walks the tree once. Only the outermost of nested
+    code elements counts, so `<pre><code>` yields one block; its text is
+    taken verbatim (highlighting spans are joined, not split into lines).
+    """
+    if not html or not html.strip():
+        return []
+    try:
+        root = lxml.html.fromstring(html.encode("utf-8"), parser=_PARSER)
+    except (lxml.etree.ParserError, ValueError):
+        return []
+    blocks = []
+    for el in root.iter(CODE_TAGS):
+        if next(el.iterancestors(CODE_TAGS), None) is not None:
+            continue
+        txt = "".join(el.itertext())
+        if CAIRO_HINT.search(txt):
+            blocks.append(txt)
+    return blocks
@@ -0,0 +1,109 @@
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+USER_AGENT = os.getenv("USER_AGENT", "cairo-corpus-bot/0.1")
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+# connections kept alive per host; keep it >= the scrapers' --concurrency
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class BearerAuth(requests.auth.AuthBase):
+    """Authorization header for a token; sends nothing when there is no token."""
+
+    def __init__(self, token: Optional[str]):
+        self.token = token
+
+    def __call__(self, r):
+        if self.token:
+            r.headers["Authorization"] = f"Bearer {self.token}"
+        return r
+
+
+class _Adapter(HTTPAdapter):
+    # requests has no session-wide timeout, so apply the default here
+    def __init__(self, timeout: float, **kw):
+        self.timeout = timeout
+        super().__init__(**kw)
+
+    def send(self, request, timeout=None, **kw):
+        return super().send(request, timeout=timeout or self.timeout, **kw)
+
+
+def retry_policy(retries: int = HTTP_RETRIES, statuses=RETRY_STATUSES) -> Retry:
+    """Retries for idempotent requests, honouring Retry-After, with jittered backoff."""
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries if statuses else 0,
+        status_forcelist=statuses,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        backoff_factor=0.5,
+        backoff_jitter=0.5,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def _count_response(r: requests.Response, *args, **kwargs):
+    metrics.add("http_requests")
+
+
+def make_session(
+    headers: Optional[Dict[str, str]] = None,
+    auth: Optional[requests.auth.AuthBase] = None,
+    retries: Optional[Retry] = None,
+    pool_size: int = HTTP_POOL_SIZE,
+    timeout: float = HTTP_TIMEOUT,
+) -> requests.Session:
+    """A requests.Session with keep-alive pools per host, retries and a timeout.
+
+    Responses are counted as http_requests of the running stage (see
+    src/utils/metrics.py).
+    """
+    s = requests.Session()
+    s.hooks["response"].append(_count_response)
+    adapter = _Adapter(
+        timeout,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retries if retries is not None else retry_policy(),
+    )
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers["User-Agent"] = USER_AGENT
+    s.headers.update(headers or {})
+    s.auth = auth
+    return s
+
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def session(name: str = "default", **kw) -> requests.Session:
+    """Process-wide session registered under `name`, created on first use.
+
+    Scrapers share the default one; keyword arguments only apply when the
+    session is created (see make_session).
+    """
+    with _lock:
+        if name not in _sessions:
+            _sessions[name] = make_session(**kw)
+        return _sessions[name]
+
+
+def close_sessions():
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
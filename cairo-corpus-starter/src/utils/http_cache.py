@@ -0,0 +1,103 @@
+import collections
+import json
+import pathlib
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from . import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT,
+    body BLOB
+);
+"""
+
+# response headers worth replaying along with a cached body
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link")
+
+
+def cache_key(url: str, params: Optional[Dict] = None) -> str:
+    if not params:
+        return url
+    return url + "?" + urlencode(sorted((k, str(v)) for k, v in params.items()))
+
+
+class ResponseCache:
+    """Persistent store of GET bodies with their validators (ETag/Last-Modified).
+
+    `conditional_headers` tells what to send; on a 304 `replay` rebuilds the
+    original response from disk. Safe to share between threads.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    def _row(self, key: str) -> Optional[Tuple]:
+        with self.lock:
+            return self.db.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key=?",
+                (key,),
+            ).fetchone()
+
+    def conditional_headers(self, key: str) -> Dict[str, str]:
+        row = self._row(key)
+        if row is None:
+            return {}
+        h = {}
+        if row[0]:
+            h["If-None-Match"] = row[0]
+        if row[1]:
+            h["If-Modified-Since"] = row[1]
+        return h
+
+    def store(self, key: str, r: requests.Response):
+        metrics.add("cache_misses")
+        etag, lm = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        if r.status_code != 200 or not (etag or lm):
+            return
+        headers = {k: r.headers[k] for k in KEPT_HEADERS if k in r.headers}
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, etag, lm, json.dumps(headers), r.content),
+            )
+            self.db.commit()
+        self.stats["stored"] += 1
+
+    def replay(self, key: str, r: requests.Response) -> requests.Response:
+        """Turn a 304 for `key` into the 200 response it stands for."""
+        row = self._row(key)
+        if row is None:
+            return r
+        self.stats["hits"] += 1
+        metrics.add("cache_hits")
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.url = r.url
+        cached.request = r.request
+        cached.headers = CaseInsensitiveDict(json.loads(row[2]))
+        # rate-limit headers on the 304 are current, keep them
+        cached.headers.update(
+            {k: v for k, v in r.headers.items() if k.lower().startswith("x-ratelimit")}
+        )
+        cached._content = row[3]
+        cached.encoding = r.encoding or "utf-8"
+        return cached
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,195 @@
+import collections
+import contextlib
+import contextvars
+import cProfile
+import functools
+import pathlib
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+PROFILE_DIR = pathlib.Path("data/cache/profiles")
+PROFILERS = ("cprofile", "sample")
+# seconds between stack samples of the "sample" profiler
+SAMPLE_INTERVAL = 0.005
+
+
+class StageMetrics:
+    """Counters of one stage run, filled in by the code the stage calls.
+
+    Conventional keys: records, bytes_read, bytes_written, http_requests,
+    cache_hits, cache_misses and rate_limit_sleep_s. Safe to share between
+    threads.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts: collections.Counter = collections.Counter()
+        self.lock = threading.Lock()
+        self.wall_s = 0.0
+        self.profile: Optional[str] = None
+
+    def add(self, key: str, value: float = 1):
+        with self.lock:
+            self.counts[key] += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            counts = dict(self.counts)
+        out: Dict[str, Any] = {"wall_s": round(self.wall_s, 3)}
+        for key in sorted(counts):
+            v = counts[key]
+            out[key] = round(v, 3) if isinstance(v, float) else v
+        records = counts.get("records", 0)
+        out["records_per_s"] = round(records / self.wall_s, 1) if self.wall_s else 0.0
+        if self.profile:
+            out["profile"] = self.profile
+        return out
+
+
+_current: contextvars.ContextVar[Optional[StageMetrics]] = contextvars.ContextVar(
+    "stage_metrics", default=None
+)
+# thread ident -> the stage it is working for, read by the sampling profiler
+_threads: Dict[int, StageMetrics] = {}
+
+
+def current() -> Optional[StageMetrics]:
+    return _current.get()
+
+
+def add(key: str, value: float = 1):
+    """Add `value` to `key` of the stage running in this context, if any."""
+    m = _current.get()
+    if m is not None:
+        m.add(key, value)
+
+
+def write_text(path: Union[str, pathlib.Path], text: str):
+    """path.write_text(text), counted as bytes_written."""
+    data = text.encode("utf-8")
+    pathlib.Path(path).write_bytes(data)
+    add("bytes_written", len(data))
+
+
+def read_text(path: Union[str, pathlib.Path]) -> str:
+    """path.read_text(), counted as bytes_read."""
+    data = pathlib.Path(path).read_bytes()
+    add("bytes_read", len(data))
+    return data.decode("utf-8")
+
+
+def _enter(m: StageMetrics):
+    ident = threading.get_ident()
+    state = (_current.set(m), ident, _threads.get(ident))
+    _threads[ident] = m
+    return state
+
+
+def _exit(state):
+    token, ident, prev = state
+    _current.reset(token)
+    if prev is None:
+        _threads.pop(ident, None)
+    else:
+        _threads[ident] = prev
+
+
+def bind(fn: Callable) -> Callable:
+    """`fn`, counting towards the current stage from whatever thread calls it.
+
+    Wrap callables handed to thread pools; threads don't inherit the stage.
+    """
+    m = _current.get()
+    if m is None:
+        return fn
+
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        state = _enter(m)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _exit(state)
+
+    return bound
+
+
+class _Sampler:
+    """Samples the stacks of every thread working for `stage` (see `bind`)."""
+
+    def __init__(self, stage: StageMetrics, interval: float = SAMPLE_INTERVAL):
+        self.stage = stage
+        self.interval = interval
+        self.stacks: collections.Counter = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if _threads.get(ident) is not self.stage:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(
+                        f"{pathlib.Path(code.co_filename).name}:{code.co_name}"
+                    )
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self, path: pathlib.Path):
+        """Stop sampling and write folded stacks (flamegraph.pl/speedscope input)."""
+        self.stopped.set()
+        self.thread.join()
+        path.write_text(
+            "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+        )
+
+
+@contextlib.contextmanager
+def stage(
+    name: str,
+    profile: Optional[str] = None,
+    profile_dir: pathlib.Path = PROFILE_DIR,
+):
+    """Count everything run inside the block towards the StageMetrics it yields.
+
+    `profile` optionally profiles the stage into `profile_dir`:
+    - "cprofile": deterministic profile of the calling thread, `<name>.prof`
+      (open with pstats or snakeviz); pool workers are not included, and on
+      Python 3.12+ only one stage can be under cProfile at a time
+    - "sample": stack samples of every thread working for the stage, pool
+      workers wrapped with `bind` included, as folded stacks `<name>.folded`
+    """
+    if profile not in (None,) + PROFILERS:
+        raise ValueError(f"unknown profiler {profile!r}; use {' or '.join(PROFILERS)}")
+    m = StageMetrics(name)
+    state = _enter(m)
+    profiler = sampler = None
+    if profile:
+        profile_dir = pathlib.Path(profile_dir)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+    if profile == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == "sample":
+        sampler = _Sampler(m)
+    t0 = time.perf_counter()
+    try:
+        yield m
+    finally:
+        m.wall_s = time.perf_counter() - t0
+        if profiler is not None:
+            profiler.disable()
+            path = profile_dir / f"{name}.prof"
+            profiler.dump_stats(path)
+            m.profile = str(path)
+        if sampler is not None:
+            path = profile_dir / f"{name}.folded"
+            sampler.stop(path)
+            m.profile = str(path)
+        _exit(state)
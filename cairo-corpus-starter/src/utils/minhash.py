@@ -0,0 +1,252 @@
+import pathlib
+from typing import Callable, Iterator, List, Optional, Set, Tuple, Union
+
+import numpy as np
+from rapidfuzz.distance.Levenshtein import distance
+
+# indexed code, or where to get it once it becomes a candidate
+CodeRef = Union[str, pathlib.Path, Callable[[], str]]
+# shingles permuted per step of MinHasher.signature; bounds its scratch
+# matrix to num_perm x SIGNATURE_CHUNK words (6 MiB at 384 permutations)
+SIGNATURE_CHUNK = 2048
+# signature values NearDupIndex keeps per snippet to estimate Jaccard with
+EST_PERM = 128
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer, spreads the packed shingle bytes over all 64 bits
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def shingle_hashes(code: str, width: int = 8) -> np.ndarray:
+    """64-bit hashes of every `width`-byte window of `code` (width <= 8)."""
+    buf = np.frombuffer(code.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    if len(buf) < width:
+        buf = np.concatenate([buf, np.zeros(width - len(buf), dtype=np.uint64)])
+    n = len(buf) - width + 1
+    packed = np.zeros(n, dtype=np.uint64)
+    for j in range(width):
+        packed = (packed << np.uint64(8)) | buf[j : j + n]
+    return _mix(packed)
+
+
+class MinHasher:
+    """MinHash signatures over byte shingles, using multiply-shift permutations."""
+
+    def __init__(self, num_perm: int = 64, width: int = 8, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.width = width
+        self.seed = seed
+        # odd multipliers keep each permutation a bijection on 64-bit words
+        self._a = rng.integers(0, 2**63, num_perm, dtype=np.uint64) * np.uint64(
+            2
+        ) + np.uint64(1)
+        self._b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+
+    @property
+    def params(self) -> str:
+        return f"{self.num_perm}:{self.width}:{self.seed}"
+
+    def signature(self, code: str) -> np.ndarray:
+        # repeated shingles can't change a minimum, so no np.unique
+        h = shingle_hashes(code, self.width)
+        out = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(h), SIGNATURE_CHUNK):
+            with np.errstate(over="ignore"):
+                perm = np.multiply.outer(self._a, h[start : start + SIGNATURE_CHUNK])
+                perm += self._b[:, None]
+            np.minimum(out, perm.min(axis=1), out=out)
+        # the shift is monotone, so it can wait until after the minimum
+        return (out >> np.uint64(32)).astype(np.uint32)
+
+
+class _BandTable:
+    """Band key -> ids of the snippets sharing it, as flat numpy arrays.
+
+    Keys sit in an open-addressing table and the entries sharing one, each
+    numbered id * bands + band, are chained through `_next`, so an entry
+    costs ~12 bytes where a dict of bytes keys and lists costs ~200; 64 bands
+    of a million snippets take ~1.3 GiB (entry numbers are int32, enough for
+    33M snippets at 64 bands). Keys are 32-bit: a clash, even between two
+    bands of one snippet, merges two buckets, which only adds candidates for
+    the signature check to drop.
+    """
+
+    def __init__(self, bands: int, size: int = 1 << 16):
+        self.bands = bands
+        self._keys = np.zeros(size, dtype=np.uint32)  # 0 marks a free slot
+        self._heads = np.zeros(size, dtype=np.int32)
+        self._next = np.zeros((1024, bands), dtype=np.int32)
+        self._used = 0
+
+    def _slot(self, key: int) -> int:
+        mask = len(self._keys) - 1
+        i = key & mask
+        while True:
+            k = int(self._keys[i])
+            if k == key or not k:
+                return i
+            i = (i + 1) & mask
+
+    def _grow(self):
+        full = np.flatnonzero(self._keys)
+        keys, heads = self._keys[full], self._heads[full]
+        mask = 2 * len(self._keys) - 1
+        self._keys = np.zeros(mask + 1, dtype=np.uint32)
+        self._heads = np.zeros(mask + 1, dtype=np.int32)
+        slots = (keys & np.uint32(mask)).astype(np.int64)
+        while len(keys):
+            # of the keys probing a free slot, the first one takes it
+            win = np.zeros(len(keys), dtype=bool)
+            win[np.unique(slots, return_index=True)[1]] = True
+            win &= self._keys[slots] == 0
+            self._keys[slots[win]] = keys[win]
+            self._heads[slots[win]] = heads[win]
+            keys, heads, slots = keys[~win], heads[~win], (slots[~win] + 1) & mask
+
+    def get(self, keys: List[int]) -> Iterator[int]:
+        for key in keys:
+            slot = self._slot(key)
+            e = int(self._heads[slot]) if self._keys[slot] else -1
+            while e >= 0:
+                i, band = divmod(e, self.bands)
+                yield i
+                e = int(self._next[i, band])
+
+    def add(self, i: int, keys: List[int]):
+        if i == len(self._next):
+            self._next = np.concatenate([self._next, np.zeros_like(self._next)])
+        if 2 * (self._used + self.bands) > len(self._keys):
+            self._grow()
+        for band, key in enumerate(keys):
+            slot = self._slot(key)
+            if self._keys[slot]:
+                self._next[i, band] = self._heads[slot]
+            else:
+                self._keys[slot] = key
+                self._next[i, band] = -1
+                self._used += 1
+            self._heads[slot] = i * self.bands + band
+
+
+class NearDupIndex:
+    """LSH band index that finds near-duplicate snippets without a full scan.
+
+    Signatures are split into `bands` bands of `num_perm // bands` rows; any
+    snippet sharing a band with the query is a candidate. Candidates whose
+    estimated shingle Jaccard is below `min_jaccard` are dropped, the rest are
+    confirmed with the exact `is_duplicate` check at `threshold`.
+
+    The defaults (64 bands x 6 rows) put the LSH threshold near Jaccard 0.5.
+    A 0.98 Levenshtein match with its edits in one place lands well above
+    that; 2% of single-byte edits spread evenly over a file is the worst case
+    (Jaccard ~0.71) and shares a band ~99.99% of the time. Six rows per band
+    keep unrelated snippets built from the same templates (Jaccard mostly
+    0.1-0.3) apart: a query shares a band with well under 1 in 10,000 indexed
+    snippets, so candidates stay few as the index grows.
+    Only the first EST_PERM signature values are kept for the `min_jaccard`
+    estimate.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.98,
+        num_perm: int = 384,
+        bands: int = 64,
+        width: int = 8,
+        min_jaccard: float = 0.5,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_jaccard = min_jaccard
+        self.hasher = MinHasher(num_perm=num_perm, width=width, seed=seed)
+        self._table = _BandTable(bands)
+        self._est = min(num_perm, EST_PERM)
+        self._sigs = np.zeros((1024, self._est), dtype=np.uint32)
+        self._codes: List[CodeRef] = []
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def _band_keys(self, sig: np.ndarray) -> List[int]:
+        rows = sig.reshape(self.bands, self.rows).astype(np.uint64)
+        h = np.arange(self.bands, dtype=np.uint64)
+        for j in range(self.rows):
+            h = _mix(h ^ rows[:, j])
+        h ^= h >> np.uint64(32)
+        # 32 bits, never 0, which marks a free slot
+        return np.maximum(h & np.uint64(0xFFFFFFFF), np.uint64(1)).tolist()
+
+    def candidates(self, code: str, sig: Optional[np.ndarray] = None) -> Set[int]:
+        if sig is None:
+            sig = self.hasher.signature(code)
+        return set(self._table.get(self._band_keys(sig)))
+
+    def code(self, i: int) -> str:
+        c = self._codes[i]
+        if isinstance(c, pathlib.Path):
+            return c.read_text()
+        return c() if callable(c) else c
+
+    def _max_edits(self, a: str, b: str) -> int:
+        # edits allowed at `threshold`; an integer cutoff keeps a pair exactly
+        # at the threshold from being lost to float rounding
+        return int((1 - self.threshold) * max(len(a), len(b)) + 1e-9)
+
+    def matches(
+        self, code: str, sig: Optional[np.ndarray] = None
+    ) -> Iterator[Tuple[int, float]]:
+        """(id, similarity) of indexed snippets at least `threshold` similar."""
+        if sig is None:
+            sig = self.hasher.signature(code)
+        cands = np.fromiter(sorted(self.candidates(code, sig)), dtype=np.int64)
+        if not len(cands):
+            return
+        est = (self._sigs[cands] == sig[: self._est]).mean(axis=1)
+        for i in cands[est >= self.min_jaccard].tolist():
+            other = self.code(i)
+            limit = self._max_edits(code, other)
+            # Levenshtein distance is at least the length difference
+            if abs(len(code) - len(other)) > limit:
+                continue
+            d = distance(code, other, score_cutoff=limit)
+            if d <= limit:
+                yield i, 1 - d / (max(len(code), len(other)) or 1)
+
+    def find_duplicate(
+        self, code: str, sig: Optional[np.ndarray] = None
+    ) -> Optional[int]:
+        """Id of an indexed snippet that is a near-duplicate of `code`, if any."""
+        for i, _ in self.matches(code, sig):
+            return i
+        return None
+
+    def add(self, code: CodeRef, sig: Optional[np.ndarray] = None) -> int:
+        """Index a snippet; a path or callable defers loading the code until it
+        is a candidate, in which case `sig` is required."""
+        if sig is None:
+            sig = self.hasher.signature(code)
+        i = len(self._codes)
+        if i == len(self._sigs):
+            self._sigs = np.concatenate([self._sigs, np.zeros_like(self._sigs)])
+        self._sigs[i] = sig[: self._est]
+        self._codes.append(code)
+        self._table.add(i, self._band_keys(sig))
+        return i
+
+    def add_if_new(self, code: str) -> bool:
+        """Index `code` unless it near-duplicates something already indexed."""
+        sig = self.hasher.signature(code)
+        if self.find_duplicate(code, sig) is not None:
+            return False
+        self.add(code, sig)
+        return True
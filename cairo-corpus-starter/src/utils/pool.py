@@ -0,0 +1,24 @@
+import collections
+import itertools
+from multiprocessing.pool import Pool
+from typing import Any, Callable, Iterable, Iterator
+
+
+def imap_window(
+    pool: Pool, fn: Callable[[Any], Any], items: Iterable, window: int
+) -> Iterator:
+    """pool.imap that keeps at most `window` calls in flight.
+
+    pool.imap queues every item up front and workers run as far ahead as
+    they can, so results pile up whenever the consumer is slower. Here a
+    call is only submitted once the consumer has taken an earlier result.
+    """
+    it = iter(items)
+    pending = collections.deque(
+        pool.apply_async(fn, (x,)) for x in itertools.islice(it, window)
+    )
+    while pending:
+        res = pending.popleft()
+        for x in itertools.islice(it, 1):
+            pending.append(pool.apply_async(fn, (x,)))
+        yield res.get()
@@ -0,0 +1,168 @@
+import collections
+import datetime
+import email.utils
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import requests
+
+from . import metrics
+
+# Requests/second ceilings per GitHub resource. REST stays under the secondary
+# limit of 900 points/minute, search under 30 requests/minute (10 without a
+# token), raw.githubusercontent.com has no published limit so we stay polite.
+DEFAULT_RATES = {"core": 15.0, "search": 0.5, "graphql": 5.0, "raw": 20.0}
+UNAUTHENTICATED_RATES = {"core": 15.0, "search": 10 / 60, "graphql": 5.0, "raw": 20.0}
+# below this share of the hourly quota, spread what is left until the reset
+RESERVE = 0.1
+
+
+def _retry_after(value: str, now: float) -> Optional[float]:
+    """Seconds a Retry-After header asks for, given as delay-seconds or an
+    HTTP-date; None if it is neither."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=datetime.timezone.utc)
+    return max(when.timestamp() - now, 0.0)
+
+
+class _Bucket:
+    def __init__(self, rate: float, burst: float, now: float):
+        self.max_rate = self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return how long to wait before using it."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+
+class RateLimiter:
+    """Shared pacing, rate-limit handling and retries for GitHub requests.
+
+    Each resource ("core", "search", "graphql", "raw") gets a token bucket.
+    Responses feed back X-RateLimit-Remaining/Reset (pausing the resource
+    when the quota is spent, and pacing when it runs low) and Retry-After on
+    secondary limits. Failed requests are retried with exponential backoff
+    and full jitter. Time spent waiting is counted in `stats`.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, float]] = None,
+        burst: float = 5.0,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 120.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rates = dict(rates or DEFAULT_RATES)
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.buckets: Dict[str, _Bucket] = {}
+        self.stats = collections.Counter()
+
+    def _bucket(self, resource: str) -> _Bucket:
+        if resource not in self.buckets:
+            rate = self.rates.get(resource, self.rates["core"])
+            self.buckets[resource] = _Bucket(
+                rate, min(self.burst, max(rate, 1)), self.clock()
+            )
+        return self.buckets[resource]
+
+    def _wait(self, seconds: float, reason: str):
+        if seconds > 0:
+            self.stats[f"{reason}_wait_s"] += seconds
+            self.stats[f"{reason}_waits"] += 1
+            metrics.add("rate_limit_sleep_s", seconds)
+            self.sleep(seconds)
+
+    def _turn(self, resource: str):
+        with self.lock:
+            wait = self._bucket(resource).reserve(self.clock())
+        self._wait(wait, "throttle")
+
+    def _observe(self, resource: str, r: requests.Response):
+        remaining = r.headers.get("X-RateLimit-Remaining")
+        reset = r.headers.get("X-RateLimit-Reset")
+        limit = r.headers.get("X-RateLimit-Limit")
+        if remaining is None or reset is None:
+            return
+        now = self.clock()
+        window = max(float(reset) - now, 1.0)
+        with self.lock:
+            b = self._bucket(r.headers.get("X-RateLimit-Resource", resource))
+            if int(remaining) <= 0:
+                b.blocked_until = max(b.blocked_until, float(reset) + 1)
+            elif limit and int(remaining) < RESERVE * int(limit):
+                b.rate = min(b.max_rate, int(remaining) / window)
+            else:
+                b.rate = b.max_rate
+
+    def _rate_limited_wait(self, r: requests.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait if `r` is a primary or secondary rate-limit answer."""
+        if r.status_code not in (403, 429):
+            return None
+        retry_after = r.headers.get("Retry-After")
+        if retry_after is not None:
+            wait = _retry_after(retry_after, self.clock())
+            if wait is not None:
+                return wait
+        if r.headers.get("X-RateLimit-Remaining") == "0":
+            reset = float(r.headers.get("X-RateLimit-Reset", 0))
+            return max(reset - self.clock(), 0) + 1
+        if r.status_code == 429 or "rate limit" in r.text.lower():
+            # secondary limit without Retry-After: GitHub asks for at least a minute
+            return max(60.0, self._backoff_delay(attempt))
+        return None
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def request(self, resource: str, send: Callable[[], requests.Response]):
+        """Run `send` when `resource` allows it, retrying limits and failures."""
+        for attempt in range(self.max_retries + 1):
+            self._turn(resource)
+            self.stats["requests"] += 1
+            last = attempt == self.max_retries
+            try:
+                r = send()
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+                self.stats["retries"] += 1
+                self._wait(self._backoff_delay(attempt), "backoff")
+                continue
+            self._observe(resource, r)
+            limited = self._rate_limited_wait(r, attempt)
+            if limited is not None and not last:
+                self.stats["rate_limited"] += 1
+                self.stats["retries"] += 1
+                self._wait(limited, "rate_limit")
+                continue
+            if r.status_code >= 500 and not last:
+                self.stats["retries"] += 1
+                self._wait(self._backoff_delay(attempt), "backoff")
+                continue
+            return r
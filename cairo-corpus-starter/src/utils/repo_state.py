@@ -0,0 +1,71 @@
+import pathlib
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repos (
+    full_name TEXT PRIMARY KEY, pushed_at TEXT, default_branch TEXT, tree_sha TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    full_name TEXT, path TEXT, sha TEXT, PRIMARY KEY (full_name, path)
+);
+"""
+
+
+class RepoStateStore:
+    """What scrape_github last collected from each repo.
+
+    - repos: pushed_at, default branch and tree SHA at the last scrape
+    - files: blob SHA of every file collected from the repo
+    Safe to share between threads.
+    """
+
+    def __init__(self, path: pathlib.Path):
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def get(self, full_name: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT pushed_at, default_branch, tree_sha FROM repos WHERE full_name=?",
+                (full_name,),
+            ).fetchone()
+            if row is None:
+                return None
+            files = self.db.execute(
+                "SELECT path, sha FROM files WHERE full_name=?", (full_name,)
+            ).fetchall()
+        return {
+            "pushed_at": row[0],
+            "default_branch": row[1],
+            "tree_sha": row[2],
+            "files": dict(files),
+        }
+
+    def put(
+        self,
+        full_name: str,
+        pushed_at: Optional[str],
+        default_branch: Optional[str],
+        tree_sha: Optional[str] = None,
+        files: Optional[Dict[str, str]] = None,
+    ):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO repos VALUES (?, ?, ?, ?)",
+                (full_name, pushed_at, default_branch, tree_sha),
+            )
+            self.db.execute("DELETE FROM files WHERE full_name=?", (full_name,))
+            self.db.executemany(
+                "INSERT INTO files VALUES (?, ?, ?)",
+                [(full_name, p, sha) for p, sha in (files or {}).items()],
+            )
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
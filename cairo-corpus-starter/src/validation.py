@@ -0,0 +1,172 @@
+import itertools
+import multiprocessing
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from jsonschema import Draft202012Validator
+
+from .schema import schema
+
+Check = Callable[[Any], bool]
+
+_TYPES: Dict[str, Check] = {
+    "object": lambda v: type(v) is dict,
+    "array": lambda v: type(v) is list,
+    "string": lambda v: type(v) is str,
+    "boolean": lambda v: type(v) is bool,
+    # floats like 1.0 are valid integers to jsonschema; leave those to the slow path
+    "integer": lambda v: type(v) is int,
+    "number": lambda v: type(v) in (int, float),
+}
+
+
+def compile_schema(sch: Dict[str, Any]) -> Optional[Check]:
+    """Turn `sch` into a plain Python predicate.
+
+    The predicate only answers True when the instance is certainly valid, so a
+    False just means "ask jsonschema". Returns None if the schema uses a
+    keyword this compiler does not know.
+    """
+    checks: List[Check] = []
+    for kw, arg in sch.items():
+        if kw == "type":
+            if arg not in _TYPES:
+                return None
+            checks.append(_TYPES[arg])
+        elif kw == "enum":
+            allowed = [a for a in arg if type(a) is str]
+            if len(allowed) != len(arg):
+                return None
+            allowed_set = frozenset(allowed)
+            checks.append(lambda v, s=allowed_set: type(v) is str and v in s)
+        elif kw == "minLength":
+            checks.append(lambda v, n=arg: type(v) is not str or len(v) >= n)
+        elif kw == "minimum":
+            checks.append(lambda v, n=arg: type(v) not in (int, float) or v >= n)
+        elif kw == "maximum":
+            checks.append(lambda v, n=arg: type(v) not in (int, float) or v <= n)
+        elif kw == "required":
+            keys = tuple(arg)
+            checks.append(
+                lambda v, ks=keys: type(v) is not dict or all(k in v for k in ks)
+            )
+        elif kw == "properties":
+            props = {}
+            for name, sub in arg.items():
+                props[name] = compile_schema(sub)
+                if props[name] is None:
+                    return None
+            checks.append(
+                lambda v, ps=props: type(v) is not dict
+                or all(k not in v or p(v[k]) for k, p in ps.items())
+            )
+        elif kw == "additionalProperties":
+            if arg is not True:
+                return None
+        else:
+            return None
+    return lambda v: all(c(v) for c in checks)
+
+
+class RecordValidator:
+    """Schema validator built once and reused for every record.
+
+    Records go through the compiled predicate first; only those it can't
+    vouch for are handed to a prebuilt jsonschema validator, which also
+    produces the error messages.
+    """
+
+    def __init__(self, sch: Dict[str, Any] = schema):
+        Draft202012Validator.check_schema(sch)
+        self._slow = Draft202012Validator(sch)
+        self._fast = compile_schema(sch)
+
+    def errors(self, rec: Any) -> List[str]:
+        if self._fast is not None and self._fast(rec):
+            return []
+        return [
+            f"{'/'.join(map(str, e.absolute_path)) or '<root>'}: {e.message}"
+            for e in self._slow.iter_errors(rec)
+        ]
+
+    def is_valid(self, rec: Any) -> bool:
+        return not self.errors(rec)
+
+
+class ValidationReport:
+    """Every failure across a run, instead of stopping at the first."""
+
+    def __init__(self):
+        self.checked = 0
+        self.failures: List[Dict[str, Any]] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    def add(self, i: int, errors: List[str], key: Optional[str] = None):
+        self.failures.append({"record": i, "key": key, "errors": errors})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "checked": self.checked,
+            "invalid": len(self.failures),
+            "failures": self.failures,
+        }
+
+
+_validator: Optional[RecordValidator] = None
+
+
+def get_validator() -> RecordValidator:
+    """The per-process validator; compiled on first use, also inside workers."""
+    global _validator
+    if _validator is None:
+        _validator = RecordValidator()
+    return _validator
+
+
+def validate_batch(
+    batch: Tuple[int, List[Any]],
+) -> Tuple[int, List[Tuple[int, List[str]]]]:
+    """Size of one batch and (record number, errors) for its invalid records."""
+    start, recs = batch
+    v = get_validator()
+    out = []
+    for i, rec in enumerate(recs, start):
+        errs = v.errors(rec)
+        if errs:
+            out.append((i, errs))
+    return len(recs), out
+
+
+def _batches(records: Iterable[Any], size: int) -> Iterator[Tuple[int, List[Any]]]:
+    it = iter(records)
+    start = 0
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield start, batch
+        start += len(batch)
+
+
+def validate_records(
+    records: Iterable[Any], batch_size: int = 1000, workers: int = 1
+) -> ValidationReport:
+    """Validate every record, in batches, optionally across worker processes."""
+    report = ValidationReport()
+    batches = _batches(records, batch_size)
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        results = (
+            pool.imap(validate_batch, batches) if pool else map(validate_batch, batches)
+        )
+        for n, failures in results:
+            report.checked += n
+            for i, errs in failures:
+                report.add(i, errs)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return report
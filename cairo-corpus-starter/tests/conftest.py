@@ -0,0 +1,55 @@
+import pathlib
+
+import pytest
+from src import build_jsonl, clean_standardize
+from src.audit import audit
+from src.utils import github_api
+from src.utils.ratelimit import RateLimiter
+
+from tests.github_stub import GitHubStub
+
+DATASET = pathlib.Path("data/processed/dataset.jsonl")
+
+
+@pytest.fixture(scope="session")
+def audit_report():
+    """One streaming audit pass over the dataset, shared by the dataset tests."""
+    if not DATASET.exists():
+        return None
+    return audit(str(DATASET))
+
+
+@pytest.fixture(autouse=True)
+def fast_github_limiter(monkeypatch):
+    """Keep the GitHub pacing out of the way of tests that talk to the stub."""
+    monkeypatch.setattr(github_api, "_limiter", RateLimiter({"core": 1000.0}))
+
+
+@pytest.fixture
+def github_stub(monkeypatch):
+    """A GitHubStub on the fixture routes with github_api pointed at it.
+
+    The response cache starts empty and off; set github_api.CACHE_PATH to
+    turn it on. `routes` and `delay` can be changed on the stub in place.
+    """
+    with GitHubStub() as s:
+        monkeypatch.setattr(github_api, "API_URL", s.url)
+        monkeypatch.setattr(github_api, "RAW_URL", s.raw_url)
+        monkeypatch.setattr(github_api, "CACHE_PATH", "")
+        monkeypatch.setattr(github_api, "_cache", None)
+        yield s
+
+
+@pytest.fixture
+def clean_dirs(tmp_path, monkeypatch):
+    """(raw, processed) dirs under tmp_path for clean_standardize and build_jsonl."""
+    raw, proc = tmp_path / "raw", tmp_path / "processed"
+    raw.mkdir()
+    proc.mkdir()
+    monkeypatch.setattr(clean_standardize, "RAW", raw)
+    monkeypatch.setattr(clean_standardize, "V1", proc / "cairo_v1")
+    monkeypatch.setattr(clean_standardize, "V2", proc / "cairo_v2")
+    monkeypatch.setattr(clean_standardize, "INDEX", proc / "index.json")
+    monkeypatch.setattr(clean_standardize, "FINGERPRINTS", proc / "fp.sqlite")
+    monkeypatch.setattr(build_jsonl, "PROC", proc)
+    return raw, proc
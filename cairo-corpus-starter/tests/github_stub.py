@@ -0,0 +1,106 @@
+"""Local stand-in for the GitHub API that replays recorded responses.
+
+Routes come from tests/fixtures/github_responses.json: each one has a method,
+a path, optional query parameters and an optional substring of the request
+body ("match", used for GraphQL) that must match, and the status, headers
+and body to send back. API calls live at the root and raw file fetches
+under /raw, so point GITHUB_API_URL at `url` and GITHUB_RAW_URL at `raw_url`.
+"""
+
+import json
+import pathlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+FIXTURE = pathlib.Path(__file__).parent / "fixtures" / "github_responses.json"
+
+
+class GitHubStub:
+    def __init__(self, routes: Optional[List[Dict[str, Any]]] = None, delay=0.0):
+        self.routes = routes or json.loads(FIXTURE.read_text())["routes"]
+        self.delay = delay
+        # optional hook (method, path, query, headers, route) -> route, for
+        # tests that need stateful answers such as 304s or rate limiting
+        self.respond: Optional[Callable] = None
+        self.requests: List[Dict[str, Any]] = []
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.raw_url = self.url + "/raw"
+
+    def match(self, method: str, path: str, query: Dict[str, str], body=b""):
+        for r in self.routes:
+            if r["method"] == method and r["path"] == path:
+                if all(query.get(k) == v for k, v in r.get("query", {}).items()):
+                    if r.get("match", "").encode("utf-8") in body:
+                        return r
+        return None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method: str):
+                parts = urlsplit(self.path)
+                query = dict(parse_qsl(parts.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with stub._lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    stub.requests.append(
+                        {
+                            "method": method,
+                            "path": parts.path,
+                            "query": query,
+                            "headers": dict(self.headers),
+                            "body": body,
+                        }
+                    )
+                try:
+                    time.sleep(stub.delay)
+                    route = stub.match(method, parts.path, query, body)
+                    if stub.respond is not None:
+                        route = stub.respond(
+                            method, parts.path, query, self.headers, route
+                        )
+                    if route is None:
+                        route = {"status": 404, "body": {"message": "Not Found"}}
+                    payload = route.get("body", "")
+                    if isinstance(payload, (dict, list)):
+                        payload = json.dumps(payload)
+                    if isinstance(payload, str):
+                        payload = payload.encode("utf-8")
+                    self.send_response(route["status"])
+                    for k, v in route.get("headers", {}).items():
+                        self.send_header(k, v)
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,87 @@
+import json
+import os
+
+from src import clean_standardize
+from src.utils import metrics
+from src.utils.blobs import BlobStore
+from src.utils.fingerprints import content_hash
+
+
+def test_put_is_content_addressed_and_write_once(tmp_path):
+    store = BlobStore(tmp_path, ".cairo", fanout=2)
+    digest = content_hash("fn main() {}")
+    path = store.put("fn main() {}")
+    assert path == tmp_path / digest[:2] / digest[2:4] / f"{digest}.cairo"
+    assert path.read_text() == "fn main() {}" and digest in store
+
+    mtime = path.stat().st_mtime_ns
+    assert store.put("fn main() {}", digest) == path
+    assert path.stat().st_mtime_ns == mtime
+    assert store.stats == {"written": 1, "existing": 1, "bytes_written": 12}
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [path.name]
+
+
+def test_prune_keeps_only_the_given_blobs(tmp_path):
+    store = BlobStore(tmp_path, ".cairo")
+    kept = store.put("fn kept() {}")
+    gone = store.put("fn gone() {}")
+    (tmp_path / "org_repo__src_lib.cairo").write_text("fn old() {}")
+    (kept.parent / "x.tmp").write_text("")
+    assert store.prune([content_hash("fn kept() {}")]) == 3
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == [kept]
+    assert not gone.parent.exists() and store.stats["pruned"] == 3
+
+
+def _repo(full_name, code):
+    return {
+        "meta": {"source": "github", "repo": {"full_name": full_name}},
+        "files": [{"path": "src/lib.cairo", "code": code}],
+    }
+
+
+def test_long_names_no_longer_collide(tmp_path, monkeypatch):
+    raw, proc = tmp_path / "raw", tmp_path / "processed"
+    raw.mkdir()
+    monkeypatch.setattr(clean_standardize, "RAW", raw)
+    monkeypatch.setattr(clean_standardize, "V1", proc / "cairo_v1")
+    monkeypatch.setattr(clean_standardize, "V2", proc / "cairo_v2")
+    monkeypatch.setattr(clean_standardize, "INDEX", proc / "index.json")
+    monkeypatch.setattr(clean_standardize, "FINGERPRINTS", proc / "fp.sqlite")
+    proc.mkdir()
+    # the old names were the first 100 chars of "<full_name>__<path>"
+    prefix = "org/" + "x" * 120
+    token = "#[starknet::contract]\nmod token {\n    fn mint(amount: u256) {}\n}\n"
+    total = "use core::array::ArrayTrait;\n\nfn sum(values: Array<u32>) -> u32 {}\n"
+    codes = {prefix + "a": token, prefix + "b": total}
+    for i, (name, code) in enumerate(codes.items()):
+        (raw / f"{i}.json").write_text(json.dumps(_repo(name, code)))
+
+    clean_standardize.main()
+    index = json.loads((proc / "index.json").read_text())
+    assert len(index) == 2
+    for entry in index:
+        code = codes[entry["repo"]["full_name"]]
+        assert entry["code_sha"] == content_hash(code)
+        assert entry["code_path"].endswith(
+            f"/{entry['code_sha'][:2]}/{entry['code_sha']}.cairo"
+        )
+        assert open(entry["code_path"]).read() == code
+
+    # a full rebuild leaves every unchanged blob alone
+    mtimes = {e["code_path"]: os.stat(e["code_path"]).st_mtime_ns for e in index}
+    with metrics.stage("clean") as m:
+        clean_standardize.main(full=True)
+    assert json.loads((proc / "index.json").read_text()) == index
+    assert {p: os.stat(p).st_mtime_ns for p in mtimes} == mtimes
+    assert (m.counts["blobs_written"], m.counts["blobs_existing"]) == (0, 2)
+
+    # and deletes old name-based files and blobs nothing references any more
+    old = proc / "cairo_v2" / "org_xxx__src_lib.cairo"
+    old.write_text(token)
+    (raw / "1.json").unlink()
+    with metrics.stage("clean") as m:
+        clean_standardize.main(full=True)
+    assert m.counts["blobs_pruned"] == 2
+    [entry] = json.loads((proc / "index.json").read_text())
+    blobs = [p.as_posix() for p in proc.rglob("*.cairo")]
+    assert blobs == [entry["code_path"]] and entry["code_sha"] == content_hash(token)
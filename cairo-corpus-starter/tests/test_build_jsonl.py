@@ -0,0 +1,26 @@
+import os
+
+from src import build_jsonl, clean_standardize
+
+from tests.test_fingerprints import _write
+
+
+def test_incremental_build_matches_full_rebuild(clean_dirs, capsys):
+    raw, proc = clean_dirs
+    for i, name in enumerate(["vault", "token", "oracle", "bridge"]):
+        _write(raw, i, name)
+    clean_standardize.main()
+    out = str(proc / "dataset.jsonl")
+    build_jsonl.main(out)
+
+    _write(raw, 1, "staking")
+    os.remove(raw / "f3.json")
+    clean_standardize.main()
+    capsys.readouterr()
+    build_jsonl.main(out, incremental=True)
+    assert "(2/3 records reused)" in capsys.readouterr().out
+    full = str(proc / "full.jsonl")
+    build_jsonl.main(full)
+    for suffix in ("", ".idx"):
+        with open(out + suffix, "rb") as a, open(full + suffix, "rb") as b:
+            assert a.read() == b.read()
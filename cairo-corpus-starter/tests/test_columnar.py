@@ -0,0 +1,29 @@
+import json
+
+from src.columnar import export, load
+
+
+def test_export_round_trip(tmp_path):
+    src = tmp_path / "dataset.jsonl"
+    recs = [
+        {
+            "contract_name": f"c{i}",
+            "source": "github" if i % 2 else "docs",
+            "type": "ERC20",
+            "cairo_version": "2",
+            "last_updated": "",
+            "quality": {"category": "unknown", "score": i / 10},
+            "repo": {"url": "u", "stars": i, "forks": 0} if i % 2 else {},
+            "code": f"fn f{i}() {{}}\n",
+        }
+        for i in range(10)
+    ]
+    src.write_text("".join(json.dumps(r) + "\n" for r in recs))
+    paths = export(str(src), str(tmp_path), batch_size=3)
+
+    for path in paths.values():
+        t = load(path, ["source", "quality_score", "repo_stars"])
+        assert t.column_names == ["source", "quality_score", "repo_stars"]
+        assert t["source"].to_pylist() == [r["source"] for r in recs]
+        assert t["repo_stars"].to_pylist() == [r["repo"].get("stars") for r in recs]
+    assert load(paths["arrow"])["code"].to_pylist() == [r["code"] for r in recs]
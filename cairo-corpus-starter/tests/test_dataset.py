@@ -0,0 +1,30 @@
+import json
+
+from src.dataset import Dataset, index_path
+
+
+def _write(path, n):
+    path.write_text(
+        "".join(json.dumps({"i": i, "code": "x" * i}) + "\n" for i in range(n))
+    )
+
+
+def test_random_access(tmp_path):
+    p = tmp_path / "dataset.jsonl"
+    _write(p, 20)
+    with Dataset(p) as ds:
+        assert index_path(p).exists()
+        assert len(ds) == 20
+        assert ds[7]["i"] == 7 and ds[-1]["i"] == 19
+        assert [r["i"] for r in ds[3:9:2]] == [3, 5, 7]
+        assert ds.sample(5, seed=1) == ds.sample(5, seed=1)
+        assert len({r["i"] for r in ds.sample(20)}) == 20
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    p = tmp_path / "dataset.jsonl"
+    _write(p, 5)
+    Dataset(p).close()
+    _write(p, 8)
+    with Dataset(p) as ds:
+        assert len(ds) == 8 and ds[7]["i"] == 7
@@ -0,0 +1,95 @@
+import functools
+import json
+import os
+
+import numpy as np
+from src import clean_standardize
+from src.utils.fingerprints import FingerprintStore, content_hash, file_hash
+
+
+def test_raw_files_are_skipped_once_marked(tmp_path):
+    raw = tmp_path / "a.json"
+    raw.write_text('{"source": "docs", "blocks": []}')
+    store = FingerprintStore(tmp_path / "fp.sqlite", "128:8:1")
+    digest = store.raw_digest(raw)
+    assert digest == content_hash(raw.read_bytes()) == file_hash(raw, chunk=7)
+    store.mark_raw(raw, digest)
+    assert store.raw_digest(raw) is None
+    raw.write_text('{"source": "docs", "blocks": ["fn main() {}"]}')
+    assert store.raw_digest(raw) is not None
+
+
+def test_snippets_persist_across_runs(tmp_path):
+    sig = np.arange(128, dtype=np.uint32)
+    store = FingerprintStore(tmp_path / "fp.sqlite", "128:8:1")
+    store.add_snippet("kept", sig, "data/processed/cairo_v2/a.cairo")
+    store.add_snippet("dropped")
+    store.close()
+
+    store = FingerprintStore(tmp_path / "fp.sqlite", "128:8:1")
+    assert store.has_snippet("kept") and store.has_snippet("dropped")
+    [(loaded, path)] = list(store.accepted())
+    assert (loaded == sig).all() and path.endswith("a.cairo")
+    store.close()
+
+    # a different hasher config invalidates every stored signature
+    assert len(FingerprintStore(tmp_path / "fp.sqlite", "64:8:1")) == 0
+
+
+def _contract(name):
+    return f"#[starknet::contract]\nmod {name} {{\n    fn {name}_total() -> u256 {{}}\n}}\n"
+
+
+def _write(raw, i, *names):
+    doc = {
+        "meta": {"source": "github", "repo": {"full_name": f"org/r{i}"}},
+        "files": [{"path": f"src/{n}.cairo", "code": _contract(n)} for n in names],
+    }
+    (raw / f"f{i}.json").write_text(json.dumps(doc))
+
+
+def _index(proc):
+    entries = json.loads((proc / "index.json").read_text())
+    return sorted(entries, key=lambda e: e["code_sha"])
+
+
+def test_incremental_run_matches_full_after_edits(clean_dirs):
+    raw, proc = clean_dirs
+    write = functools.partial(_write, raw)
+    index = functools.partial(_index, proc)
+
+    write(0, "vault")
+    write(1, "token", "staking")
+    write(2, "oracle")
+    clean_standardize.main()
+    assert len(index()) == 4
+
+    write(1, "token", "bridge")
+    os.remove(raw / "f2.json")
+    clean_standardize.main()
+    incremental = index()
+    clean_standardize.main(full=True)
+    assert incremental == index()
+    assert sorted(e["contract_name"] for e in incremental) == [
+        "bridge",
+        "token",
+        "vault",
+    ]
+
+
+def test_workers_match_a_serial_run(clean_dirs, monkeypatch):
+    raw, proc = clean_dirs
+    for i in range(12):
+        # repeats across files, so cross-file dedup decides what is kept
+        _write(raw, i, f"c{i}", f"c{i % 5}_shared", "common")
+    clean_standardize.main(full=True)
+    serial = (proc / "index.json").read_text()
+    blobs = sorted(p for p in proc.rglob("*.cairo"))
+    clean_standardize.main(full=True, workers=2)
+    assert (proc / "index.json").read_text() == serial
+    assert sorted(p for p in proc.rglob("*.cairo")) == blobs
+    # files too big to hand back from a worker are streamed by the parent
+    monkeypatch.setattr(clean_standardize, "POOL_MAX_BYTES", 0)
+    clean_standardize.main(full=True, workers=2)
+    assert (proc / "index.json").read_text() == serial
+    assert len(json.loads(serial)) == 12 + 5 + 1
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+from src.utils import github_api
+from src.utils.http_cache import ResponseCache
+
+
+@pytest.fixture
+def cached_stub(github_stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(github_api, "CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    return github_stub
+
+
+def _revalidate(method, path, query, headers, route):
+    # answer like GitHub: 304 with an empty body when the ETag still matches
+    etag = route and route.get("headers", {}).get("ETag")
+    if etag and headers.get("If-None-Match") == etag:
+        return {"status": 304, "headers": {"ETag": etag}}
+    return route
+
+
+def test_conditional_requests_replay_cached_bodies(cached_stub):
+    cached_stub.respond = _revalidate
+    first = github_api.get_repo_tree("OpenZeppelin", "cairo-contracts")
+    assert len(first) == 12
+    assert not any("If-None-Match" in r["headers"] for r in cached_stub.requests)
+
+    cached_stub.requests.clear()
+    assert github_api.get_repo_tree("OpenZeppelin", "cairo-contracts") == first
+    assert [r["headers"].get("If-None-Match") for r in cached_stub.requests] == [
+        '"repo-cairo-contracts"',
+        '"tree-cairo-contracts"',
+    ]
+    assert github_api.response_cache().stats["hits"] == 2
+
+
+def test_cache_persists_across_processes(cached_stub, tmp_path):
+    cached_stub.respond = _revalidate
+    github_api.get_repo_tree("cairo-book", "examples")
+    github_api.response_cache().close()
+
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    key = f"{cached_stub.url}/repos/cairo-book/examples"
+    assert cache.conditional_headers(key) == {"If-None-Match": '"repo-examples"'}
+
+
+def test_graphql_batches_fall_back_and_report_missing(github_stub):
+    def respond(method, path, query, headers, route):
+        if path != "/graphql":
+            return route
+        body = json.loads(json.dumps(route["body"]))
+        if "r2" in body["data"] and "nameWithOwner" in body["data"]["r2"]:
+            body["data"]["r2"] = None
+            body["errors"] = [{"type": "NOT_FOUND", "path": ["r2"]}]
+        else:
+            body["data"]["r0"]["f1"] = {"text": None, "isBinary": True}
+        return dict(route, body=body)
+
+    github_stub.respond = respond
+    names = ["keep-starknet-strange/alexandria", "OpenZeppelin/cairo-contracts"]
+    metas = github_api.get_repos_batch(names + ["cairo-book/examples"])
+    assert metas["cairo-book/examples"] is None
+    rest = github_api.get_repo_tree(*names[1].split("/"))
+    assert [t["path"] for t in metas[names[1]]["tree"] if t["type"] == "blob"] == [
+        t["path"] for t in rest if t["type"] == "blob"
+    ]
+
+    paths = [f"src/contract_{i}.cairo" for i in range(5)]
+    want = [(*n.split("/"), p) for n in names for p in paths]
+    codes = github_api.get_files_batch(want)
+    assert list(codes) == want
+    raw = [r for r in github_stub.requests if r["path"].startswith("/raw/")]
+    assert [r["path"] for r in raw] == [
+        "/raw/keep-starknet-strange/alexandria/HEAD/src/contract_1.cairo"
+    ]
+    assert codes[want[1]] == github_api.get_file(*want[1])
+
+
+def _graphql_tree(path, depth):
+    # a chain of directories `depth` levels deep, cut like _tree_selection
+    name = path.rsplit("/", 1)[-1]
+    if depth == 1:
+        return {"path": path, "type": "tree", "oid": f"oid-{name}"}
+    child = _graphql_tree(f"{path}/d{depth - 1}", depth - 1)
+    blob = {"path": f"{path}/{name}.cairo", "type": "blob", "object": {}}
+    return {"path": path, "type": "tree", "object": {"entries": [child, blob]}}
+
+
+def test_graphql_tree_below_depth_limit_comes_from_rest(github_stub):
+    root = _graphql_tree("d5", github_api.TREE_DEPTH)
+    repo = {
+        "nameWithOwner": "deep/repo",
+        "url": "https://github.com/deep/repo",
+        "stargazerCount": 1,
+        "forkCount": 0,
+        "pushedAt": "2025-06-01T12:00:00Z",
+        "isArchived": False,
+        "defaultBranchRef": {"name": "main"},
+        "object": {"entries": [root]},
+    }
+    below = [
+        {"path": "d0.cairo", "type": "blob"},
+        {"path": "src", "type": "tree"},
+        {"path": "src/lib.cairo", "type": "blob"},
+    ]
+    routes = [
+        {
+            "method": "POST",
+            "path": "/graphql",
+            "match": "query Repos(",
+            "status": 200,
+            "body": {"data": {"r0": repo}},
+        },
+        {
+            "method": "GET",
+            "path": "/repos/deep/repo/git/trees/oid-d1",
+            "query": {"recursive": "1"},
+            "status": 200,
+            "body": {"sha": "oid-d1", "tree": below},
+        },
+    ]
+    github_stub.routes = routes
+    tree = github_api.get_repos_batch(["deep/repo"])["deep/repo"]["tree"]
+    blobs = [t["path"] for t in tree if t["type"] == "blob"]
+    # d5/d4/d3/d2/d1 is on the bottom level: its contents come from REST
+    assert blobs == [
+        "d5/d4/d3/d2/d1/d0.cairo",
+        "d5/d4/d3/d2/d1/src/lib.cairo",
+        "d5/d4/d3/d2/d2.cairo",
+        "d5/d4/d3/d3.cairo",
+        "d5/d4/d4.cairo",
+        "d5/d5.cairo",
+    ]
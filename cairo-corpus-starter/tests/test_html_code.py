@@ -0,0 +1,25 @@
+from src.utils.html_code import extract_code_blocks
+
+PAGE = """<html><body>
+<p>Intro with <code>fn</code> inline and <code>x = 1</code>.</p>
+<pre><code class="language-cairo"><span class="hljs-keyword">mod</span> counter {
+    <span class="hljs-keyword">fn</span> get() -&gt; u32 { 1 }
+}</code></pre>
+<pre>npm install</pre>
+<div><pre><code>use starknet::ContractAddress;</code></pre></div>
+</body></html>"""
+
+
+def test_outermost_blocks_in_order_with_text_verbatim():
+    assert extract_code_blocks(PAGE) == [
+        "mod counter {\n    fn get() -> u32 { 1 }\n}",
+        "use starknet::ContractAddress;",
+    ]
+
+
+def test_inline_code_and_bad_input():
+    assert extract_code_blocks("<p><code>pub fn a()</code></p>") == ["pub fn a()"]
+    assert extract_code_blocks("") == []
+    assert extract_code_blocks("   ") == []
+    decl = '<?xml version="1.0" encoding="utf-8"?><html><pre>mod a {}</pre></html>'
+    assert extract_code_blocks(decl) == ["mod a {}"]
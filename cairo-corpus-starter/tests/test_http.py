@@ -0,0 +1,29 @@
+from src.utils import github_api, http
+
+
+def test_session_retries_transient_errors(github_stub):
+    failures = {"left": 2}
+
+    def respond(method, path, query, headers, route):
+        if failures["left"]:
+            failures["left"] -= 1
+            return {"status": 503, "headers": {"Retry-After": "0"}}
+        return {"status": 200, "body": "ok"}
+
+    github_stub.respond = respond
+    s = http.make_session(retries=http.retry_policy(statuses=(503,)))
+    r = s.get(github_stub.url + "/page")
+    assert (r.status_code, r.text) == (200, "ok")
+    assert len(github_stub.requests) == 3
+    assert github_stub.requests[0]["headers"]["User-Agent"] == http.USER_AGENT
+
+
+def test_github_auth_is_centralized(github_stub, monkeypatch):
+    for token in (None, "t0k3n"):
+        monkeypatch.setattr(http, "_sessions", {})
+        monkeypatch.setattr(github_api, "GITHUB_TOKEN", token)
+        github_api.search_repos("language:Cairo", per_page=1, max_repos=1)
+    no_token, with_token = github_stub.requests
+    assert "Authorization" not in no_token["headers"]
+    assert with_token["headers"]["Authorization"] == "Bearer t0k3n"
+    assert with_token["headers"]["Accept"] == "application/vnd.github+json"
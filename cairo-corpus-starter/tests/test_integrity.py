@@ -1,11 +1,6 @@
-import json
-import pathlib
-
-
-def test_min_count():
+def test_min_count(audit_report):
     # ensure at least 20 records when fully scraped; allow fewer for initial runs
-    p = pathlib.Path("data/processed/dataset.jsonl")
-    if not p.exists():
+    if audit_report is None:
         return
-    n = sum(1 for _ in p.read_text().splitlines())
+    n = audit_report["records"]
     assert n >= 20 or n == 0, "Expected at least 20 contracts after scraping"
@@ -0,0 +1,92 @@
+import json
+import pathlib
+import pstats
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from src import refresh
+from src.pipeline import Pipeline
+from src.utils import metrics
+
+from tests.test_pipeline import Toy
+
+
+def test_counts_go_to_the_running_stage_only():
+    metrics.add("records")  # outside any stage: ignored
+
+    def work(n):
+        metrics.add("records")
+        metrics.add("bytes_written", n)
+
+    with ThreadPoolExecutor(2) as pool:
+        with metrics.stage("a") as a:
+            list(pool.map(metrics.bind(work), [10, 20, 30]))
+            # not bound: pool threads don't know the stage
+            list(pool.map(work, [1000]))
+        with metrics.stage("b") as b:
+            metrics.add("records", 2)
+    assert a.counts == {"records": 3, "bytes_written": 60}
+    assert b.counts == {"records": 2}
+    assert metrics.current() is None
+    report = a.to_dict()
+    assert report["records"] == 3 and report["records_per_s"] > 0
+
+
+def _busy_worker():
+    t = time.perf_counter()
+    while time.perf_counter() - t < 0.2:
+        pass
+
+
+@pytest.mark.parametrize(
+    "profiler, suffix", [("cprofile", ".prof"), ("sample", ".folded")]
+)
+def test_profilers(tmp_path, profiler, suffix):
+    with metrics.stage("clean", profiler, tmp_path) as m:
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(metrics.bind(_busy_worker)).result()
+        _busy_worker()
+    assert m.to_dict()["profile"] == str(tmp_path / f"clean{suffix}")
+    if profiler == "cprofile":
+        funcs = {f[2] for f in pstats.Stats(m.profile).stats}
+        assert "_busy_worker" in funcs
+    else:
+        folded = (tmp_path / "clean.folded").read_text().splitlines()
+        # samples from both the stage's own thread and its pool worker
+        worker = [ln for ln in folded if "thread.py:_worker" in ln]
+        own = [ln for ln in folded if "test_profilers" in ln]
+        assert any("_busy_worker" in ln for ln in worker)
+        assert any("_busy_worker" in ln for ln in own)
+    with pytest.raises(ValueError):
+        with metrics.stage("clean", "perf"):
+            pass
+
+
+def test_refresh_writes_a_run_report(tmp_path, monkeypatch):
+    toy = Toy(tmp_path)
+    stages = list(toy.pipeline().stages.values())
+
+    def merge():
+        toy.merge()
+        metrics.add("records", 4)
+
+    stages[3].run = merge
+    monkeypatch.setattr(refresh, "stages", lambda **kw: stages)
+    monkeypatch.setattr(
+        refresh, "Pipeline", lambda s: Pipeline(s, tmp_path / "stages.json")
+    )
+    report_path = tmp_path / "report.json"
+    status = refresh.refresh(
+        profile=["clean"], profile_dir=tmp_path / "profiles", report_path=report_path
+    )
+    assert set(status.values()) == {"ran"}
+    report = json.loads(report_path.read_text())
+    clean = report["stages"]["clean"]
+    assert clean["status"] == "ran" and clean["records"] == 4
+    assert clean["wall_s"] > 0 and clean["records_per_s"] > 0
+    assert pathlib.Path(clean["profile"]).exists()
+
+    refresh.refresh(report_path=report_path)
+    report = json.loads(report_path.read_text())
+    assert report["stages"]["clean"] == {"status": "up to date"}
@@ -0,0 +1,100 @@
+import random
+import tracemalloc
+
+from src.utils import minhash
+from src.utils.minhash import MinHasher, NearDupIndex
+from src.utils.text import is_duplicate
+
+BASE = (
+    """#[starknet::contract]
+mod Counter {
+    #[storage]
+    struct Storage {
+        value: u128,
+    }
+
+    #[external(v0)]
+    fn increment(ref self: ContractState) {
+        self.value.write(self.value.read() + 1);
+    }
+}
+"""
+    * 4
+)
+
+
+def test_signature_is_deterministic():
+    assert (MinHasher().signature(BASE) == MinHasher().signature(BASE)).all()
+
+
+def test_signature_works_in_bounded_chunks(monkeypatch):
+    rng = random.Random(0)
+    code = "".join(rng.choice("abcdefgh(){};: \n") for _ in range(170_000))
+    hasher = MinHasher(num_perm=128)
+    tracemalloc.start()
+    sig = hasher.signature(code)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # the whole 128 x shingles matrix would be ~170 MiB
+    assert peak < 32 * 2**20
+    monkeypatch.setattr(minhash, "SIGNATURE_CHUNK", 7)
+    assert (hasher.signature(code) == sig).all()
+
+
+def test_near_duplicate_is_found():
+    idx = NearDupIndex(threshold=0.98)
+    assert idx.add_if_new(BASE)
+    assert not idx.add_if_new(BASE.replace("value", "valu3", 1))
+    assert len(idx) == 1
+
+
+def test_distinct_snippets_are_kept():
+    idx = NearDupIndex(threshold=0.98)
+    assert idx.add_if_new(BASE)
+    assert idx.add_if_new(BASE[: len(BASE) // 2])
+    assert idx.add_if_new("fn main() -> felt252 {\n    42\n}\n")
+    assert len(idx) == 3
+
+
+def test_band_key_clashes_only_merge_buckets():
+    table = minhash._BandTable(bands=2)
+    table.add(0, [5, 7])
+    table.add(1, [9, 9])  # both bands of one snippet on the same key
+    table.add(2, [7, 9])  # keys another snippet has in the other band
+    assert set(table.get([9, 9])) == {1, 2}
+    assert set(table.get([5, 7])) == {0, 2}
+
+
+def _spread_edits(code, rng):
+    # worst case for a 0.98 match: 2% single-byte edits, none adjacent
+    code = list(code)
+    n = len(code) // 50
+    step = len(code) // n
+    for pos in range(rng.randrange(step), len(code), step)[:n]:
+        code[pos] = "#" if code[pos] != "#" else "$"
+    return "".join(code)
+
+
+def test_match_exactly_at_threshold():
+    rng = random.Random(1)
+    code = "".join(rng.choice("abcdefgh(){};: \n") for _ in range(5000))
+    edited = _spread_edits(code, rng)
+    assert is_duplicate(code, edited, 0.98)
+    idx = NearDupIndex(threshold=0.98)
+    idx.add(code)
+    assert list(idx.matches(edited)) == [(0, 0.98)]
+
+
+def test_recall_on_worst_case_near_duplicates():
+    rng = random.Random(0)
+    words = ["fn", "let", "self", "felt252", "u256", "assert", "mod", "struct"]
+    trials, caught = 400, 0
+    for _ in range(trials):
+        code = "\n".join(
+            " ".join(rng.choice(words) + str(rng.randrange(1000)) for _ in range(8))
+            for _ in range(rng.randint(20, 60))
+        )
+        idx = NearDupIndex(threshold=0.98)
+        idx.add(code)
+        caught += idx.find_duplicate(_spread_edits(code, rng)) is not None
+    assert caught >= 0.99 * trials
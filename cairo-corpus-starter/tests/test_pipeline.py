@@ -0,0 +1,160 @@
+import json
+import threading
+import time
+
+import pytest
+from src import clean_standardize, refresh
+from src.pipeline import Pipeline, Stage
+
+
+class Toy:
+    """Three sources feeding a merge stage and a build stage, all on tmp files."""
+
+    def __init__(self, root):
+        self.root = root
+        self.calls = []
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+        (root / "feeds.txt").write_text("feed-a\n")
+
+    def source(self, name):
+        def run():
+            with self.lock:
+                self.calls.append(name)
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.2)
+            d = self.root / "raw" / name
+            d.mkdir(parents=True, exist_ok=True)
+            out = d / "out.txt"
+            text = name + (
+                (self.root / "feeds.txt").read_text() if name == "blogs" else ""
+            )
+            if not out.exists() or out.read_text() != text:
+                out.write_text(text)
+            with self.lock:
+                self.active -= 1
+
+        return run
+
+    def merge(self):
+        self.calls.append("clean")
+        parts = sorted(p.read_text() for p in (self.root / "raw").rglob("*.txt"))
+        out = self.root / "index.txt"
+        if not out.exists() or out.read_text() != "".join(parts):
+            out.write_text("".join(parts))
+
+    def build(self):
+        self.calls.append("build")
+        (self.root / "dataset.txt").write_text((self.root / "index.txt").read_text())
+
+    def pipeline(self):
+        r = self.root
+        return Pipeline(
+            [
+                Stage(
+                    "github",
+                    self.source("github"),
+                    outputs=[str(r / "raw/github")],
+                    max_age=3600,
+                ),
+                Stage(
+                    "docs",
+                    self.source("docs"),
+                    outputs=[str(r / "raw/docs")],
+                    max_age=3600,
+                ),
+                Stage(
+                    "blogs",
+                    self.source("blogs"),
+                    inputs=[str(r / "feeds.txt")],
+                    outputs=[str(r / "raw/blogs")],
+                    max_age=3600,
+                ),
+                Stage(
+                    "clean",
+                    self.merge,
+                    deps=["github", "docs", "blogs"],
+                    inputs=[str(r / "raw")],
+                    outputs=[str(r / "index.txt")],
+                ),
+                Stage(
+                    "build",
+                    self.build,
+                    deps=["clean"],
+                    inputs=[str(r / "index.txt")],
+                    outputs=[str(r / "dataset.txt")],
+                ),
+            ],
+            state_path=r / "stages.json",
+        )
+
+
+def test_scrapes_run_in_parallel_then_everything_is_up_to_date(tmp_path):
+    toy = Toy(tmp_path)
+    status = toy.pipeline().run()
+    assert set(status.values()) == {"ran"}
+    assert toy.max_active == 3
+    assert toy.calls[3:] == ["clean", "build"]
+
+    toy.calls.clear()
+    status = toy.pipeline().run()
+    assert set(status.values()) == {"up to date"}
+    assert toy.calls == []
+
+
+def test_feed_change_only_reruns_blogs_and_what_it_touched(tmp_path):
+    toy = Toy(tmp_path)
+    toy.pipeline().run()
+    toy.calls.clear()
+    (tmp_path / "feeds.txt").write_text("feed-a\nfeed-b\n")
+    status = toy.pipeline().run()
+    assert status == {
+        "github": "up to date",
+        "docs": "up to date",
+        "blogs": "ran",
+        "clean": "ran",
+        "build": "ran",
+    }
+
+    # --from forces the stage and everything after it
+    toy.calls.clear()
+    toy.pipeline().run(start="docs")
+    assert toy.calls == ["docs", "clean", "build"]
+
+    # a source past max_age re-runs, but unchanged output wakes nothing else
+    state = json.loads((tmp_path / "stages.json").read_text())
+    state["docs"]["at"] -= 7200
+    (tmp_path / "stages.json").write_text(json.dumps(state))
+    toy.calls.clear()
+    assert toy.pipeline().run()["clean"] == "up to date"
+    assert toy.calls == ["docs"]
+
+
+def test_deleted_output_and_failures(tmp_path):
+    toy = Toy(tmp_path)
+    toy.pipeline().run()
+    (tmp_path / "dataset.txt").unlink()
+    toy.calls.clear()
+    assert toy.pipeline().run()["build"] == "ran"
+    assert toy.calls == ["build"]
+
+    p = toy.pipeline()
+
+    def broken():
+        raise RuntimeError("no network")
+
+    p.stages["docs"].run = broken
+    status = p.run(force=True)
+    assert status["docs"] == "failed"
+    assert status["clean"] == status["build"] == "blocked"
+    assert status["github"] == status["blogs"] == "ran"
+    with pytest.raises(KeyError):
+        p.run(start="nope")
+
+
+def test_refresh_does_not_walk_the_blob_store():
+    # the up-to-date checks must not stat every cleaned snippet
+    blobs = (str(clean_standardize.V1), str(clean_standardize.V2))
+    for stage in refresh.stages():
+        assert not set(stage.inputs + stage.outputs) & set(blobs), stage.name
@@ -0,0 +1,20 @@
+import time
+from multiprocessing.pool import ThreadPool
+
+from src.utils.pool import imap_window
+
+
+def test_imap_window_bounds_calls_in_flight():
+    started = []
+
+    def work(x):
+        started.append(x)
+        return x * x
+
+    with ThreadPool(4) as pool:
+        results = imap_window(pool, work, range(50), 3)
+        assert next(results) == 0
+        time.sleep(0.2)
+        # the first window of 3, plus the one call submitted as it was taken
+        assert sorted(started) == [0, 1, 2, 3]
+        assert list(results) == [x * x for x in range(1, 50)]
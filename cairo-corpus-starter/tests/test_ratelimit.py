@@ -0,0 +1,105 @@
+import email.utils
+
+import pytest
+import requests
+from src.utils import github_api
+from src.utils.ratelimit import RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, s):
+        self.slept.append(s)
+        self.now += s
+
+
+def _response(status=200, **headers):
+    r = requests.Response()
+    r.status_code = status
+    r.headers.update({k.replace("_", "-"): str(v) for k, v in headers.items()})
+    r._content = b"{}"
+    return r
+
+
+def _limiter(clock, **kw):
+    return RateLimiter({"core": 2.0}, burst=2, clock=clock, sleep=clock.sleep, **kw)
+
+
+def test_token_bucket_paces_after_burst():
+    clock = FakeClock()
+    lim = _limiter(clock)
+    for _ in range(6):
+        lim.request("core", _response)
+    # two requests ride the burst, the other four come 0.5s apart
+    assert clock.now - 1_000.0 == pytest.approx(2.0)
+    assert lim.stats["throttle_waits"] == 4
+
+
+def test_exhausted_quota_waits_for_reset():
+    clock = FakeClock()
+    lim = _limiter(clock)
+    spent = _response(
+        X_RateLimit_Remaining=0, X_RateLimit_Limit=5000, X_RateLimit_Reset=1_100
+    )
+    lim.request("core", lambda: spent)
+    lim.request("core", _response)
+    assert clock.now >= 1_101
+    assert lim.stats["throttle_wait_s"] == pytest.approx(101)
+
+
+def test_secondary_limit_honours_retry_after():
+    clock = FakeClock()
+    lim = _limiter(clock)
+    answers = iter([_response(429, Retry_After=7), _response(403, Retry_After=3)])
+    r = lim.request("core", lambda: next(answers, _response()))
+    assert r.status_code == 200
+    assert lim.stats["rate_limited"] == 2
+    assert lim.stats["rate_limit_wait_s"] == pytest.approx(10)
+
+
+def test_retry_after_as_http_date():
+    clock = FakeClock()
+    lim = _limiter(clock)
+    # 12s after the fake clock's now, in the IMF-fixdate form
+    when = email.utils.formatdate(1_012, usegmt=True)
+    assert when == "Thu, 01 Jan 1970 00:16:52 GMT"
+    answers = iter([_response(429, Retry_After=when)])
+    r = lim.request("core", lambda: next(answers, _response()))
+    assert r.status_code == 200
+    assert lim.stats["rate_limit_wait_s"] == pytest.approx(12)
+
+
+def test_server_errors_back_off_then_give_up():
+    clock = FakeClock()
+    lim = _limiter(clock, max_retries=3, backoff=1.0)
+    r = lim.request("core", lambda: _response(502))
+    assert r.status_code == 502
+    assert lim.stats["requests"] == 4
+    assert lim.stats["retries"] == 3
+    assert all(s <= 4 for s in clock.slept)
+
+
+def test_github_api_retries_rate_limited_tree(github_stub, monkeypatch):
+    limited = {"left": 1}
+
+    def respond(method, path, query, headers, route):
+        if path.endswith("/git/trees/main") and limited["left"]:
+            limited["left"] -= 1
+            return {"status": 403, "headers": {"Retry-After": "0"}}
+        return route
+
+    github_stub.respond = respond
+    monkeypatch.setattr(github_api, "_limiter", None)
+    tree = github_api.get_repo_tree("OpenZeppelin", "cairo-contracts")
+    assert len(tree) == 12
+    assert github_api.rate_limiter().stats["rate_limited"] == 1
+
+    github_stub.respond = lambda *a: {"status": 404, "body": {"message": "Not Found"}}
+    with pytest.raises(requests.HTTPError):
+        github_api.get_repo_tree("OpenZeppelin", "cairo-contracts")
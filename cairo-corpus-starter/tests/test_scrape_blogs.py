@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from src import clean_standardize, scrape_blogs
+from src.utils import metrics
+from src.utils.minhash import MinHasher
+
+from tests.github_stub import GitHubStub
+
+POST = """<html><body><article><p>Components in Cairo.</p>
+<pre><code>#[starknet::component]
+pub mod {name} {{
+    #[storage]
+    pub struct Storage {{ value: u32 }}
+}}
+</code></pre></article></body></html>"""
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Blog</title>
+{items}
+</channel></rss>"""
+
+ITEM = """<item><title>{title}</title><link>{base}/posts/{slug}</link>
+<guid isPermaLink="false">rss-{slug}</guid><pubDate>Mon, 02 Jun 2025 10:00:00 GMT</pubDate></item>"""
+
+ATOM = """<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom"><title>Atom blog</title>
+<entry><title>Atom post</title><id>tag:blog,2025:atom-1</id>
+<link rel="alternate" href="{base}/posts/atom-1"/><updated>2025-06-03T00:00:00Z</updated></entry>
+</feed>"""
+
+
+@pytest.fixture
+def blog(tmp_path, monkeypatch):
+    routes = [
+        {
+            "method": "GET",
+            "path": f"/posts/{slug}",
+            "status": 200,
+            "body": POST.format(name=slug.replace("-", "_")),
+        }
+        for slug in ("one", "two", "three", "atom-1", "standalone")
+    ]
+    with GitHubStub(routes=routes) as s:
+        feed = {"slugs": ["one", "two"]}
+
+        def respond(method, path, query, headers, route):
+            if path == "/rss":
+                items = "".join(
+                    ITEM.format(title=x, base=s.url, slug=x) for x in feed["slugs"]
+                )
+                return {"status": 200, "body": RSS.format(items=items)}
+            if path == "/atom":
+                return {"status": 200, "body": ATOM.format(base=s.url)}
+            return route
+
+        s.respond = respond
+        s.feed = feed
+        monkeypatch.setattr(scrape_blogs, "RAW_DIR", tmp_path / "blogs")
+        monkeypatch.setattr(scrape_blogs, "SEEN_DB", tmp_path / "seen.sqlite")
+        (tmp_path / "blogs").mkdir()
+        feeds = tmp_path / "feeds.txt"
+        feeds.write_text(
+            f"# comment\n{s.url}/rss\n{s.url}/atom\n{s.url}/posts/standalone\n"
+        )
+        s.feeds_file = str(feeds)
+        yield s
+
+
+def test_parse_rss_and_atom():
+    rss = scrape_blogs.parse_feed(
+        RSS.format(items=ITEM.format(title="T", base="https://b.io", slug="x"))
+    )
+    assert rss == [
+        {
+            "guid": "rss-x",
+            "link": "https://b.io/posts/x",
+            "title": "T",
+            "published": "Mon, 02 Jun 2025 10:00:00 GMT",
+        }
+    ]
+    atom = scrape_blogs.parse_feed(ATOM.format(base="https://b.io"))
+    assert atom[0]["guid"] == "tag:blog,2025:atom-1"
+    assert atom[0]["link"] == "https://b.io/posts/atom-1"
+    with pytest.raises(ValueError):
+        scrape_blogs.parse_feed("<html><body>post</body></html>")
+
+
+def test_feeds_ingest_new_posts_only(blog, tmp_path):
+    scrape_blogs.main(blog.feeds_file, concurrency=3)
+    out = sorted((tmp_path / "blogs").glob("*.json"))
+    assert len(out) == 4
+    rec = json.loads(out[0].read_text())
+    assert rec["source"] == "blog" and "pub mod" in rec["blocks"][0]
+    clean_standardize.init_hasher(MinHasher().params)
+    snippets = list(clean_standardize.clean_file(out[0]))
+    assert snippets and snippets[0]["entry"]["source"] == "blog"
+
+    blog.requests.clear()
+    blog.feed["slugs"].append("three")
+    scrape_blogs.main(blog.feeds_file, concurrency=3)
+    posts = [r["path"] for r in blog.requests if r["path"].startswith("/posts/")]
+    # the standalone post page is read once as a would-be feed, never as a post again
+    assert sorted(posts) == ["/posts/standalone", "/posts/three"]
+    assert len(list((tmp_path / "blogs").glob("*.json"))) == 5
+
+
+def test_blog_scrape_is_instrumented(blog, tmp_path):
+    with metrics.stage("blogs") as m:
+        scrape_blogs.main(blog.feeds_file, concurrency=3)
+    out = list((tmp_path / "blogs").glob("*.json"))
+    # post fetches run in pool threads and still count towards the stage
+    assert m.counts["http_requests"] == len(blog.requests)
+    assert m.counts["records"] == len(out)
+    assert m.counts["bytes_written"] == sum(p.stat().st_size for p in out)
+    # more posts than the per-host burst, so the limiter had to pace them
+    assert m.counts["rate_limit_sleep_s"] > 0
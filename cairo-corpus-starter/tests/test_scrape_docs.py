@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from src import scrape_docs
+
+from tests.github_stub import GitHubStub
+
+PAGE = """<html><body><main>
+<pre><code class="language-cairo">#[starknet::contract]
+mod {name} {{
+    fn get(self: @ContractState) -> u32 {{ 1 }}
+}}
+</code></pre></main></body></html>"""
+
+SIDEBAR = """<html><body><ol class="chapter">
+<li class="chapter-item expanded"><a href="ch01-00.html">1.</a></li>
+<li class="chapter-item expanded"><a href="ch01-00.html#install">1.1</a></li>
+<li class="chapter-item expanded"><a href="./ch02-00.html">2.</a></li>
+<li class="chapter-item expanded"><a href="ch03-00.html">3.</a>
+  <a href="ch02-00.html#again">2 again</a></li>
+</ol></body></html>"""
+
+
+def _routes():
+    routes = [
+        {"method": "GET", "path": "/book/index.html", "status": 200, "body": SIDEBAR}
+    ]
+    for i in (1, 2, 3):
+        routes.append(
+            {
+                "method": "GET",
+                "path": f"/book/ch0{i}-00.html",
+                "status": 200,
+                "headers": {"ETag": f'"page-{i}"', "Content-Type": "text/html"},
+                "body": PAGE.format(name=f"chapter_{i}"),
+            }
+        )
+    return routes
+
+
+def _revalidate(method, path, query, headers, route):
+    etag = route and route.get("headers", {}).get("ETag")
+    if etag and headers.get("If-None-Match") == etag:
+        return {"status": 304, "headers": {"ETag": etag}}
+    return route
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    with GitHubStub(routes=_routes(), delay=0.05) as s:
+        monkeypatch.setattr(scrape_docs, "RAW_DIR", tmp_path / "docs")
+        monkeypatch.setattr(scrape_docs, "PAGE_CACHE", str(tmp_path / "pages.sqlite"))
+        (tmp_path / "docs").mkdir()
+        s.respond = _revalidate
+        yield s
+
+
+def test_sidebar_urls_are_canonical_and_unique(site):
+    urls = scrape_docs.generate_doc_urls(site.url + "/book/index.html")
+    assert urls == [f"{site.url}/book/ch0{i}-00.html" for i in (1, 2, 3)]
+    assert scrape_docs.canonical_url("HTTP://Example.org:80/a/./b/../c.html#x") == (
+        "http://example.org/a/c.html"
+    )
+
+
+def test_crawl_revalidates_and_skips_unchanged_pages(site, tmp_path, monkeypatch):
+    scrape_docs.generate_doc_urls(site.url + "/book/index.html")
+    scrape_docs.main(max_items=10, concurrency=2)
+    outputs = {p.name: p.read_text() for p in (tmp_path / "docs").iterdir()}
+    assert len(outputs) == 3
+    rec = json.loads(next(v for k, v in outputs.items() if "ch02" in k))
+    assert rec["source"] == "docs" and "mod chapter_2" in rec["blocks"][0]
+    assert site.max_in_flight <= 2
+
+    parsed = []
+    extract = scrape_docs.extract_code_blocks
+    monkeypatch.setattr(
+        scrape_docs,
+        "extract_code_blocks",
+        lambda html: parsed.append(1) or extract(html),
+    )
+    site.requests.clear()
+    scrape_docs.main(max_items=10, concurrency=2)
+    assert all("If-None-Match" in r["headers"] for r in site.requests)
+    assert parsed == []
+    assert {p.name: p.read_text() for p in (tmp_path / "docs").iterdir()} == outputs
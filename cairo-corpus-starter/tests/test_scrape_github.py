@@ -0,0 +1,229 @@
+import io
+import json
+import tarfile
+
+import pytest
+from src import scrape_github
+
+QUERY = "language:Cairo starknet"
+
+
+@pytest.fixture
+def stub(github_stub, tmp_path, monkeypatch):
+    # slow enough for concurrent requests to overlap
+    github_stub.delay = 0.05
+    monkeypatch.setattr(scrape_github, "RAW_DIR", tmp_path / "github")
+    monkeypatch.setattr(scrape_github, "STATE_PATH", tmp_path / "state.sqlite")
+    monkeypatch.setattr(
+        scrape_github, "CHECKPOINT_PATH", tmp_path / "checkpoint.sqlite"
+    )
+    (tmp_path / "github").mkdir()
+    return github_stub
+
+
+def _outputs(root):
+    return {
+        str(p.relative_to(root)): p.read_text()
+        for p in sorted(root.rglob("*"))
+        if p.is_file()
+    }
+
+
+def test_async_scrape_matches_serial(stub, tmp_path):
+    scrape_github.main(QUERY, max_repos=3)
+    serial = _outputs(tmp_path / "github")
+    for p in (tmp_path / "github").iterdir():
+        if p.is_file():
+            p.unlink()
+
+    scrape_github.main(QUERY, max_repos=3, concurrency=4)
+    assert _outputs(tmp_path / "github") == serial
+
+    payload = json.loads(serial["OpenZeppelin__cairo-contracts.json"])
+    assert payload["meta"]["repo"]["stars"] == 900
+    assert [f["path"] for f in payload["files"]] == [
+        f"src/contract_{i}.cairo" for i in range(5)
+    ]
+    assert all(f["has_tests"] and f["has_ci"] for f in payload["files"])
+
+
+def test_concurrency_is_bounded(stub):
+    scrape_github.main(QUERY, max_repos=3, concurrency=3)
+    assert 1 < stub.max_in_flight <= 3
+
+
+def test_graphql_scrape_matches_rest(stub, tmp_path):
+    scrape_github.main(QUERY, max_repos=3)
+    rest = _outputs(tmp_path / "github")
+    rest_calls = len(stub.requests)
+    for p in (tmp_path / "github").rglob("*"):
+        if p.is_file():
+            p.unlink()
+
+    stub.requests.clear()
+    scrape_github.main(QUERY, max_repos=3, graphql=True)
+    assert _outputs(tmp_path / "github") == rest
+    # one search page, then one metadata/tree query and one blob query in total
+    assert [r["path"] for r in stub.requests] == [
+        "/search/repositories",
+        "/graphql",
+        "/graphql",
+    ]
+    assert stub.requests[0]["query"]["per_page"] == "3"
+    # the default branch comes with the search results, so one tree call per repo
+    assert rest_calls == 1 + 3 * (1 + 5)
+
+
+def _tarballs(stub):
+    """Repo tarballs as GitHub would send them, built from the fixture routes."""
+    out = {}
+    for route in stub.routes:
+        if not route["path"].endswith("/git/trees/main"):
+            continue
+        full = route["path"].split("/")[2] + "/" + route["path"].split("/")[3]
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+            for entry in route["body"]["tree"]:
+                if entry["type"] != "blob":
+                    continue
+                raw = stub.match("GET", f"/raw/{full}/HEAD/{entry['path']}", {})
+                data = (raw["body"] if raw else "x").encode("utf-8")
+                info = tarfile.TarInfo(
+                    f"{full.replace('/', '-')}-abc123/{entry['path']}"
+                )
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        out[full] = buf.getvalue()
+    return out
+
+
+def test_archive_mode_streams_one_tarball_per_repo(stub, tmp_path):
+    tarballs = _tarballs(stub)
+
+    def respond(method, path, query, headers, route):
+        parts = path.split("/")
+        if path.endswith("/tarball"):
+            # GitHub redirects the API call to codeload
+            return {
+                "status": 302,
+                "headers": {"Location": f"/codeload/{parts[2]}/{parts[3]}"},
+            }
+        if parts[1] == "codeload":
+            return {"status": 200, "body": tarballs[f"{parts[2]}/{parts[3]}"]}
+        return route
+
+    stub.respond = respond
+    scrape_github.main(QUERY, max_repos=3, archive=True)
+    assert [r["path"] for r in stub.requests[1:3]] == [
+        "/repos/keep-starknet-strange/alexandria/tarball",
+        "/codeload/keep-starknet-strange/alexandria",
+    ]
+    assert len(stub.requests) == 1 + 3 * 2
+
+    payload = json.loads(
+        (tmp_path / "github" / "OpenZeppelin__cairo-contracts.json").read_text()
+    )
+    # no 5-file cap: every .cairo file in the repo, tests included
+    assert [f["path"] for f in payload["files"]] == [
+        f"src/contract_{i}.cairo" for i in range(7)
+    ] + ["tests/test_contract.cairo"]
+    assert all(f["has_tests"] and f["has_ci"] for f in payload["files"])
+    assert (
+        payload["files"][0]["code"]
+        == stub.match(
+            "GET", "/raw/OpenZeppelin/cairo-contracts/HEAD/src/contract_0.cairo", {}
+        )["body"]
+    )
+
+
+def test_refresh_skips_unchanged_repos_and_blobs(stub, tmp_path):
+    scrape_github.main(QUERY, max_repos=3)
+    first = _outputs(tmp_path / "github")
+
+    stub.requests.clear()
+    scrape_github.main(QUERY, max_repos=3)
+    assert [r["path"] for r in stub.requests] == ["/search/repositories"]
+    assert _outputs(tmp_path / "github") == first
+
+    # a push to cairo-contracts that touched a single blob
+    changed = "src/contract_2.cairo"
+
+    def respond(method, path, query, headers, route):
+        if path == "/search/repositories" and query["page"] == "1":
+            items = [
+                (
+                    dict(i, pushed_at="2025-07-01T00:00:00Z")
+                    if i["full_name"] == "OpenZeppelin/cairo-contracts"
+                    else i
+                )
+                for i in route["body"]["items"]
+            ]
+            return dict(route, body=dict(route["body"], items=items))
+        if path == "/repos/OpenZeppelin/cairo-contracts/git/trees/main":
+            tree = [
+                dict(t, sha="f" * 40) if t["path"] == changed else t
+                for t in route["body"]["tree"]
+            ]
+            return dict(route, body=dict(route["body"], tree=tree))
+        if path.endswith(changed):
+            return dict(route, body="mod changed {}\n")
+        return route
+
+    stub.respond = respond
+    stub.requests.clear()
+    scrape_github.main(QUERY, max_repos=3, concurrency=2)
+    assert sorted(r["path"] for r in stub.requests[1:]) == [
+        "/raw/OpenZeppelin/cairo-contracts/HEAD/" + changed,
+        "/repos/OpenZeppelin/cairo-contracts/git/trees/main",
+    ]
+    payload = json.loads(
+        (tmp_path / "github" / "OpenZeppelin__cairo-contracts.json").read_text()
+    )
+    codes = {f["path"]: f["code"] for f in payload["files"]}
+    assert codes[changed] == "mod changed {}\n"
+    old = json.loads(first["OpenZeppelin__cairo-contracts.json"])["files"]
+    assert all(codes[f["path"]] == f["code"] for f in old if f["path"] != changed)
+    assert payload["meta"]["repo"]["last_commit"] == "2025-07-01T00:00:00Z"
+
+
+class Crash(BaseException):
+    """Stands in for the process dying mid-run (not caught as a per-repo error)."""
+
+
+@pytest.mark.parametrize("concurrency", [1, 2])
+def test_resume_continues_without_refetching(stub, tmp_path, monkeypatch, concurrency):
+    real_get_file = scrape_github.get_file
+    calls = []
+
+    def flaky_get_file(owner, repo, path):
+        calls.append(path)
+        if len(calls) == 8:
+            raise Crash()
+        return real_get_file(owner, repo, path)
+
+    monkeypatch.setattr(scrape_github, "get_file", flaky_get_file)
+    with pytest.raises(Crash):
+        scrape_github.main(QUERY, max_repos=3, concurrency=concurrency)
+    first = list(stub.requests)
+    assert len(_outputs(tmp_path / "github")) < 3 + 15
+
+    stub.requests.clear()
+    monkeypatch.setattr(scrape_github, "get_file", real_get_file)
+    scrape_github.main(QUERY, max_repos=3, concurrency=concurrency, resume=True)
+    resumed = list(stub.requests)
+    assert not any(r["path"] == "/search/repositories" for r in resumed)
+    # nothing fetched before the crash is fetched again
+    fetched = [r["path"] for r in first + resumed if r["path"].startswith("/raw/")]
+    assert len(fetched) == len(set(fetched))
+
+    # same result as a run that never crashed
+    monkeypatch.setattr(scrape_github, "RAW_DIR", tmp_path / "clean")
+    monkeypatch.setattr(scrape_github, "STATE_PATH", tmp_path / "clean.sqlite")
+    (tmp_path / "clean").mkdir()
+    scrape_github.main(QUERY, max_repos=3)
+    assert _outputs(tmp_path / "github") == _outputs(tmp_path / "clean")
+
+    # a finished run has nothing left to resume
+    stub.requests.clear()
+    scrape_github.main(QUERY, max_repos=3, resume=True)
+    assert stub.requests == []
@@ -0,0 +1,20 @@
+import json
+
+from src.shards import iter_shard, verify_shard, write_shards
+
+
+def test_shards_round_trip(tmp_path):
+    src = tmp_path / "dataset.jsonl"
+    recs = [{"contract_name": f"c{i}", "code": "fn f() {}\n" * i} for i in range(50)]
+    src.write_text("".join(json.dumps(r) + "\n" for r in recs))
+
+    m = write_shards(str(src), str(tmp_path / "shards"), target_bytes=0)
+    assert m["records"] == 50 and len(m["shards"]) == 50
+    assert all(verify_shard(str(tmp_path / "shards"), s) for s in m["shards"])
+    back = [r for s in m["shards"] for r in iter_shard(tmp_path / "shards" / s["file"])]
+    assert back == recs
+
+    # rewriting with bigger shards drops the stale files
+    m = write_shards(str(src), str(tmp_path / "shards"), target_bytes=1 << 20)
+    assert len(m["shards"]) == 1
+    assert len(list((tmp_path / "shards").glob("*.zst"))) == 1
@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+
+import pytest
+from src import build_jsonl, clean_standardize, scrape_github, stream
+
+QUERY = "language:Cairo starknet"
+
+
+@pytest.fixture
+def stub(github_stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape_github, "RAW_DIR", tmp_path / "raw" / "github")
+    monkeypatch.setattr(scrape_github, "STATE_PATH", tmp_path / "state.sqlite")
+    monkeypatch.setattr(
+        scrape_github, "CHECKPOINT_PATH", tmp_path / "checkpoint.sqlite"
+    )
+    (tmp_path / "raw" / "github").mkdir(parents=True)
+    return github_stub
+
+
+def test_bounded_applies_backpressure():
+    produced = []
+
+    def items():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    b = stream.Bounded(items(), maxsize=4)
+    time.sleep(0.2)
+    # the queue plus the item waiting to go in
+    assert len(produced) <= 5
+    assert list(b) == list(range(100))
+    assert b.stats["items"] == 100 and b.stats["producer_wait_s"] > 0
+
+
+def test_bounded_reraises_and_stops_early():
+    def failing():
+        yield 1
+        raise RuntimeError("scrape failed")
+
+    b = stream.Bounded(failing())
+    assert next(b) == 1
+    with pytest.raises(RuntimeError, match="scrape failed"):
+        next(b)
+
+    closed = threading.Event()
+
+    def endless():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            closed.set()
+
+    b = stream.Bounded(endless(), maxsize=2)
+    assert [next(b) for _ in range(3)] == [0, 1, 2]
+    b.close()
+    assert closed.is_set() and not b.thread.is_alive()
+    with pytest.raises(StopIteration):
+        next(b)
+
+
+def test_stream_matches_staged_build(stub, tmp_path, monkeypatch):
+    # left over from a staged build at the same path
+    (tmp_path / "stream").mkdir()
+    (tmp_path / "stream" / "dataset.jsonl.manifest.json").write_text("{}")
+    out = stream.main(
+        str(tmp_path / "stream" / "dataset.jsonl"),
+        QUERY,
+        max_repos=3,
+        sources=["github"],
+        queue_size=1,
+    )
+    # nothing but the dataset and its offset sidecar hits the disk
+    assert sorted(p.name for p in (tmp_path / "stream").iterdir()) == [
+        "dataset.jsonl",
+        "dataset.jsonl.idx",
+    ]
+    assert not any((tmp_path / "raw").rglob("*.*"))
+    assert out["kept"] > 0 and out["stages"]["github"]["items"] == 3
+
+    proc = tmp_path / "processed"
+    for name in ("cairo_v1", "cairo_v2"):
+        (proc / name).mkdir(parents=True)
+    monkeypatch.setattr(clean_standardize, "RAW", tmp_path / "raw")
+    monkeypatch.setattr(clean_standardize, "V1", proc / "cairo_v1")
+    monkeypatch.setattr(clean_standardize, "V2", proc / "cairo_v2")
+    monkeypatch.setattr(clean_standardize, "INDEX", proc / "index.json")
+    monkeypatch.setattr(clean_standardize, "FINGERPRINTS", proc / "fp.sqlite")
+    monkeypatch.setattr(build_jsonl, "PROC", proc)
+    scrape_github.main(QUERY, max_repos=3)
+    clean_standardize.main(full=True)
+    build_jsonl.main(str(proc / "dataset.jsonl"))
+
+    def records(path):
+        return sorted(
+            (json.loads(line) for line in open(path)),
+            key=lambda r: (r["repo"]["full_name"], r["contract_name"]),
+        )
+
+    staged = records(proc / "dataset.jsonl")
+    for rec in staged:
+        del rec["code_path"]
+    assert records(tmp_path / "stream" / "dataset.jsonl") == staged
@@ -0,0 +1,37 @@
+from src.validation import RecordValidator, compile_schema, validate_records
+
+GOOD = {
+    "contract_name": "ERC20",
+    "source": "github",
+    "type": "ERC20",
+    "cairo_version": "2",
+    "last_updated": "2025-01-01",
+    "quality": {"category": "production", "score": 0.83},
+    "repo": {"url": "https://github.com/a/b", "stars": 123, "forks": 10},
+    "code": "mod erc20 {}",
+}
+
+
+def test_compiled_schema_accepts_good_record():
+    from src.schema import schema
+
+    assert compile_schema(schema)(GOOD)
+
+
+def test_errors_match_jsonschema():
+    v = RecordValidator()
+    assert v.errors(GOOD) == []
+    # integral floats are valid integers to jsonschema, not to the fast path
+    assert v.errors(dict(GOOD, repo={"stars": 1.0})) == []
+    bad = dict(GOOD, source="forum", quality={"score": 2})
+    errs = v.errors(bad)
+    assert any(e.startswith("source:") for e in errs)
+    assert any(e.startswith("quality:") for e in errs)
+    assert any(e.startswith("quality/score:") for e in errs)
+
+
+def test_report_collects_every_failure():
+    recs = [GOOD, dict(GOOD, code=""), GOOD, dict(GOOD, cairo_version="0")]
+    report = validate_records(recs, batch_size=3)
+    assert report.checked == 4
+    assert [f["record"] for f in report.failures] == [1, 3]
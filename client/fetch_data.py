@@ -2,6 +2,8 @@ import json
 import os
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 YIELD_API_URL = "https://yields.llama.fi/pools"
 TOKEN_API_URL = "https://starknet.api.avnu.fi/v1/starknet/tokens"
@@ -11,6 +13,21 @@ YIELD_DIR = f"{DATA_DIR}/yields"
 
 os.makedirs(YIELD_DIR, exist_ok=True)
 
+# one keep-alive session for both APIs, retrying transient failures
+session = requests.Session()
+session.mount(
+    "https://",
+    HTTPAdapter(
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+        )
+    ),
+)
+
 
 def save_json(data, filepath):
     try:
@@ -24,7 +41,7 @@ def save_json(data, filepath):
 def fetch_yield_data():
 
     try:
-        response = requests.get(YIELD_API_URL, timeout=10)
+        response = session.get(YIELD_API_URL, timeout=10)
         response.raise_for_status()
         yield_data = response.json().get("data", [])
         chain_data = {}
@@ -45,7 +62,7 @@ def fetch_yield_data():
 
 def fetch_token_data():
     try:
-        response = requests.get(TOKEN_API_URL, timeout=10)
+        response = session.get(TOKEN_API_URL, timeout=10)
         response.raise_for_status()
         token_data = response.json().get("content", [])
 